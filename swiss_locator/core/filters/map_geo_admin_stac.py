@@ -1,6 +1,16 @@
+import json
+import os
+
 from qgis.core import QgsStacCollection
 
 from swiss_locator.core.constants import STAC_BASE_URL
+from swiss_locator.swissgeodownloader.api.response_objects import (
+    collectionFromDict,
+    collectionToDict,
+)
+
+# Increase when the format of the snapshot changes, older snapshots are ignored
+SNAPSHOT_VERSION = 1
 
 
 def collections_to_searchable_strings(collections: dict[str, QgsStacCollection]):
@@ -18,3 +28,50 @@ def map_geo_admin_stac_items_url(collection_id: str, limit: int):
     url = f"{STAC_BASE_URL}/collections/{collection_id}/items"
     base_params = {"limit": str(limit)}
     return url, base_params
+
+
+def save_collections_snapshot(
+    path: str, collections: dict[str, QgsStacCollection], search_strings: list[str]
+):
+    """
+    Saves the collections and their search strings, so that the search can be
+    served at startup before the collections are fetched again.
+    """
+    snapshot = {
+        "version": SNAPSHOT_VERSION,
+        "collections": [
+            collectionToDict(collection) for collection in collections.values()
+        ],
+        "search_strings": search_strings,
+    }
+    # Write to a temporary file first, a truncated snapshot must never be read
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f)
+    os.replace(tmp_path, path)
+
+
+def load_collections_snapshot(path: str):
+    """
+    Returns the collections, search strings and collection ids of a snapshot,
+    or None if there is no valid snapshot.
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if snapshot.get("version") != SNAPSHOT_VERSION:
+        return None
+
+    try:
+        collections = {}
+        for data in snapshot["collections"]:
+            collection = collectionFromDict(data)
+            collections[collection.id()] = collection
+        search_strings = snapshot["search_strings"]
+    except (KeyError, TypeError, ValueError):
+        return None
+    if len(search_strings) != len(collections):
+        return None
+    return collections, search_strings, list(collections.keys())
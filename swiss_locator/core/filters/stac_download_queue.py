@@ -0,0 +1,113 @@
+from collections import deque
+
+from qgis.PyQt.QtCore import QObject, pyqtSignal
+from qgis.core import QgsApplication, QgsProxyProgressTask
+
+from swiss_locator.core.results import STACResult
+from swiss_locator.swissgeodownloader.api.api_caller_task import DownloadFilesTask
+
+
+class StacDownloadQueue(QObject):
+    """
+    Downloads the assets triggered from the STAC locator, at most
+    `parallel_downloads` at the same time. The progress of all downloads of
+    the queue is shown as one task in the task manager, cancelling it cancels
+    the whole queue.
+    The bandwidth limit in bytes per second is shared with all other
+    downloads, 0 means unlimited. Files already downloaded to another folder
+    are taken from the content store, if a store folder is set.
+    """
+
+    asset_downloaded = pyqtSignal(object)
+    asset_failed = pyqtSignal(object)
+
+    def __init__(self, api, msg_bar=None, parallel_downloads: int = 3):
+        super().__init__()
+        self.api = api
+        self.msg_bar = msg_bar
+        self.parallel_downloads = parallel_downloads
+        self.bandwidth_limit = 0
+        self.content_store_dir = ""
+        self.pending: deque[tuple[STACResult, str]] = deque()
+        self.active: dict[DownloadFilesTask, STACResult] = {}
+        self.progress_task: QgsProxyProgressTask | None = None
+        self.total = 0
+        self.finished_count = 0
+
+    def enqueue(self, asset: STACResult, output_dir: str):
+        if self.progress_task is None:
+            self.total = 0
+            self.finished_count = 0
+            self.progress_task = QgsProxyProgressTask(
+                self.tr("Downloading files"), True
+            )
+            self.progress_task.canceled.connect(self.cancel)
+            QgsApplication.taskManager().addTask(self.progress_task)
+        self.pending.append((asset, output_dir))
+        self.total += 1
+        self._start_next()
+        self._update_progress()
+
+    def is_queued(self, asset: STACResult) -> bool:
+        return any(a.href == asset.href for a, _ in self.pending) or any(
+            a.href == asset.href for a in self.active.values()
+        )
+
+    def _start_next(self):
+        while self.pending and len(self.active) < max(1, self.parallel_downloads):
+            asset, output_dir = self.pending.popleft()
+            task = DownloadFilesTask(
+                self.api,
+                self.msg_bar,
+                self.tr("download {}").format(asset.asset_id),
+                fileList=[asset],
+                outputDir=output_dir,
+                bandwidthLimit=self.bandwidth_limit,
+                contentStoreDir=self.content_store_dir,
+            )
+            self.active[task] = asset
+            task.progressChanged.connect(self._update_progress)
+            task.taskCompleted.connect(
+                lambda _task=task: self._task_finished(_task, True)
+            )
+            task.taskTerminated.connect(
+                lambda _task=task: self._task_finished(_task, False)
+            )
+            QgsApplication.taskManager().addTask(task)
+
+    def _task_finished(self, task: DownloadFilesTask, success: bool):
+        asset = self.active.pop(task, None)
+        if asset is None:
+            return
+        self.finished_count += 1
+        if success:
+            self.asset_downloaded.emit(asset)
+        else:
+            self.asset_failed.emit(asset)
+
+        self._start_next()
+        self._update_progress()
+
+        if not self.active and not self.pending:
+            self._finalize(True)
+
+    def _finalize(self, success: bool):
+        if self.progress_task:
+            self.progress_task.finalize(success)
+            self.progress_task = None
+
+    def _update_progress(self):
+        if not self.progress_task or not self.total:
+            return
+        running = sum(task.progress() for task in self.active)
+        self.progress_task.setProxyProgress(
+            (self.finished_count * 100 + running) / self.total
+        )
+
+    def cancel(self):
+        self.pending.clear()
+        # End the proxy task as cancelled before the running tasks report
+        # their termination
+        self._finalize(False)
+        for task in list(self.active):
+            task.cancel()
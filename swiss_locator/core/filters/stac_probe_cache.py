@@ -0,0 +1,162 @@
+import json
+import os
+import threading
+import time
+
+from swiss_locator.core.results import STACResult
+from swiss_locator.utils.utils import get_cache_dir
+
+# The assets of a collection rarely change, a probe is repeated after a day
+PROBE_TTL = 24 * 3600
+
+COUNT_CLASS_FEW = "few"
+COUNT_CLASS_MANY = "many"
+
+
+def probe_from_response(response: dict, files_limit: int) -> dict | None:
+    """
+    Summarizes the first page of items of a collection: whether the
+    collection has few enough assets to list them in the locator, and if so,
+    the assets. Returns None for empty responses.
+    """
+    features = response.get("features", [])
+    if len(features) == 0:
+        return None
+
+    file_count = sum(len(item["assets"]) for item in features)
+    probe = {
+        "collection_id": features[0]["collection"],
+        "fetched_at": time.time(),
+        "limit": files_limit,
+        "count_class": COUNT_CLASS_FEW
+        if file_count <= files_limit
+        else COUNT_CLASS_MANY,
+        "assets": [],
+    }
+    if probe["count_class"] == COUNT_CLASS_FEW:
+        for item in features:
+            for asset_id, asset in item["assets"].items():
+                probe["assets"].append(
+                    {
+                        "id": asset_id,
+                        "description": asset.get("description"),
+                        "type": asset.get("type"),
+                        "href": asset.get("href"),
+                        "size": asset.get("file:size"),
+                        "checksum": asset.get("file:checksum"),
+                        "streamable": bool(
+                            "profile=cloud-optimized" in (asset.get("type") or "")
+                            and asset.get("href")
+                        ),
+                    }
+                )
+    return probe
+
+
+class ItemProbeCache:
+    """
+    Persisted probes of STAC collections, see probe_from_response.
+    The cache is shared by all clones of the locator filter, which run in
+    different threads.
+    """
+
+    def __init__(self, path: str, ttl: int = PROBE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.probes: dict[str, dict] | None = None
+
+    def _load(self):
+        if self.probes is not None:
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self.probes = json.load(f)
+        except (OSError, ValueError):
+            self.probes = {}
+
+    def _save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.probes, f)
+        os.replace(tmp_path, self.path)
+
+    def get(self, collection_id: str, files_limit: int) -> dict | None:
+        """Returns the probe of a collection, unless expired or made with
+        another limit of files."""
+        with self.lock:
+            self._load()
+            probe = self.probes.get(collection_id)
+        if (
+            not probe
+            or probe.get("limit") != files_limit
+            or time.time() - probe.get("fetched_at", 0) > self.ttl
+        ):
+            return None
+        return probe
+
+    def put(self, probe: dict):
+        with self.lock:
+            self._load()
+            self.probes[probe["collection_id"]] = probe
+            try:
+                self._save()
+            except OSError:
+                # The probe is still cached for this session
+                pass
+
+    def clear(self):
+        with self.lock:
+            self.probes = {}
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+
+def probe_to_results(
+    probe: dict, collection_name: str, streamed_postfix: str
+) -> list[STACResult]:
+    """Creates the results of the assets of a probe, streamable assets
+    are listed a second time as stream."""
+    results = []
+    for asset in probe["assets"]:
+        asset_result = STACResult(
+            probe["collection_id"],
+            collection_name,
+            asset["id"],
+            asset["description"],
+            asset["type"],
+            asset["href"],
+            file_size=asset.get("size"),
+            checksum=asset.get("checksum"),
+        )
+        results.append(asset_result)
+        if asset["streamable"]:
+            # Create a second, streamable asset object
+            results.append(
+                STACResult(
+                    probe["collection_id"],
+                    collection_name,
+                    f"{asset['id']} ({streamed_postfix})",
+                    asset["description"],
+                    asset["type"],
+                    asset["href"],
+                    STACResult.STREAMED_SOURCE_PREFIX + asset["href"],
+                )
+            )
+    return results
+
+
+_item_probe_cache: ItemProbeCache | None = None
+_item_probe_cache_lock = threading.Lock()
+
+
+def item_probe_cache() -> ItemProbeCache:
+    global _item_probe_cache
+    with _item_probe_cache_lock:
+        if _item_probe_cache is None:
+            _item_probe_cache = ItemProbeCache(
+                os.path.join(get_cache_dir("stac"), "item_probes.json")
+            )
+        return _item_probe_cache
@@ -0,0 +1,189 @@
+import math
+import re
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+
+from qgis.core import QgsStacCollection
+
+# Matches in titles count more than matches in long descriptions
+FIELD_WEIGHTS = {
+    "title": 3.0,
+    "id": 2.0,
+    "keywords": 2.0,
+    "description": 1.0,
+}
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# Query terms which only match the beginning or the inside of a word count
+# less than complete words
+PREFIX_FACTOR = 0.8
+INFIX_FACTOR = 0.5
+MIN_INFIX_LENGTH = 3
+
+TRANSLITERATIONS = str.maketrans({"ä": "ae", "ö": "oe", "ü": "ue", "ß": "ss"})
+
+
+def normalize(text: str) -> str:
+    """Lower case, German umlauts transliterated as in the collection ids
+    (e.g. verfügbarkeit => verfuegbarkeit) and other accents removed."""
+    text = text.lower().translate(TRANSLITERATIONS)
+    text = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+def tokenize(text: str) -> list[str]:
+    return re.findall(r"[^\W_]+", normalize(text or ""))
+
+
+def _ngrams(text: str) -> set[str]:
+    return {
+        text[i : i + MIN_INFIX_LENGTH] for i in range(len(text) - MIN_INFIX_LENGTH + 1)
+    }
+
+
+class StacSearchIndex:
+    """
+    Inverted index over the title, id, description and keywords of STAC
+    collections, ranked with BM25. Each field may contain the texts of
+    several languages. The last word of a search is matched as prefix, since
+    the user is probably still typing it, and words of at least
+    MIN_INFIX_LENGTH characters also match inside of longer words
+    (e.g. verfügbarkeit => wasserverfügbarkeit).
+    """
+
+    def __init__(self):
+        # term => {document id => weighted term frequency}
+        self.postings: dict[str, dict[str, float]] = defaultdict(dict)
+        self.lengths: dict[str, float] = {}
+        self.average_length = 0.0
+        self.vocabulary: list[str] = []
+        # n-gram of MIN_INFIX_LENGTH characters => terms containing it after
+        # their first character, to find infix matches without a full scan
+        self.ngrams: dict[str, set[str]] = defaultdict(set)
+
+    @classmethod
+    def from_collections(
+        cls,
+        collections: dict[str, QgsStacCollection],
+        translations: dict[str, list[dict]] = None,
+    ):
+        """
+        :param translations: titles and descriptions of the collections in
+                             other languages, {collection id: [{"title": ...,
+                             "description": ...}]}
+        """
+        index = cls()
+        for coll_id, collection in collections.items():
+            translated = (translations or {}).get(coll_id, [])
+            index.add(
+                coll_id,
+                {
+                    "id": coll_id,
+                    "title": " ".join(
+                        [collection.title() or ""]
+                        + [t.get("title") or "" for t in translated]
+                    ),
+                    "keywords": " ".join(collection.keywords()),
+                    "description": " ".join(
+                        [collection.description() or ""]
+                        + [t.get("description") or "" for t in translated]
+                    ),
+                },
+            )
+        index.finalize()
+        return index
+
+    def add(self, doc_id: str, fields: dict[str, str]):
+        length = 0.0
+        for field, text in fields.items():
+            weight = FIELD_WEIGHTS[field]
+            for term in tokenize(text):
+                postings = self.postings[term]
+                postings[doc_id] = postings.get(doc_id, 0.0) + weight
+                length += weight
+        self.lengths[doc_id] = length
+
+    def finalize(self):
+        """Must be called once all documents are added."""
+        self.vocabulary = sorted(self.postings.keys())
+        self.ngrams.clear()
+        for term in self.vocabulary:
+            for ngram in _ngrams(term[1:]):
+                self.ngrams[ngram].add(term)
+        self.average_length = (
+            sum(self.lengths.values()) / len(self.lengths) if self.lengths else 0.0
+        )
+
+    def _matching_terms(self, query_term: str, is_prefix: bool) -> dict[str, float]:
+        """Returns the terms of the vocabulary matching a query term along with
+        the factor of the match."""
+        terms = {}
+        if is_prefix:
+            i = bisect_left(self.vocabulary, query_term)
+            while i < len(self.vocabulary) and self.vocabulary[i].startswith(
+                query_term
+            ):
+                terms[self.vocabulary[i]] = PREFIX_FACTOR
+                i += 1
+        if len(query_term) >= MIN_INFIX_LENGTH:
+            for term in self._infix_candidates(query_term):
+                if term not in terms and query_term in term[1:]:
+                    terms[term] = INFIX_FACTOR
+        if query_term in self.postings:
+            terms[query_term] = 1.0
+        return terms
+
+    def _infix_candidates(self, query_term: str) -> set[str]:
+        """Returns the terms containing all n-grams of the query term, a
+        superset of the terms containing the query term."""
+        candidates = None
+        for ngram in sorted(
+            _ngrams(query_term), key=lambda n: len(self.ngrams.get(n, ()))
+        ):
+            terms = self.ngrams.get(ngram)
+            if not terms:
+                return set()
+            candidates = set(terms) if candidates is None else candidates & terms
+            if not candidates:
+                break
+        return candidates or set()
+
+    def _idf(self, term: str) -> float:
+        n = len(self.postings[term])
+        return math.log(1 + (len(self.lengths) - n + 0.5) / (n + 0.5))
+
+    def search(self, search_term: str) -> list[str]:
+        """Returns the ids of the documents matching all words of the search,
+        best matches first."""
+        query_terms = tokenize(search_term)
+        if not query_terms or not self.average_length:
+            return []
+
+        scores: dict[str, float] | None = None
+        for i, query_term in enumerate(query_terms):
+            is_last = i == len(query_terms) - 1
+            term_scores = defaultdict(float)
+            for term, factor in self._matching_terms(query_term, is_last).items():
+                idf = self._idf(term)
+                for doc_id, tf in self.postings[term].items():
+                    norm = 1 - B + B * self.lengths[doc_id] / self.average_length
+                    score = factor * idf * tf * (K1 + 1) / (tf + K1 * norm)
+                    # Several terms can match a prefix, only the best counts
+                    term_scores[doc_id] = max(term_scores[doc_id], score)
+
+            if scores is None:
+                scores = dict(term_scores)
+            else:
+                scores = {
+                    doc_id: score + term_scores[doc_id]
+                    for doc_id, score in scores.items()
+                    if doc_id in term_scores
+                }
+            if not scores:
+                return []
+
+        return sorted(scores, key=lambda doc_id: (-scores[doc_id], doc_id))
@@ -23,7 +23,7 @@ import traceback
 
 from qgis.PyQt import sip
 
-from qgis.PyQt.QtCore import Qt, QTimer, QUrl, pyqtSignal, QEventLoop
+from qgis.PyQt.QtCore import Qt, QTimer, pyqtSignal, QEventLoop
 from qgis.PyQt.QtGui import QColor
 from qgis.PyQt.QtNetwork import QNetworkRequest, QNetworkReply, QNetworkAccessManager
 from qgis.PyQt.QtWidgets import QLabel, QWidget, QTabWidget
@@ -41,8 +41,8 @@ from qgis.core import (
     QgsLocatorContext,
     QgsFeedback,
     QgsRasterLayer,
-    QgsVectorTileLayer,
-    QgsVectorTileUtils,
+    QgsMapLayer,
+    QgsApplication,
 )
 from qgis.gui import QgsRubberBand, QgisInterface
 
@@ -53,17 +53,28 @@ from swiss_locator.core.constants import (
     USER_AGENT,
 )
 from swiss_locator.core.filters.filter_type import FilterType
+from swiss_locator.swissgeodownloader.api.http_compression import (
+    acceptCompression,
+    readReply,
+)
 from swiss_locator.core.language import get_language
 from swiss_locator.core.parameters import AVAILABLE_CRS
 from swiss_locator.core.results import (
     WMSLayerResult,
     FeatureResult,
     VectorTilesLayerResult,
+    VectorTilesExportResult,
     NoResult,
     STACResult,
     result_from_data as _result_from_data,
 )
 from swiss_locator.core.settings import Settings
+from swiss_locator.core.layer_loading import LayerLoadingTask
+from swiss_locator.core.vector_tiles.style_cache import (
+    VectorTilesStyleTask,
+    cached_style,
+    create_vector_tiles_layers,
+)
 from swiss_locator.gui.config_dialog import ConfigDialog
 from swiss_locator.gui.maptip import MapTip
 from swiss_locator.gui.qtwebkit_conf import with_qt_web_kit
@@ -112,6 +123,8 @@ class SwissLocatorFilter(QgsLocatorFilter):
         self.event_loop = None
         self.result_found = False
         self.access_managers = {}
+        self.style_tasks: dict[str, VectorTilesStyleTask] = {}
+        self.layer_tasks: list[LayerLoadingTask] = []
         self.minimum_search_length = 2
 
         self.nam = QNetworkAccessManager()
@@ -241,7 +254,7 @@ class SwissLocatorFilter(QgsLocatorFilter):
         request = QNetworkRequest(url)
         for k, v in list(headers.items()):
             request.setRawHeader(k, v)
-        return request
+        return acceptCompression(request)
 
     def handle_reply(self, url: str, feedback: QgsFeedback, slot, data=None):
         if sip.isdeleted(self):
@@ -260,7 +273,8 @@ class SwissLocatorFilter(QgsLocatorFilter):
             if reply.error() != QNetworkReply.NetworkError.NoError:
                 self.info(f"could not load url: {reply.errorString()}")
             else:
-                content = reply.readAll().data().decode("utf-8")
+                # Bytes are parsed directly, without decoding them to a string
+                content = readReply(reply)
                 if data:
                     slot(content, feedback, data)
                 else:
@@ -397,34 +411,19 @@ class SwissLocatorFilter(QgsLocatorFilter):
             url_with_params = "&".join([f"{k}={v}" for (k, v) in params.items()])
 
             self.info(f"Loading layer: {url_with_params}")
-            ch_layer = QgsRasterLayer(url_with_params, result.displayString, "wms")
-            label = QLabel()
-            label.setTextFormat(Qt.TextFormat.RichText)
-            label.setTextInteractionFlags(Qt.TextInteractionFlag.TextBrowserInteraction)
-            label.setOpenExternalLinks(True)
-
-            if "geo.admin.ch" in swiss_result.url.lower():
-                label.setText(
-                    f'<a href="{MAP_GEO_ADMIN_URL}/'
-                    f'?lang={self.lang}&bgLayer=ch.swisstopo.pixelkarte-farbe&layers={swiss_result.layer}">'
-                    "Open layer in map.geo.admin.ch</a>"
-                )
-
-            if not ch_layer.isValid():
-                msg = self.tr(
+            display_name = result.displayString
+            task = LayerLoadingTask(
+                self.tr("Loading layer {}").format(swiss_result.title),
+                lambda: [QgsRasterLayer(url_with_params, display_name, "wms")],
+                swiss_result.url,
+            )
+            self.start_layer_loading_task(
+                task,
+                lambda: self.add_wms_layer(swiss_result, task.layers[-1]),
+                self.tr(
                     f"Cannot load Layers layer: {swiss_result.title} ({swiss_result.layer})"
-                )
-                level = Qgis.MessageLevel.Warning
-                self.info(msg, level)
-            else:
-                msg = self.tr(
-                    f"Layers layer added to the map: {swiss_result.title} ({swiss_result.layer})"
-                )
-                level = Qgis.MessageLevel.Info
-
-                QgsProject.instance().addMapLayer(ch_layer)
-
-            self.message_emitted.emit(self.displayName(), msg, level, label)
+                ),
+            )
 
         # Feature
         elif isinstance(swiss_result, FeatureResult):
@@ -436,82 +435,10 @@ class SwissLocatorFilter(QgsLocatorFilter):
 
         # Vector tiles
         elif isinstance(swiss_result, VectorTilesLayerResult):
-            params = dict()
-            params["styleUrl"] = swiss_result.style
-            if Qgis.QGIS_VERSION_INT < 33900:
-                params["url"] = swiss_result.url
-            params["type"] = "xyz"
-            # Max and min zoom levels cound be retrieved from metadata JSON files like:
-            # https://vectortiles.geo.admin.ch/tiles/ch.swisstopo.base.vt/v1.0.0/tiles.json
-            # All Swiss services use 0-14 levels (level 14 goes up to buildings)
-            params["zmax"] = "14"
-            params["zmin"] = "0"
-
-            url_with_params = "&".join([f"{k}={v}" for (k, v) in params.items()])
-
-            if Qgis.QGIS_VERSION_INT >= 33900:
-                url_with_params = QgsVectorTileUtils.updateUriSources(
-                    url_with_params, True
-                )
+            self.load_vector_tiles_layer(swiss_result, result.displayString)
 
-            self.info(f"Loading layer: {url_with_params}")
-            ch_layer = QgsVectorTileLayer(url_with_params, result.displayString)
-
-            if not ch_layer.isValid():
-                msg = self.tr(f"Cannot load Vector Tiles layer: {swiss_result.title}")
-                level = Qgis.MessageLevel.Warning
-                self.info(msg, level)
-            else:
-                ch_layer.setLabelsEnabled(True)
-                ch_layer.loadDefaultMetadata()
-
-                error, warnings = "", []
-                res, sublayers = ch_layer.loadDefaultStyleAndSubLayers(error, warnings)
-
-                if sublayers:
-                    msg = self.tr(
-                        "Sublayers found ({}): {}".format(
-                            swiss_result.title,
-                            "; ".join([sublayer.name() for sublayer in sublayers]),
-                        )
-                    )
-                    level = Qgis.MessageLevel.Info
-                    self.info(msg, level)
-                if error or warnings:
-                    msg = self.tr(
-                        "Error/warning found while loading default styles and sublayers for layer {}. Error: {} Warning: {}".format(
-                            swiss_result.title, error, "; ".join(warnings)
-                        )
-                    )
-                    level = Qgis.MessageLevel.Warning
-                    self.info(msg, level)
-
-                msg = self.tr(f"Layer added to the map: {swiss_result.title}")
-                level = Qgis.MessageLevel.Info
-                self.info(msg, level)
-
-                # Load basemap layers at the bottom of the layer tree
-                root = QgsProject.instance().layerTreeRoot()
-                empty_project = not QgsProject.instance().mapLayers()
-
-                if empty_project:
-                    # Set the Swiss extent in EPSG:3857 (VT's CRS)
-                    extent = QgsRectangle(624991, 5725825, 1209826, 6089033)
-                    ch_layer.setExtent(extent)
-                    for _layer in sublayers:
-                        _layer.setExtent(extent)
-
-                if sublayers:
-                    # Sublayers should be loaded on top of the vector tile
-                    # layer. We group them to keep them all together.
-                    group = root.insertGroup(-1, ch_layer.name())
-                    all_layers = sublayers + [ch_layer]
-                    QgsProject.instance().addMapLayers(all_layers, False)
-                    for _layer in all_layers:
-                        group.addLayer(_layer)
-                else:
-                    QgsProject.instance().addMapLayer(ch_layer, False)
-                    root.insertLayer(-1, ch_layer)
+        elif isinstance(swiss_result, VectorTilesExportResult):
+            self.export_vector_tiles_package(swiss_result)
 
         elif isinstance(swiss_result, STACResult):
             if swiss_result.is_streamed:
@@ -549,19 +476,199 @@ class SwissLocatorFilter(QgsLocatorFilter):
                 self.current_timer.setSingleShot(True)
                 self.current_timer.start(5000)
 
+    def add_wms_layer(self, swiss_result: WMSLayerResult, ch_layer: QgsRasterLayer):
+        label = QLabel()
+        label.setTextFormat(Qt.TextFormat.RichText)
+        label.setTextInteractionFlags(Qt.TextInteractionFlag.TextBrowserInteraction)
+        label.setOpenExternalLinks(True)
+
+        if "geo.admin.ch" in swiss_result.url.lower():
+            label.setText(
+                f'<a href="{MAP_GEO_ADMIN_URL}/'
+                f'?lang={self.lang}&bgLayer=ch.swisstopo.pixelkarte-farbe&layers={swiss_result.layer}">'
+                "Open layer in map.geo.admin.ch</a>"
+            )
+
+        msg = self.tr(
+            f"Layers layer added to the map: {swiss_result.title} ({swiss_result.layer})"
+        )
+        level = Qgis.MessageLevel.Info
+
+        QgsProject.instance().addMapLayer(ch_layer)
+
+        self.message_emitted.emit(self.displayName(), msg, level, label)
+
+    def load_vector_tiles_layer(
+        self, swiss_result: VectorTilesLayerResult, display_name: str
+    ):
+        params = dict()
+        params["styleUrl"] = swiss_result.style
+        if Qgis.QGIS_VERSION_INT < 33900 or swiss_result.tiles_type != "xyz":
+            params["url"] = swiss_result.url
+        params["type"] = swiss_result.tiles_type
+        # Max and min zoom levels cound be retrieved from metadata JSON files like:
+        # https://vectortiles.geo.admin.ch/tiles/ch.swisstopo.base.vt/v1.0.0/tiles.json
+        # All Swiss services use 0-14 levels (level 14 goes up to buildings)
+        params["zmax"] = "14"
+        params["zmin"] = "0"
+
+        url_with_params = "&".join([f"{k}={v}" for (k, v) in params.items()])
+        update_sources = (
+            Qgis.QGIS_VERSION_INT >= 33900 and swiss_result.tiles_type == "xyz"
+        )
+
+        # Converting the style requires to download it with its sprites, which
+        # takes seconds. The converted style is cached, so that the layer can
+        # be added without waiting for it next time.
+        entry = cached_style(swiss_result.style)
+        if entry:
+            self.load_styled_vector_tiles_layer(swiss_result, entry, display_name)
+
+        running_task = self.style_tasks.get(swiss_result.style)
+        if running_task in QgsApplication.taskManager().activeTasks():
+            if not entry:
+                # The style is being converted for an earlier click, add this
+                # layer once it is cached
+                running_task.taskCompleted.connect(
+                    lambda: self.load_styled_vector_tiles_layer(
+                        swiss_result, running_task.entry, display_name
+                    )
+                )
+            return
+
+        # Convert the style and create the layer on first use, otherwise check
+        # whether the style has changed and update the cache for the next time
+        style_task = VectorTilesStyleTask(
+            self.tr("Loading style of {}").format(swiss_result.title),
+            url_with_params,
+            swiss_result.style,
+            update_sources,
+            None if entry else display_name,
+        )
+        self.style_tasks[swiss_result.style] = style_task
+
+        def on_style_task_completed():
+            for warning in style_task.warnings:
+                self.info(warning, Qgis.MessageLevel.Warning)
+            if not entry:
+                self.add_vector_tiles_layer(swiss_result, style_task.layers)
+            elif style_task.updated:
+                self.info(f"Cached style of {swiss_result.title} updated")
+
+        def on_style_task_terminated():
+            if entry:
+                return
+            msg = self.tr(
+                f"Cannot load Vector Tiles layer: {swiss_result.title} ({style_task.exception})"
+            )
+            level = Qgis.MessageLevel.Warning
+            self.info(msg, level)
+            self.message_emitted.emit(self.displayName(), msg, level, None)
+
+        style_task.taskCompleted.connect(on_style_task_completed)
+        style_task.taskTerminated.connect(on_style_task_terminated)
+        QgsApplication.taskManager().addTask(style_task)
+
+    def load_styled_vector_tiles_layer(
+        self, swiss_result: VectorTilesLayerResult, entry: dict, display_name: str
+    ):
+        """Creates the layers from a cached style entry in a background task."""
+        task = LayerLoadingTask(
+            self.tr("Loading layer {}").format(swiss_result.title),
+            lambda: create_vector_tiles_layers(entry, display_name),
+        )
+        self.start_layer_loading_task(
+            task,
+            lambda: self.add_vector_tiles_layer(swiss_result, task.layers),
+            self.tr(f"Cannot load Vector Tiles layer: {swiss_result.title}"),
+        )
+
+    def add_vector_tiles_layer(
+        self, swiss_result: VectorTilesLayerResult, layers: list[QgsMapLayer]
+    ):
+        sublayers, ch_layer = layers[:-1], layers[-1]
+
+        if sublayers:
+            msg = self.tr(
+                "Sublayers found ({}): {}".format(
+                    swiss_result.title,
+                    "; ".join([sublayer.name() for sublayer in sublayers]),
+                )
+            )
+            level = Qgis.MessageLevel.Info
+            self.info(msg, level)
+
+        msg = self.tr(f"Layer added to the map: {swiss_result.title}")
+        level = Qgis.MessageLevel.Info
+        self.info(msg, level)
+
+        # Load basemap layers at the bottom of the layer tree
+        root = QgsProject.instance().layerTreeRoot()
+        empty_project = not QgsProject.instance().mapLayers()
+
+        if empty_project:
+            # Set the Swiss extent in EPSG:3857 (VT's CRS)
+            extent = QgsRectangle(624991, 5725825, 1209826, 6089033)
+            ch_layer.setExtent(extent)
+            for _layer in sublayers:
+                _layer.setExtent(extent)
+
+        if sublayers:
+            # Sublayers should be loaded on top of the vector tile
+            # layer. We group them to keep them all together.
+            group = root.insertGroup(-1, ch_layer.name())
+            all_layers = sublayers + [ch_layer]
+            QgsProject.instance().addMapLayers(all_layers, False)
+            for _layer in all_layers:
+                group.addLayer(_layer)
+        else:
+            QgsProject.instance().addMapLayer(ch_layer, False)
+            root.insertLayer(-1, ch_layer)
+
+    def start_layer_loading_task(
+        self, task: LayerLoadingTask, on_completed, error_message: str
+    ):
+        """
+        Runs a layer loading task and keeps a reference to it until it is
+        finished. Several layers can be loaded at the same time.
+        """
+        self.layer_tasks.append(task)
+
+        def on_completed_task():
+            self.layer_tasks.remove(task)
+            on_completed()
+
+        def on_terminated_task():
+            self.layer_tasks.remove(task)
+            msg = error_message
+            if task.exception:
+                msg += f" ({task.exception})"
+            level = Qgis.MessageLevel.Warning
+            self.info(msg, level)
+            self.message_emitted.emit(self.displayName(), msg, level, None)
+
+        task.taskCompleted.connect(on_completed_task)
+        task.taskTerminated.connect(on_terminated_task)
+        QgsApplication.taskManager().addTask(task)
+
+    def export_vector_tiles_package(self, swiss_result: VectorTilesExportResult):
+        # this should be re-implemented
+        raise NameError(
+            "Filter type is not valid. This method should be reimplemented."
+        )
+
     def show_map_tip(self, layer, feature_id, point):
         if layer and feature_id:
             url = f"{MAP_SERVER_URL}/{layer}/{feature_id}/htmlPopup"
             params = {"lang": self.lang, "sr": self.crs}
-            url = url_with_param(url, params)
-            self.dbg_info(url)
-            request = QNetworkRequest(QUrl(url))
+            request = self.request_for_url(url, params, self.HEADERS)
+            self.dbg_info(request.url().toString())
             self.fetch_request(
                 request, QgsFeedback(), self.parse_map_tip_response, data=point
             )
 
     def parse_map_tip_response(self, content, feedback, point):
-        self.map_tip = MapTip(self.iface, content, point.asPoint())
+        self.map_tip = MapTip(self.iface, content.decode("utf-8"), point.asPoint())
         self.map_tip.closed.connect(self.clearPreviousResults)
 
     def highlight(self, point, bbox=None):
@@ -22,9 +22,6 @@ from urllib.parse import urlparse, parse_qs
 import xml.etree.ElementTree as etree
 
 
-from qgis.PyQt.QtCore import QUrl
-from qgis.PyQt.QtNetwork import QNetworkRequest
-
 from qgis.core import (
     QgsLocatorResult,
     QgsFeedback,
@@ -136,7 +133,7 @@ class SwissLocatorFilterLayer(SwissLocatorFilter):
                             visited_capabilities.append(url_components.netloc)
                             self._pending_capabilities.append(
                                 (
-                                    QNetworkRequest(QUrl(url)),
+                                    self.request_for_url(url, {}, self.HEADERS),
                                     (search, wms_url),
                                 )
                             )
@@ -18,9 +18,7 @@
 
 import json
 
-from qgis.PyQt.QtCore import QUrl
 from qgis.PyQt.QtGui import QIcon
-from qgis.PyQt.QtNetwork import QNetworkRequest
 from qgis.core import (
     QgsLocatorResult,
     QgsPointXY,
@@ -36,7 +34,7 @@ from swiss_locator.core.filters.map_geo_admin import map_geo_admin_url
 from swiss_locator.core.filters.swiss_locator_filter import SwissLocatorFilter
 from swiss_locator.core.results import LocationResult
 from swiss_locator.utils.html_stripper import strip_tags
-from swiss_locator.utils.utils import url_with_param, get_icon_path
+from swiss_locator.utils.utils import get_icon_path
 
 
 class SwissLocatorFilterLocation(SwissLocatorFilter):
@@ -96,8 +94,7 @@ class SwissLocatorFilterLocation(SwissLocatorFilter):
         # Try to get more info
         url = f"{MAP_SERVER_URL}/{layer}/{feature_id}"
         params = {"lang": self.lang, "sr": self.crs}
-        url = url_with_param(url, params)
-        request = QNetworkRequest(QUrl(url))
+        request = self.request_for_url(url, params, self.HEADERS)
         self.fetch_request(request, QgsFeedback(), self.parse_feature_response)
 
     def parse_feature_response(self, content, feedback: QgsFeedback):
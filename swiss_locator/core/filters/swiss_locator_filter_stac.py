@@ -1,6 +1,5 @@
 import json
 import os
-from copy import deepcopy
 
 from qgis.PyQt.QtCore import pyqtSignal
 from qgis.core import (
@@ -20,16 +19,29 @@ from swiss_locator.core.constants import USER_AGENT
 from swiss_locator.core.filters.filter_type import FilterType
 from swiss_locator.core.filters.map_geo_admin_stac import (
     collections_to_searchable_strings,
+    load_collections_snapshot,
     map_geo_admin_stac_items_url,
+    save_collections_snapshot,
 )
+from swiss_locator.core.filters.stac_download_queue import StacDownloadQueue
+from swiss_locator.core.filters.stac_probe_cache import (
+    COUNT_CLASS_FEW,
+    item_probe_cache,
+    probe_from_response,
+    probe_to_results,
+)
+from swiss_locator.core.filters.stac_search_index import StacSearchIndex
 from swiss_locator.core.filters.swiss_locator_filter import SwissLocatorFilter
 from swiss_locator.core.results import STACResult
-from swiss_locator.swissgeodownloader.api.api_caller_task import DownloadFilesTask
 from swiss_locator.swissgeodownloader.api.datageoadmin import ApiDataGeoAdmin
+from swiss_locator.swissgeodownloader.utils.archive_utils import (
+    ARCHIVE_KEEP,
+    isZipFile,
+)
 from swiss_locator.swissgeodownloader.utils.qgis_layer_creator_task import (
     createQgisLayersInTask,
 )
-from swiss_locator.utils.utils import get_save_location
+from swiss_locator.utils.utils import get_cache_dir, get_save_location
 
 FILE_TYPE_ICONS = {
     "default": "/mActionAddLayer.svg",
@@ -64,6 +76,8 @@ class SwissLocatorFilterSTAC(SwissLocatorFilter):
     Since the catalog does not provide a search endpoint to query collection
     names or titles, the search functionality is implemented by initially
     fetching all collections and storing titles and ids in a searchable list.
+    A snapshot of the collections is kept on disk, it is served at startup
+    while the collections are fetched again in the background.
     """
 
     HEADERS = {b"User-Agent": USER_AGENT}
@@ -74,19 +88,37 @@ class SwissLocatorFilterSTAC(SwissLocatorFilter):
         super().__init__(FilterType.STAC, iface, crs)
 
         self.stac_fetch_task: QgsTask | None = None
-        self.stac_download_task: QgsTask | None = None
+        self.search_index_task: QgsTask | None = None
+        self.stac_download_queue: StacDownloadQueue | None = None
         self.stac_layer_create_task: QgsTask | None = None
         self.stac_api_data_geo_admin = ApiDataGeoAdmin(self.lang)
         self.available_collections: dict[str, QgsStacCollection] = {}
         self.search_strings = []
         self.collection_ids = []
+        self.search_index = StacSearchIndex()
 
         if not data:
+            snapshot = load_collections_snapshot(self.snapshot_path())
+            if snapshot:
+                self.available_collections = snapshot[0]
+                self.search_strings = snapshot[1]
+                self.collection_ids = snapshot[2]
+                self.search_index = StacSearchIndex.from_collections(
+                    self.available_collections
+                )
+                self.build_search_index()
             self.fetch_stac_collections()
         else:
             self.available_collections = data[0]
             self.search_strings = data[1]
             self.collection_ids = data[2]
+            # The index is shared between clones
+            if len(data) > 3:
+                self.search_index = data[3]
+            else:
+                self.search_index = StacSearchIndex.from_collections(
+                    self.available_collections
+                )
 
     def fetch_stac_collections(self):
         self.info(self.tr("Fetching Swisstopo STAC collections"))
@@ -112,11 +144,71 @@ class SwissLocatorFilterSTAC(SwissLocatorFilter):
         self.search_strings, self.collection_ids = collections_to_searchable_strings(
             self.available_collections
         )
+        self.search_index = StacSearchIndex.from_collections(self.available_collections)
+        self.build_search_index()
+        try:
+            save_collections_snapshot(
+                self.snapshot_path(), self.available_collections, self.search_strings
+            )
+        except OSError as e:
+            self.info(
+                f"Not able to save the STAC collections snapshot: {e}",
+                Qgis.MessageLevel.Warning,
+            )
+
+    def snapshot_path(self) -> str:
+        # Titles and descriptions are translated, one snapshot per language
+        return os.path.join(get_cache_dir("stac"), f"collections_{self.lang}.json")
+
+    def build_search_index(self):
+        """
+        Indexes the collections along with their titles and descriptions in
+        the other languages of the metadata store in a background task, so
+        that they can be found with terms of any language. Until then the
+        index of the current language is used.
+        """
+        collections = self.available_collections
+        lang = self.lang
+        store = self.stac_api_data_geo_admin.geocatClient.store
+
+        def build(task):
+            metadata = store.export()
+            translations = {
+                coll_id: [
+                    value
+                    for locale, value in metadata.get(coll_id, {}).items()
+                    if locale != lang
+                ]
+                for coll_id in collections
+            }
+            return StacSearchIndex.from_collections(collections, translations)
+
+        def on_finished(exception, index: StacSearchIndex = None):
+            if exception or index is None:
+                self.info(
+                    f"Not able to index the STAC collections in all languages: "
+                    f"{exception}",
+                    Qgis.MessageLevel.Warning,
+                )
+            elif collections is self.available_collections:
+                self.search_index = index
+
+        self.search_index_task = QgsTask.fromFunction(
+            self.tr("Indexing Swisstopo STAC collections"),
+            build,
+            on_finished=on_finished,
+        )
+        QgsApplication.taskManager().addTask(self.search_index_task)
 
     def clone(self):
         return SwissLocatorFilterSTAC(
             crs=self.crs,
-            data=(self.available_collections, self.search_strings, self.collection_ids),
+            data=(
+                self.available_collections,
+                self.search_strings,
+                self.collection_ids,
+                self.search_index,
+            ),
         )
 
     def displayName(self):
@@ -126,17 +218,10 @@ class SwissLocatorFilterSTAC(SwissLocatorFilter):
         return "chd"
 
     def perform_local_search(self, search_term: str):
-        """Perform search on a list of strings containing the STAC collection
-        id and title, and return a sorted list of corresponding collection IDs
-         for the found matches. Results are ordered by the match positions.
+        """Search the STAC collections by title, id, description and keywords,
+        and return a list of the matching collection IDs, best matches first.
         """
-        search_term = search_term.lower()
-        matches = [
-            (i, s.find(search_term)) for (i, s) in enumerate(self.search_strings)
-        ]
-        valid_matches = [(i, pos) for (i, pos) in matches if pos >= 0]
-        sorted_matches = sorted(valid_matches, key=lambda x: x[1])
-        return [self.collection_ids[idx] for idx, _ in sorted_matches]
+        return self.search_index.search(search_term)
 
     def perform_fetch_results(self, search: str, feedback: QgsFeedback):
         result_limit = self.settings.filters[self.type.value]["limit"].value()
@@ -147,59 +232,44 @@ class SwissLocatorFilterSTAC(SwissLocatorFilter):
         matching_collections = self.perform_local_search(search)[:result_limit]
 
         # For each collection, request a few items to decide whether assets can
-        # be downloaded directly from the locator or a filter dialog is necessary
+        # be downloaded directly from the locator or a filter dialog is necessary.
+        # The answer is cached, so only collections never probed are requested.
+        probe_cache = item_probe_cache()
         requests = []
         for collection_id in matching_collections:
+            probe = probe_cache.get(collection_id, files_per_result_limit)
+            if probe:
+                self.create_probe_results(probe)
+                continue
             url, params = map_geo_admin_stac_items_url(
                 collection_id, files_per_result_limit
             )
             requests.append(self.request_for_url(url, params, self.HEADERS))
 
-        self.fetch_requests(requests, feedback, self.handle_content)
+        if requests:
+            self.fetch_requests(requests, feedback, self.handle_content)
 
     def handle_content(self, content, feedback: QgsFeedback):
-        response = json.loads(content)
-
-        if len(response.get("features", [])) == 0:
+        files_per_collection_limit = self.settings.filters[self.type.value][
+            "limit_files_per_result"
+        ].value()
+        probe = probe_from_response(json.loads(content), files_per_collection_limit)
+        if not probe:
             return
 
+        item_probe_cache().put(probe)
+        self.create_probe_results(probe)
+
+    def create_probe_results(self, probe: dict):
         try:
-            stac_collection = self.available_collections[
-                response["features"][0]["collection"]
-            ]
+            stac_collection = self.available_collections[probe["collection_id"]]
         except KeyError:
             return
 
-        files_per_collection_limit = self.settings.filters[self.type.value][
-            "limit_files_per_result"
-        ].value()
-        file_count = sum(
-            [len(item["assets"].values()) for item in response["features"]]
-        )
-
-        if file_count <= files_per_collection_limit:
-            results = []
-            # Analyse response and create stac result objects
-            for item in response["features"]:
-                for asset_id, asset in item["assets"].items():
-                    asset_result = STACResult(
-                        stac_collection.id(),
-                        stac_collection.title(),
-                        asset_id,
-                        asset.get("description"),
-                        asset.get("type"),
-                        asset.get("href"),
-                    )
-                    results.append(asset_result)
-                    if asset_result.is_streamable:
-                        # Create a second, streamable asset object
-                        asset_as_stream = deepcopy(asset_result)
-                        postfix = self.tr("streamed")
-                        asset_as_stream.asset_id += f" ({postfix})"
-                        asset_as_stream.path = (
-                            STACResult.STREAMED_SOURCE_PREFIX + asset.get("href")
-                        )
-                        results.append(asset_as_stream)
+        if probe["count_class"] == COUNT_CLASS_FEW:
+            results = probe_to_results(
+                probe, stac_collection.title(), self.tr("streamed")
+            )
 
             # Create locator entries
             for stac_result in results:
@@ -258,50 +328,59 @@ class SwissLocatorFilterSTAC(SwissLocatorFilter):
         return FILE_TYPE_ICONS.get("default")
 
     def download_asset(self, asset: STACResult):
-        folder_path = get_save_location(self.tr("Choose download location"))
-        if not folder_path:
+        settings = self.settings.filters[self.type.value]
+        # The folder is asked once and can be changed in the configuration
+        folder_path = settings["download_dir"].value()
+        if not folder_path or not os.path.isdir(folder_path):
+            folder_path = get_save_location(
+                self.tr("Choose download location"), folder_path or None
+            )
+            if not folder_path:
+                return
+            settings["download_dir"].setValue(folder_path)
+
+        if self.stac_download_queue is None:
+            # Assets are downloaded from the main thread only, not from clones
+            self.stac_download_queue = StacDownloadQueue(
+                self.stac_api_data_geo_admin, self.iface.messageBar()
+            )
+            self.stac_download_queue.asset_downloaded.connect(self.add_asset_to_qgis)
+            self.stac_download_queue.asset_failed.connect(self.on_download_error)
+        elif self.stac_download_queue.is_queued(asset):
             return
 
-        file_path = os.path.join(folder_path, asset.asset_id)
-        if os.path.exists(file_path):
-            os.remove(file_path)
-
-        # Download the asset in a separate event loop
-        asset.path = file_path
+        # An existing file is replaced once the download is complete
+        asset.path = os.path.join(folder_path, asset.asset_id)
         self.info(f"fetching {asset.href}")
-
-        def on_download_error():
-            level = Qgis.MessageLevel.Warning
-            msg = self.tr("Unable to download file {}").format(asset.asset_id)
-            self.info(msg, level)
-
-        self.stac_download_task = DownloadFilesTask(
-            self.stac_api_data_geo_admin,
-            self.iface.messageBar(),
-            self.tr("download {}").format(asset.asset_id),
-            fileList=[asset],
-            outputDir=folder_path,
-        )
-        # Listen for finished api call
-        self.stac_download_task.taskCompleted.connect(
-            lambda: self.add_asset_to_qgis(asset)
+        self.stac_download_queue.parallel_downloads = settings[
+            "parallel_downloads"
+        ].value()
+        self.stac_download_queue.bandwidth_limit = (
+            settings["bandwidth_limit"].value() * 1024
         )
-        self.stac_download_task.taskTerminated.connect(on_download_error)
-        # Add task to task manager
-        QgsApplication.taskManager().addTask(self.stac_download_task)
+        self.stac_download_queue.content_store_dir = settings[
+            "content_store_dir"
+        ].value()
+        self.stac_download_queue.enqueue(asset, folder_path)
+
+    def on_download_error(self, asset: STACResult):
+        level = Qgis.MessageLevel.Warning
+        msg = self.tr("Unable to download file {}").format(asset.asset_id)
+        self.info(msg, level)
 
     def add_asset_to_qgis(self, asset: STACResult):
         if not os.path.exists(asset.path) and not asset.is_streamed:
             return
 
-        if "zip" in asset.path:
+        archive_mode = self.settings.filters[self.type.value]["archive_mode"].value()
+        if isZipFile(asset.path) and archive_mode == ARCHIVE_KEEP:
             msg = self.tr("Download completed: {}").format(asset.asset_id)
             level = Qgis.MessageLevel.Success
             self.message_emitted.emit(self.displayName(), msg, level, None)
             self.info(msg, level)
             return
 
-        createQgisLayersInTask([asset], self.qgis_layer_created)
+        createQgisLayersInTask([asset], self.qgis_layer_created, archive_mode)
 
     def qgis_layer_created(
         self,
@@ -312,9 +391,12 @@ class SwissLocatorFilterSTAC(SwissLocatorFilter):
         msg = ""
         level = Qgis.MessageLevel.Info
         if layers:
-            layer = layers[0]
-            QgsProject.instance().addMapLayer(layer)
-            msg = self.tr("Added file {} to QGIS").format(layer.name())
+            # Archives can contain several datasets
+            for layer in layers:
+                QgsProject.instance().addMapLayer(layer)
+            msg = self.tr("Added file {} to QGIS").format(
+                ", ".join(layer.name() for layer in layers)
+            )
         if exception:
             msg = self.tr("Unable to add layer to QGIS: {}").format(exception)
             level = Qgis.MessageLevel.Warning
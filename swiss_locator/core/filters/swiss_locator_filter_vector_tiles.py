@@ -1,15 +1,29 @@
+import os
+
+from qgis.PyQt.QtCore import QUrl
 from qgis.gui import QgisInterface
 from qgis.core import (
+    Qgis,
     QgsApplication,
+    QgsCoordinateReferenceSystem,
+    QgsCoordinateTransform,
     QgsLocatorResult,
     QgsFeedback,
+    QgsProject,
 )
 from swiss_locator.core.constants import VECTOR_TILES_BASE_URL
 from swiss_locator.core.filters.swiss_locator_filter import (
     SwissLocatorFilter,
 )
 from swiss_locator.core.filters.filter_type import FilterType
-from swiss_locator.core.results import VectorTilesLayerResult
+from swiss_locator.core.results import VectorTilesLayerResult, VectorTilesExportResult
+from swiss_locator.core.vector_tiles.offline_package import (
+    MAX_TILES,
+    VectorTilesPackageTask,
+    offline_package,
+    tile_count,
+)
+from swiss_locator.utils.utils import get_save_location
 
 
 class SwissLocatorFilterVectorTiles(SwissLocatorFilter):
@@ -18,6 +32,7 @@ class SwissLocatorFilterVectorTiles(SwissLocatorFilter):
 
         # Show all available base maps without requiring a search
         self.minimum_search_length = 0
+        self.export_task: VectorTilesPackageTask | None = None
 
     def clone(self):
         return SwissLocatorFilterVectorTiles(crs=self.crs)
@@ -53,6 +68,8 @@ class SwissLocatorFilterVectorTiles(SwissLocatorFilter):
                 "style": f"{VECTOR_TILES_BASE_URL}/styles/ch.swisstopo.imagerybasemap.vt/style.json",
             },
         }
+        offline_dir = self.settings.filters[self.type.value]["offline_dir"].value()
+        offline_group = self.tr("Offline packages")
 
         for keyword in list(data.keys()):
             results = {}
@@ -75,9 +92,149 @@ class SwissLocatorFilterVectorTiles(SwissLocatorFilter):
 
                 results[result] = score
 
+                # Base maps exported before can be added without network
+                package = offline_package(offline_dir, data[keyword]["style"])
+                if package:
+                    archive_path, style_path = package
+                    result = QgsLocatorResult()
+                    result.filter = self
+                    result.group = offline_group
+                    result.icon = QgsApplication.getThemeIcon(
+                        "/mActionAddVectorTileLayer.svg"
+                    )
+                    result.displayString = self.tr("{} (offline)").format(
+                        data[keyword]["title"]
+                    )
+                    result.description = archive_path
+                    result.userData = VectorTilesLayerResult(
+                        layer=data[keyword]["title"],
+                        title=data[keyword]["title"],
+                        url=archive_path,
+                        style=QUrl.fromLocalFile(style_path).toString(),
+                        tiles_type="mbtiles",
+                    ).as_definition()
+
+                    results[result] = score
+
+                result = QgsLocatorResult()
+                result.filter = self
+                result.group = offline_group
+                result.icon = QgsApplication.getThemeIcon("/mActionFileSave.svg")
+                result.displayString = self.tr(
+                    "{}: export current map extent for offline use"
+                ).format(data[keyword]["title"])
+                result.userData = VectorTilesExportResult(
+                    layer=data[keyword]["title"],
+                    title=data[keyword]["title"],
+                    url=data[keyword]["url"],
+                    style=data[keyword]["style"],
+                ).as_definition()
+
+                results[result] = score
+
             # sort the results with score
             # results = sorted([result for (result, score) in results.items()])
 
             for result in results:
                 self.resultFetched.emit(result)
                 self.result_found = True
+
+    def export_vector_tiles_package(self, swiss_result: VectorTilesExportResult):
+        if self.export_task in QgsApplication.taskManager().activeTasks():
+            self.message_emitted.emit(
+                self.displayName(),
+                self.tr("An offline package is already being exported."),
+                Qgis.MessageLevel.Warning,
+                None,
+            )
+            return
+
+        offline_dir_setting = self.settings.filters[self.type.value]["offline_dir"]
+        offline_dir = offline_dir_setting.value()
+        if not offline_dir or not os.path.isdir(offline_dir):
+            offline_dir = get_save_location(
+                self.tr("Choose a folder for offline base map packages")
+            )
+            if not offline_dir:
+                return
+            offline_dir_setting.setValue(offline_dir)
+
+        transform = QgsCoordinateTransform(
+            self.map_canvas.mapSettings().destinationCrs(),
+            QgsCoordinateReferenceSystem("EPSG:4326"),
+            QgsProject.instance(),
+        )
+        extent = transform.transformBoundingBox(self.map_canvas.extent())
+        extent = [
+            extent.xMinimum(),
+            extent.yMinimum(),
+            extent.xMaximum(),
+            extent.yMaximum(),
+        ]
+        zmax = self.settings.filters[self.type.value]["offline_max_zoom"].value()
+
+        count = tile_count(*extent, 0, zmax)
+        if count > MAX_TILES:
+            self.message_emitted.emit(
+                self.displayName(),
+                self.tr(
+                    "The current map extent requires {} tiles, zoom in to export "
+                    "less than {} tiles."
+                ).format(count, MAX_TILES),
+                Qgis.MessageLevel.Warning,
+                None,
+            )
+            return
+
+        self.info(f"Exporting up to {count} tiles of {swiss_result.title}")
+        self.export_task = VectorTilesPackageTask(
+            self.tr("Export offline package of {}").format(swiss_result.title),
+            swiss_result.style,
+            swiss_result.url,
+            extent,
+            0,
+            zmax,
+            offline_dir,
+        )
+        task = self.export_task
+        task.taskCompleted.connect(
+            lambda: self.vector_tiles_package_exported(task, swiss_result)
+        )
+        task.taskTerminated.connect(
+            lambda: self.vector_tiles_package_exported(task, swiss_result)
+        )
+        QgsApplication.taskManager().addTask(task)
+
+    def vector_tiles_package_exported(
+        self, task: VectorTilesPackageTask, swiss_result: VectorTilesExportResult
+    ):
+        if task.exception or not task.style_path:
+            msg = self.tr("Offline package of {} could not be exported: {}").format(
+                swiss_result.title, task.exception or self.tr("canceled")
+            )
+            self.info(msg, Qgis.MessageLevel.Warning)
+            self.message_emitted.emit(
+                self.displayName(), msg, Qgis.MessageLevel.Warning, None
+            )
+            return
+
+        msg = self.tr(
+            "Offline package of {} exported: {} tiles downloaded, {} already present"
+        ).format(swiss_result.title, task.downloaded_tiles, task.skipped_tiles)
+        level = Qgis.MessageLevel.Success
+        if task.failed_tiles:
+            msg += self.tr(", {} failed").format(task.failed_tiles)
+            level = Qgis.MessageLevel.Warning
+        self.info(msg, level)
+        self.message_emitted.emit(self.displayName(), msg, level, None)
+
+        offline_result = VectorTilesLayerResult(
+            layer=swiss_result.layer,
+            title=swiss_result.title,
+            url=task.archive_path,
+            style=QUrl.fromLocalFile(task.style_path).toString(),
+            tiles_type="mbtiles",
+        )
+        self.load_vector_tiles_layer(
+            offline_result, self.tr("{} (offline)").format(swiss_result.title)
+        )
@@ -34,6 +34,10 @@ from swiss_locator.core.filters.swiss_locator_filter import (
 )
 from swiss_locator.core.filters.filter_type import FilterType
 from swiss_locator.core.results import WMSLayerResult
+from swiss_locator.swissgeodownloader.api.http_compression import (
+    acceptCompression,
+    replyContent,
+)
 
 import xml.etree.ElementTree as ET
 import urllib.parse
@@ -71,14 +75,14 @@ class SwissLocatorFilterWMTS(SwissLocatorFilter):
         if self.capabilities is None:
             self.content.cancel()
             nam = QgsBlockingNetworkRequest()
-            request = QNetworkRequest(QUrl(self.capabilities_url))
+            request = acceptCompression(QNetworkRequest(QUrl(self.capabilities_url)))
             nam.get(request, forceRefresh=True)
             reply = nam.reply()
             if (
                 reply.attribute(QNetworkRequest.Attribute.HttpStatusCodeAttribute)
                 == 200
             ):  # other codes are handled by NetworkAccessManager
-                self.capabilities = ET.fromstring(reply.content().data().decode("utf8"))
+                self.capabilities = ET.fromstring(replyContent(reply))
             else:
                 self.info(
                     self.tr(
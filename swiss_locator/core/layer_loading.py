@@ -0,0 +1,134 @@
+import threading
+import time
+from collections.abc import Callable
+
+from qgis.PyQt.QtCore import QDateTime, QUrl
+from qgis.PyQt.QtNetwork import QNetworkCacheMetaData, QNetworkReply, QNetworkRequest
+from qgis.core import (
+    QgsApplication,
+    QgsBlockingNetworkRequest,
+    QgsMapLayer,
+    QgsNetworkAccessManager,
+    QgsTask,
+)
+
+from swiss_locator.core.constants import USER_AGENT
+
+# Capabilities documents of the Swiss services change rarely, but are large
+# and slow to download (several MB for the WMTS of geo.admin.ch)
+CAPABILITIES_TTL = 6 * 3600
+
+# URL of the capabilities document => time when it was put in the cache
+_capabilities_cache: dict[str, float] = {}
+_capabilities_lock = threading.Lock()
+
+
+def capabilities_url(url: str) -> str:
+    """
+    Returns the URL of the capabilities document which the WMS provider
+    requests for the given service URL. It must match exactly, otherwise the
+    provider does not find the document in the network cache.
+    """
+    if "SERVICE=WMTS" in url or "/WMTSCapabilities.xml" in url:
+        return url
+    if "?" not in url:
+        url += "?"
+    elif not url.endswith("?") and not url.endswith("&"):
+        url += "&"
+    return f"{url}SERVICE=WMS&REQUEST=GetCapabilities"
+
+
+def warm_capabilities_cache(url: str):
+    """
+    Downloads the capabilities document of a service, unless done recently,
+    and keeps it in the QGIS network cache for CAPABILITIES_TTL, regardless of
+    the cache headers of the server. The WMS provider prefers the network
+    cache, so that constructing further layers of the same service does not
+    involve any download.
+    This is a blocking call and must not be run in the main thread.
+    """
+    url = capabilities_url(url)
+    with _capabilities_lock:
+        cached_at = _capabilities_cache.get(url)
+    if cached_at and time.time() - cached_at < CAPABILITIES_TTL:
+        return
+
+    request = QNetworkRequest(QUrl(url))
+    request.setRawHeader(b"User-Agent", USER_AGENT)
+    http = QgsBlockingNetworkRequest()
+    http.get(request)
+    reply = http.reply()
+    if reply.error() != QNetworkReply.NetworkError.NoError:
+        # let the provider report the error
+        return
+
+    cache = QgsNetworkAccessManager.instance().cache()
+    if cache is not None:
+        meta_data = QNetworkCacheMetaData()
+        meta_data.setUrl(QUrl(url))
+        meta_data.setRawHeaders(
+            [
+                (header, reply.rawHeader(header))
+                for header in reply.rawHeaderList()
+                if header.data().lower() not in (b"cache-control", b"expires")
+            ]
+        )
+        meta_data.setLastModified(QDateTime.currentDateTimeUtc())
+        meta_data.setExpirationDate(
+            QDateTime.currentDateTimeUtc().addSecs(CAPABILITIES_TTL)
+        )
+        meta_data.setSaveToDisk(True)
+        device = cache.prepare(meta_data)
+        if device is not None:
+            device.write(reply.content())
+            cache.insert(device)
+
+    with _capabilities_lock:
+        _capabilities_cache[url] = time.time()
+
+
+class LayerLoadingTask(QgsTask):
+    """
+    Constructs map layers in a background thread, since the providers may
+    need to download capabilities or metadata on construction.
+    The layers are handed back to the main thread and available in the
+    `layers` attribute once the task is completed.
+    """
+
+    def __init__(
+        self,
+        description: str,
+        create_layers: Callable[[], list[QgsMapLayer]],
+        service_url: str = None,
+    ):
+        """
+        :param create_layers: creates the layers, the last one being the main one
+        :param service_url: if given, the capabilities of the service are
+                            cached before the layers are created
+        """
+        super().__init__(description, QgsTask.Flag.CanCancel)
+        self.create_layers = create_layers
+        self.service_url = service_url
+        self.layers: list[QgsMapLayer] = []
+        self.exception = None
+
+    def run(self):
+        try:
+            if self.service_url:
+                warm_capabilities_cache(self.service_url)
+            if self.isCanceled():
+                return False
+
+            layers = self.create_layers()
+            if not layers or not layers[-1].isValid():
+                return False
+
+            main_thread = QgsApplication.instance().thread()
+            for layer in layers:
+                layer.moveToThread(main_thread)
+            self.layers = layers
+            return True
+
+        except Exception as e:
+            self.exception = str(e)
+            return False
@@ -20,6 +20,10 @@ from qgis.core import (
 from swiss_locator.core.profiles.profile_results import SwissProfileResults
 from swiss_locator.core.profiles.profile_url import profile_url
 from swiss_locator.utils.utils import url_with_param
+from swiss_locator.swissgeodownloader.api.http_compression import (
+    acceptCompression,
+    replyContent,
+)
 
 
 class SwissProfileGenerator(QgsAbstractProfileGenerator):
@@ -55,13 +59,12 @@ class SwissProfileGenerator(QgsAbstractProfileGenerator):
 
         network_access_manager = QgsNetworkAccessManager.instance()
 
-        req = QNetworkRequest(QUrl(url))
+        req = acceptCompression(QNetworkRequest(QUrl(url)))
         reply = network_access_manager.blockingGet(req, feedback=self.__feedback)
 
         if reply.error() == QNetworkReply.NetworkError.NoError:
-            content = reply.content()
             try:
-                result = json.loads(str(content, "utf-8"))
+                result = json.loads(replyContent(reply))
             except json.decoder.JSONDecodeError as e:
                 QgsMessageLog.logMessage(
                     f"Unable to parse results from Profile service. Details: {e.msg}",
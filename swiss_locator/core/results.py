@@ -174,11 +174,14 @@ class VectorTilesLayerResult(ResultBase):
         title,
         url: str = None,
         style: str = None,
+        tiles_type: str = "xyz",
     ):
         self.title = title
         self.layer = layer
         self.url = url
         self.style = style
+        # xyz for online tiles, mbtiles for offline packages
+        self.tiles_type = tiles_type
 
     @staticmethod
     def from_dict(dict_data: dict):
@@ -187,6 +190,7 @@ class VectorTilesLayerResult(ResultBase):
             dict_data["title"],
             dict_data["url"],
             style=dict_data.get("style"),
+            tiles_type=dict_data.get("tiles_type", "xyz"),
         )
 
     def as_definition(self):
@@ -196,6 +200,38 @@ class VectorTilesLayerResult(ResultBase):
             "layer": self.layer,
             "url": self.url,
             "style": self.style,
+            "tiles_type": self.tiles_type,
+        }
+        return json.dumps(definition)
+
+
+class VectorTilesExportResult(ResultBase):
+    """Exports a vector tile base map to an offline package"""
+
+    result_type = "VectorTilesExportResult"
+
+    def __init__(self, layer, title, url: str, style: str):
+        self.title = title
+        self.layer = layer
+        self.url = url
+        self.style = style
+
+    @staticmethod
+    def from_dict(dict_data: dict):
+        return VectorTilesExportResult(
+            dict_data["layer"],
+            dict_data["title"],
+            dict_data["url"],
+            dict_data["style"],
+        )
+
+    def as_definition(self):
+        definition = {
+            "type": "VectorTilesExportResult",
+            "title": self.title,
+            "layer": self.layer,
+            "url": self.url,
+            "style": self.style,
         }
         return json.dumps(definition)
 
@@ -213,6 +249,8 @@ class STACResult(ResultBase):
         media_type: str,
         href: str,
         path: str = "",
+        file_size: int | None = None,
+        checksum: str | None = None,
     ):
         self.collection_id = collection_id
         self.collection_name = collection_name
@@ -221,8 +259,14 @@ class STACResult(ResultBase):
         self.media_type = media_type
         self.href = href
         self.path = path
+        # STAC properties 'file:size' and 'file:checksum', used to skip
+        #  files that have already been downloaded
+        self.file_size = file_size
+        self.checksum = checksum
         # Necessary for Swiss Geo Downloader compatibility
         self.id = asset_id
+        self.fileSize = file_size
+        self.properties = {"file:checksum": checksum} if checksum else {}
 
     def as_definition(self):
         definition = {
@@ -234,6 +278,8 @@ class STACResult(ResultBase):
             "media_type": self.media_type,
             "href": self.href,
             "path": self.path,
+            "file_size": self.file_size,
+            "checksum": self.checksum,
         }
         return json.dumps(definition)
 
@@ -247,6 +293,8 @@ class STACResult(ResultBase):
             dict_data["media_type"],
             dict_data["href"],
             dict_data["path"],
+            dict_data.get("file_size"),
+            dict_data.get("checksum"),
         )
 
     @property
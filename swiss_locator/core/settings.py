@@ -34,6 +34,7 @@ from qgis.core import (
 )
 
 from swiss_locator.core.filters.filter_type import FilterType
+from swiss_locator.swissgeodownloader.utils.settings import downloadSettings
 
 PLUGIN_NAME = "swiss_locator_plugin"
 
@@ -91,6 +92,14 @@ class Settings:
                     "limit": QgsSettingsEntryInteger(
                         f"{FilterType.VectorTiles.value}_limit", settings_node, 8
                     ),
+                    "offline_dir": QgsSettingsEntryString(
+                        f"{FilterType.VectorTiles.value}_offline_dir", settings_node, ""
+                    ),
+                    "offline_max_zoom": QgsSettingsEntryInteger(
+                        f"{FilterType.VectorTiles.value}_offline_max_zoom",
+                        settings_node,
+                        14,
+                    ),
                 },
                 FilterType.Feature.value: {
                     "priority": QgsSettingsEntryEnumFlag(
@@ -126,6 +135,13 @@ class Settings:
                         settings_node,
                         5,
                     ),
+                    "download_dir": QgsSettingsEntryString(
+                        f"{FilterType.STAC.value}_download_dir",
+                        settings_node,
+                        "",
+                    ),
+                    # Shared with the download dock
+                    **downloadSettings(),
                 },
             }
             cls.filters = filters
@@ -0,0 +1,467 @@
+import gzip
+import hashlib
+import json
+import math
+import os
+import random
+import sqlite3
+from collections import deque
+from urllib.parse import quote
+
+from qgis.PyQt.QtCore import QEventLoop, QTimer, QUrl
+from qgis.PyQt.QtNetwork import QNetworkReply, QNetworkRequest
+from qgis.core import QgsNetworkAccessManager, QgsTask
+
+from swiss_locator.core.constants import USER_AGENT
+
+PACKAGE_EXTENSION = ".mbtiles"
+PACKAGE_METADATA_KEY = "swisslocator:package"
+STYLE_FILE_NAME = "style.json"
+
+# Web mercator is only defined up to this latitude
+MAX_LATITUDE = 85.0511287798
+# Abort before starting a download that would obviously take hours
+MAX_TILES = 250000
+PARALLEL_REQUESTS = 8
+MAX_RETRIES = 3
+RETRY_DELAY_MS = 500
+# Glyph ranges covering latin characters including accents and
+# typographic punctuation, enough for Swiss place names
+GLYPH_RANGES = ("0-255", "256-511", "8192-8447")
+
+
+def tile_range(west: float, south: float, east: float, north: float, zoom: int):
+    """
+    Computes the XYZ tile indices covering a WGS84 extent
+    :return: a tuple (x_min, x_max, y_min, y_max), bounds included
+    """
+    n = 2**zoom
+
+    def column(lon):
+        return min(n - 1, max(0, int((lon + 180.0) / 360.0 * n)))
+
+    def row(lat):
+        lat = max(min(lat, MAX_LATITUDE), -MAX_LATITUDE)
+        merc_y = math.asinh(math.tan(math.radians(lat)))
+        return min(n - 1, max(0, int((1.0 - merc_y / math.pi) / 2.0 * n)))
+
+    return column(west), column(east), row(north), row(south)
+
+
+def tiles_for_extent(
+    west: float, south: float, east: float, north: float, zmin: int, zmax: int
+):
+    """Yields the (z, x, y) tuples of the tile pyramid covering an extent."""
+    for z in range(zmin, zmax + 1):
+        x_min, x_max, y_min, y_max = tile_range(west, south, east, north, z)
+        for x in range(x_min, x_max + 1):
+            for y in range(y_min, y_max + 1):
+                yield z, x, y
+
+
+def tile_count(
+    west: float, south: float, east: float, north: float, zmin: int, zmax: int
+) -> int:
+    count = 0
+    for z in range(zmin, zmax + 1):
+        x_min, x_max, y_min, y_max = tile_range(west, south, east, north, z)
+        count += (x_max - x_min + 1) * (y_max - y_min + 1)
+    return count
+
+
+def offline_package(offline_dir: str, style_url: str):
+    """
+    Looks for an exported offline package of a base map style
+    :return: a tuple (archive path, style path) or None if no complete
+             package is available
+    """
+    if not offline_dir:
+        return None
+    style_path = os.path.join(offline_dir, style_name(style_url), STYLE_FILE_NAME)
+    if not os.path.exists(style_path):
+        return None
+    try:
+        with open(style_path, encoding="utf-8") as f:
+            archive_name = json.load(f).get("metadata", {}).get(PACKAGE_METADATA_KEY)
+    except (OSError, ValueError):
+        return None
+    if not archive_name:
+        return None
+    archive_path = os.path.join(offline_dir, archive_name)
+    if not os.path.exists(archive_path):
+        return None
+    return archive_path, style_path
+
+
+def style_name(style_url: str) -> str:
+    """Returns the name of a style from its URL, e.g. ch.swisstopo.basemap.vt"""
+    parts = [part for part in QUrl(style_url).path().split("/") if part]
+    if len(parts) >= 2 and parts[-1] == STYLE_FILE_NAME:
+        return parts[-2]
+    return hashlib.sha1(style_url.encode("utf-8")).hexdigest()
+
+
+class MBTilesArchive:
+    """
+    Writes vector tiles to an MBTiles archive.
+    Identical tiles (e.g. empty ocean or lake tiles) are stored only once,
+    using the deduplicated schema with a `tiles` view on top of the
+    `map` and `images` tables.
+    Tiles missing on the server are recorded in `map` without a tile id, so
+    that they are skipped when a package is extended but do not show up in
+    the `tiles` view.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS map (
+                zoom_level INTEGER,
+                tile_column INTEGER,
+                tile_row INTEGER,
+                tile_id TEXT
+            );
+            CREATE UNIQUE INDEX IF NOT EXISTS map_index
+                ON map (zoom_level, tile_column, tile_row);
+            CREATE TABLE IF NOT EXISTS images (tile_id TEXT PRIMARY KEY, tile_data BLOB);
+            CREATE VIEW IF NOT EXISTS tiles AS
+                SELECT map.zoom_level AS zoom_level,
+                       map.tile_column AS tile_column,
+                       map.tile_row AS tile_row,
+                       images.tile_data AS tile_data
+                FROM map JOIN images ON images.tile_id = map.tile_id;
+            """
+        )
+
+    def existing_tiles(self, zoom: int) -> set:
+        """Returns the XYZ (x, y) indices of the tiles stored for a zoom level"""
+        rows = self.connection.execute(
+            "SELECT tile_column, tile_row FROM map WHERE zoom_level = ?", (zoom,)
+        )
+        return {(x, 2**zoom - 1 - tms_y) for x, tms_y in rows}
+
+    def write_tile(self, z: int, x: int, y: int, data: bytes):
+        tile_id = hashlib.md5(data).hexdigest()
+        # QGIS expects gzipped tiles in MBTiles archives, mtime is fixed so
+        # that identical tiles result in identical blobs
+        if not data.startswith(b"\x1f\x8b"):
+            data = gzip.compress(data, mtime=0)
+        self.connection.execute(
+            "INSERT OR IGNORE INTO images (tile_id, tile_data) VALUES (?, ?)",
+            (tile_id, data),
+        )
+        # MBTiles uses TMS, with rows starting at the bottom
+        self.connection.execute(
+            "INSERT OR REPLACE INTO map VALUES (?, ?, ?, ?)",
+            (z, x, 2**z - 1 - y, tile_id),
+        )
+
+    def write_empty_tile(self, z: int, x: int, y: int):
+        self.connection.execute(
+            "INSERT OR REPLACE INTO map VALUES (?, ?, ?, NULL)",
+            (z, x, 2**z - 1 - y),
+        )
+
+    def metadata(self) -> dict:
+        return dict(self.connection.execute("SELECT name, value FROM metadata"))
+
+    def update_metadata(self, values: dict):
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO metadata (name, value) VALUES (?, ?)",
+            [(k, str(v)) for k, v in values.items()],
+        )
+
+    def commit(self):
+        self.connection.commit()
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+
+class VectorTilesPackageTask(QgsTask):
+    """
+    Downloads the tile pyramid of a vector tile base map for an extent and
+    a zoom range into a local MBTiles archive, and stores a copy of the style
+    with its sprites and glyphs next to it.
+    Tiles already present in the archive are not downloaded again, so that
+    a package can be extended to new areas cheaply.
+    Raster sources of a style (e.g. the imagery base map) are kept online.
+    """
+
+    def __init__(
+        self,
+        description: str,
+        style_url: str,
+        tiles_url: str,
+        extent: list[float],
+        zmin: int,
+        zmax: int,
+        output_dir: str,
+    ):
+        super().__init__(description, QgsTask.Flag.CanCancel)
+        self.style_url = style_url
+        self.tiles_url = tiles_url
+        self.extent = extent
+        self.zmin = zmin
+        self.zmax = zmax
+        self.output_dir = output_dir
+        self.style_dir = os.path.join(output_dir, style_name(style_url))
+        self.archive_path = None
+        self.style_path = None
+        self.downloaded_tiles = 0
+        self.skipped_tiles = 0
+        self.failed_tiles = 0
+        self.exception = None
+
+    def run(self):
+        try:
+            style = json.loads(self._fetch(self.style_url))
+            source_id, tile_json = self._vector_source(style)
+            self.archive_path = os.path.join(
+                self.output_dir, f"{source_id}{PACKAGE_EXTENSION}"
+            )
+            os.makedirs(self.style_dir, exist_ok=True)
+
+            self._download_tiles(tile_json)
+            if self.isCanceled():
+                return False
+
+            self._localize_style(style, source_id, tile_json)
+            return not self.isCanceled()
+
+        except Exception as e:
+            self.exception = str(e)
+            return False
+
+    def _vector_source(self, style: dict) -> tuple[str, dict]:
+        for source_id, source in style.get("sources", {}).items():
+            if source.get("type") != "vector":
+                continue
+            if "tiles" in source:
+                return source_id, source
+            if source.get("url"):
+                return source_id, json.loads(self._fetch(source["url"]))
+        # Fall back to the tile URL given by the locator result
+        return style_name(self.style_url), {"tiles": [self.tiles_url]}
+
+    def _download_tiles(self, tile_json: dict):
+        west, south, east, north = self.extent
+        if tile_json.get("bounds"):
+            b_west, b_south, b_east, b_north = tile_json["bounds"]
+            west, south = max(west, b_west), max(south, b_south)
+            east, north = min(east, b_east), min(north, b_north)
+            if west >= east or south >= north:
+                raise Exception("The extent does not overlap the base map")
+        zmin = max(self.zmin, int(tile_json.get("minzoom", self.zmin)))
+        zmax = min(self.zmax, int(tile_json.get("maxzoom", self.zmax)))
+        template = tile_json["tiles"][0]
+
+        archive = MBTilesArchive(self.archive_path)
+        try:
+            tiles = {}
+            for z in range(zmin, zmax + 1):
+                existing = archive.existing_tiles(z)
+                for _z, x, y in tiles_for_extent(west, south, east, north, z, z):
+                    if (x, y) in existing:
+                        self.skipped_tiles += 1
+                        continue
+                    tiles[(z, x, y)] = (
+                        template.replace("{z}", str(z))
+                        .replace("{x}", str(x))
+                        .replace("{y}", str(y))
+                    )
+
+            def write_tile(tile, data):
+                # Missing tiles are empty, only their coordinates are stored
+                if data:
+                    archive.write_tile(*tile, data)
+                else:
+                    archive.write_empty_tile(*tile)
+                self.downloaded_tiles += 1
+                if self.downloaded_tiles % 500 == 0:
+                    archive.commit()
+
+            self.failed_tiles = len(self._fetch_all(tiles, write_tile, True))
+
+            # Extend the metadata of previous exports
+            metadata = archive.metadata()
+            if metadata.get("bounds"):
+                old = [float(c) for c in metadata["bounds"].split(",")]
+                west, south = min(west, old[0]), min(south, old[1])
+                east, north = max(east, old[2]), max(north, old[3])
+                zmin = min(zmin, int(metadata["minzoom"]))
+                zmax = max(zmax, int(metadata["maxzoom"]))
+            metadata = {
+                "name": os.path.basename(self.archive_path),
+                "format": "pbf",
+                "type": "baselayer",
+                "bounds": f"{west},{south},{east},{north}",
+                "center": f"{(west + east) / 2},{(south + north) / 2},{zmin}",
+                "minzoom": zmin,
+                "maxzoom": zmax,
+            }
+            if tile_json.get("vector_layers"):
+                metadata["json"] = json.dumps(
+                    {"vector_layers": tile_json["vector_layers"]}
+                )
+            archive.update_metadata(metadata)
+        finally:
+            archive.close()
+
+    def _localize_style(self, style: dict, source_id: str, tile_json: dict):
+        """Rewrites the style so that it points to the local archive and
+        to local copies of its sprites and glyphs."""
+        archive_url = "mbtiles://" + QUrl.fromLocalFile(self.archive_path).path()
+        style["sources"][source_id] = {
+            "type": "vector",
+            "url": archive_url,
+            "minzoom": tile_json.get("minzoom", self.zmin),
+            "maxzoom": tile_json.get("maxzoom", self.zmax),
+        }
+
+        sprite = style.get("sprite")
+        if isinstance(sprite, str) and sprite:
+            files = {
+                f"sprite{scale}{ext}": f"{sprite}{scale}{ext}"
+                for scale in ("", "@2x")
+                for ext in (".json", ".png")
+            }
+            self._fetch_all(files, self._write_style_file)
+            style["sprite"] = QUrl.fromLocalFile(
+                os.path.join(self.style_dir, "sprite")
+            ).toString()
+
+        glyphs = style.get("glyphs")
+        if glyphs:
+            font_stacks = set()
+            for layer in style.get("layers", []):
+                fonts = layer.get("layout", {}).get("text-font")
+                if isinstance(fonts, list) and all(isinstance(f, str) for f in fonts):
+                    font_stacks.add(",".join(fonts))
+            files = {
+                os.path.join(
+                    "glyphs", font_stack, f"{glyph_range}.pbf"
+                ): glyphs.replace("{fontstack}", quote(font_stack)).replace(
+                    "{range}", glyph_range
+                )
+                for font_stack in font_stacks
+                for glyph_range in GLYPH_RANGES
+            }
+            self._fetch_all(files, self._write_style_file)
+            glyphs_dir = QUrl.fromLocalFile(
+                os.path.join(self.style_dir, "glyphs")
+            ).toString()
+            style["glyphs"] = f"{glyphs_dir}/{{fontstack}}/{{range}}.pbf"
+
+        style.setdefault("metadata", {})[PACKAGE_METADATA_KEY] = os.path.basename(
+            self.archive_path
+        )
+        self.style_path = os.path.join(self.style_dir, STYLE_FILE_NAME)
+        with open(self.style_path, "w", encoding="utf-8") as f:
+            json.dump(style, f)
+
+    def _write_style_file(self, name: str, data: bytes):
+        if not data:
+            return
+        path = os.path.join(self.style_dir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+
+    @staticmethod
+    def _request(url: str) -> QNetworkRequest:
+        request = QNetworkRequest(QUrl(url))
+        request.setRawHeader(b"User-Agent", USER_AGENT)
+        return request
+
+    def _fetch(self, url: str) -> bytes:
+        """Fetches a single resource, used for style and TileJSON documents"""
+        content = {}
+        failed = self._fetch_all(
+            {url: url}, lambda _url, data: content.update(data=data)
+        )
+        if failed or not content.get("data"):
+            raise Exception(f"Could not load {url}")
+        return content["data"]
+
+    def _fetch_all(self, urls: dict, slot, report_progress: bool = False) -> list:
+        """
+        Fetches URLs concurrently in an event loop of the task thread.
+        Failed requests are retried with an exponential backoff.
+        :param urls: the URLs to fetch, by key
+        :param slot: called with the key and the content of each reply,
+                     the content is empty if the resource does not exist
+        :param report_progress: if True, the task progress follows the requests
+        :return: the keys of the requests which could not be fetched
+        """
+        nam = QgsNetworkAccessManager.instance()
+        loop = QEventLoop()
+        pending = deque((key, url, 0) for key, url in urls.items())
+        replies = {}
+        failed = []
+        state = {"done": 0, "retrying": 0}
+        total = max(len(urls), 1)
+
+        def start_requests():
+            while (
+                pending and len(replies) < PARALLEL_REQUESTS and not self.isCanceled()
+            ):
+                key, url, attempt = pending.popleft()
+                reply = nam.get(self._request(url))
+                replies[reply] = (key, url, attempt)
+                reply.finished.connect(lambda _reply=reply: on_finished(_reply))
+            if not replies and not state["retrying"]:
+                if not pending or self.isCanceled():
+                    loop.quit()
+
+        def retry(request):
+            state["retrying"] -= 1
+            pending.append(request)
+            start_requests()
+
+        def on_finished(reply):
+            key, url, attempt = replies.pop(reply)
+            status = reply.attribute(QNetworkRequest.Attribute.HttpStatusCodeAttribute)
+            if reply.error() == QNetworkReply.NetworkError.NoError:
+                slot(key, reply.readAll().data())
+                state["done"] += 1
+            elif status in (204, 404):
+                slot(key, b"")
+                state["done"] += 1
+            elif attempt < MAX_RETRIES and not self.isCanceled():
+                delay = RETRY_DELAY_MS * 2**attempt
+                delay += random.randint(0, RETRY_DELAY_MS)
+                state["retrying"] += 1
+                QTimer.singleShot(
+                    delay, lambda _request=(key, url, attempt + 1): retry(_request)
+                )
+            else:
+                failed.append(key)
+                state["done"] += 1
+            reply.deleteLater()
+            if report_progress:
+                self.setProgress(100 * state["done"] / total)
+            start_requests()
+
+        # Poll for task cancellation while waiting for the network replies
+        def check_canceled():
+            if self.isCanceled():
+                for reply in list(replies.keys()):
+                    reply.abort()
+                loop.quit()
+
+        timer = QTimer()
+        timer.setInterval(200)
+        timer.timeout.connect(check_canceled)
+        timer.start()
+
+        start_requests()
+        if replies or state["retrying"]:
+            loop.exec(QEventLoop.ProcessEventsFlag.ExcludeUserInputEvents)
+        timer.stop()
+
+        return failed
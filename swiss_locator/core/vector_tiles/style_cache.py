@@ -0,0 +1,261 @@
+import hashlib
+import json
+import os
+
+from qgis.PyQt.QtCore import QUrl
+from qgis.PyQt.QtNetwork import QNetworkReply, QNetworkRequest
+from qgis.PyQt.QtXml import QDomDocument
+from qgis.core import (
+    Qgis,
+    QgsApplication,
+    QgsBlockingNetworkRequest,
+    QgsMapLayer,
+    QgsRasterLayer,
+    QgsTask,
+    QgsVectorLayer,
+    QgsVectorTileLayer,
+    QgsVectorTileUtils,
+)
+
+from swiss_locator.core.constants import USER_AGENT
+from swiss_locator.utils.utils import get_cache_dir
+
+CACHE_DIR_NAME = "vector_tiles_styles"
+ENTRY_FILE_NAME = "entry.json"
+STYLE_FILE_NAME = "style.qml"
+
+
+def style_cache_dir(style_url: str) -> str:
+    return os.path.join(
+        get_cache_dir(CACHE_DIR_NAME),
+        hashlib.sha1(style_url.encode("utf-8")).hexdigest(),
+    )
+
+
+def cached_style(style_url: str) -> dict | None:
+    """
+    Returns the cache entry of a converted style, i.e. the layer URI, the
+    renderer and labeling saved as QML, and the sublayer definitions.
+    Entries written by another QGIS version are ignored since the conversion
+    of Mapbox GL styles improves between versions.
+    """
+    path = os.path.join(style_cache_dir(style_url), ENTRY_FILE_NAME)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if entry.get("qgis_version") != Qgis.QGIS_VERSION_INT:
+        return None
+    return entry
+
+
+def apply_cached_style(layer: QgsVectorTileLayer, entry: dict) -> list[QgsMapLayer]:
+    """Applies a cached style to a layer and creates its sublayers, no network
+    request is involved. Layers created outside of the main thread, e.g. in
+    a task, must be moved to the main thread before they are used."""
+    directory = style_cache_dir(entry["style_url"])
+    layer.loadNamedStyle(os.path.join(directory, STYLE_FILE_NAME))
+
+    sublayers = []
+    for definition in entry["sublayers"]:
+        if definition["type"] == "raster":
+            sublayer = QgsRasterLayer(
+                definition["source"], definition["name"], definition["provider"]
+            )
+        else:
+            sublayer = QgsVectorLayer(
+                definition["source"], definition["name"], definition["provider"]
+            )
+        sublayer.loadNamedStyle(os.path.join(directory, definition["style"]))
+        sublayers.append(sublayer)
+    return sublayers
+
+
+def create_vector_tiles_layers(entry: dict, name: str) -> list[QgsMapLayer]:
+    """
+    Creates a styled vector tile layer from a cache entry. The sublayers come
+    first and the vector tile layer last.
+    """
+    layer = QgsVectorTileLayer(entry["uri"], name)
+    if not layer.isValid():
+        return [layer]
+    layer.setLabelsEnabled(True)
+    layer.loadDefaultMetadata()
+    sublayers = apply_cached_style(layer, entry)
+    return sublayers + [layer]
+
+
+def sprite_urls(style_url: str, style: bytes) -> list[str]:
+    """
+    Returns the URLs of the sprite definitions and images of a Mapbox GL
+    style, relative URLs are resolved against the URL of the style.
+    """
+    try:
+        sprite = json.loads(style).get("sprite")
+    except (ValueError, AttributeError):
+        return []
+    if isinstance(sprite, str):
+        sprites = [sprite]
+    elif isinstance(sprite, list):
+        # Several sprite sheets, as [{"id": ..., "url": ...}]
+        sprites = [s.get("url") for s in sprite if isinstance(s, dict)]
+    else:
+        return []
+    base = QUrl(style_url)
+    return [
+        base.resolved(QUrl(f"{url}{suffix}")).toString()
+        for url in sprites
+        if url
+        for suffix in (".json", ".png")
+    ]
+
+
+def _export_style(layer: QgsMapLayer, path: str):
+    doc = QDomDocument("qgis")
+    error = layer.exportNamedStyle(doc)
+    if error:
+        raise Exception(error)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(doc.toString())
+
+
+class VectorTilesStyleTask(QgsTask):
+    """
+    Downloads and converts the Mapbox GL style of a vector tile layer,
+    including its sprites and sublayers, and saves the result to the cache.
+    The conversion is skipped if the cached entry was made from the same
+    version of the style.
+    If a layer name is given, the styled layers are created as well and handed
+    to the main thread in the `layers` attribute.
+    """
+
+    def __init__(
+        self,
+        description: str,
+        uri: str,
+        style_url: str,
+        update_sources: bool,
+        layer_name: str = None,
+    ):
+        """
+        :param uri: the URI of the vector tile layer
+        :param style_url: the URL of the Mapbox GL style
+        :param update_sources: if True, the sources of the URI are read from
+                               the style, which requires a network request
+        :param layer_name: the name of the layer to create, if any
+        """
+        super().__init__(description, QgsTask.Flag.CanCancel)
+        self.uri = uri
+        self.style_url = style_url
+        self.update_sources = update_sources
+        self.layer_name = layer_name
+        self.entry = None
+        self.layers: list[QgsMapLayer] = []
+        self.updated = False
+        self.warnings = []
+        self.exception = None
+
+    def run(self):
+        try:
+            version = self._version(self._fetch(self.style_url))
+            entry = cached_style(self.style_url)
+            if entry and entry["version"] == version:
+                self.entry = entry
+            else:
+                if self.isCanceled():
+                    return False
+                self.entry = self._convert(version)
+                self.updated = True
+
+            if self.layer_name is not None:
+                layers = create_vector_tiles_layers(self.entry, self.layer_name)
+                if not layers[-1].isValid():
+                    raise Exception(f"Invalid vector tiles source {self.entry['uri']}")
+                main_thread = QgsApplication.instance().thread()
+                for layer in layers:
+                    layer.moveToThread(main_thread)
+                self.layers = layers
+            return True
+
+        except Exception as e:
+            self.exception = str(e)
+            return False
+
+    def _version(self, style: bytes) -> str:
+        """
+        Hashes the style along with its sprite sheet, whose images are part of
+        the converted style as well.
+        """
+        version = hashlib.sha1(style)
+        for url in sprite_urls(self.style_url, style):
+            try:
+                version.update(self._fetch(url))
+            except Exception:
+                # Converted again next time, since the version differs
+                version.update(b"missing sprite")
+        return version.hexdigest()
+
+    @staticmethod
+    def _fetch(url: str) -> bytes:
+        url = QUrl(url)
+        if url.isLocalFile():
+            with open(url.toLocalFile(), "rb") as f:
+                return f.read()
+
+        request = QNetworkRequest(url)
+        request.setRawHeader(b"User-Agent", USER_AGENT)
+        http = QgsBlockingNetworkRequest()
+        http.get(request)
+        reply = http.reply()
+        if reply.error() != QNetworkReply.NetworkError.NoError:
+            raise Exception(f"Could not load {url.toString()}")
+        return reply.content().data()
+
+    def _convert(self, version: str) -> dict:
+        uri = self.uri
+        if self.update_sources:
+            uri = QgsVectorTileUtils.updateUriSources(uri, True)
+        layer = QgsVectorTileLayer(uri, "style")
+        if not layer.isValid():
+            raise Exception(f"Invalid vector tiles source {uri}")
+
+        error, warnings = "", []
+        res, sublayers = layer.loadDefaultStyleAndSubLayers(error, warnings)
+        if error:
+            raise Exception(error)
+        self.warnings = warnings
+
+        directory = style_cache_dir(self.style_url)
+        os.makedirs(directory, exist_ok=True)
+        _export_style(layer, os.path.join(directory, STYLE_FILE_NAME))
+
+        entry = {
+            "style_url": self.style_url,
+            "version": version,
+            "qgis_version": Qgis.QGIS_VERSION_INT,
+            "uri": uri,
+            "sublayers": [],
+        }
+        for i, sublayer in enumerate(sublayers):
+            style_file = f"sublayer_{i}.qml"
+            _export_style(sublayer, os.path.join(directory, style_file))
+            entry["sublayers"].append(
+                {
+                    "name": sublayer.name(),
+                    "source": sublayer.source(),
+                    "provider": sublayer.providerType(),
+                    "type": "raster"
+                    if sublayer.type() == Qgis.LayerType.Raster
+                    else "vector",
+                    "style": style_file,
+                }
+            )
+
+        # The entry is written last, so that an interrupted conversion never
+        # results in an entry pointing to missing files
+        with open(os.path.join(directory, ENTRY_FILE_NAME), "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        return entry
@@ -29,10 +29,12 @@ from qgis.PyQt.QtWidgets import (
     QAbstractItemView,
     QComboBox,
     QSpinBox,
+    QCheckBox,
 )
 from qgis.PyQt.uic import loadUiType
 from qgis.core import Qgis, QgsLocatorFilter
 from qgis.gui import (
+    QgsFileWidget,
     QgsSettingsStringComboBoxWrapper,
     QgsSettingsBoolCheckBoxWrapper,
     QgsSettingsEnumEditorWidgetWrapper,
@@ -62,6 +64,12 @@ class ConfigDialog(QDialog, DialogUi):
                 self.feature_search_restrict.isChecked()
             )
 
+        stac_settings = self.settings.filters[FilterType.STAC.value]
+        stac_settings["download_dir"].setValue(self.stac_download_dir.filePath())
+        stac_settings["content_store_dir"].setValue(
+            self.stac_content_store_dir.filePath()
+        )
+
         layers_list = []
         for r in range(self.feature_search_layers_list.rowCount()):
             item = self.feature_search_layers_list.item(r, 0)
@@ -145,6 +153,56 @@ class ConfigDialog(QDialog, DialogUi):
             )
             self.wrappers.append(sbw_stac)
 
+        sb_stac_downloads = self.findChild(QSpinBox, "stac_parallel_downloads")
+        if sb_stac_downloads is not None:
+            self.wrappers.append(
+                QgsSettingsIntegerSpinBoxWrapper(
+                    sb_stac_downloads,
+                    self.settings.filters[FilterType.STAC.value]["parallel_downloads"],
+                )
+            )
+
+        sb_stac_bandwidth = self.findChild(QSpinBox, "stac_bandwidth_limit")
+        if sb_stac_bandwidth is not None:
+            self.wrappers.append(
+                QgsSettingsIntegerSpinBoxWrapper(
+                    sb_stac_bandwidth,
+                    self.settings.filters[FilterType.STAC.value]["bandwidth_limit"],
+                )
+            )
+
+        cb_stac_filtering = self.findChild(QCheckBox, "stac_server_side_filtering")
+        if cb_stac_filtering is not None:
+            self.wrappers.append(
+                QgsSettingsBoolCheckBoxWrapper(
+                    cb_stac_filtering,
+                    self.settings.filters[FilterType.STAC.value][
+                        "server_side_filtering"
+                    ],
+                )
+            )
+
+        cb_stac_archive = self.findChild(QComboBox, "stac_archive_mode")
+        if cb_stac_archive is not None:
+            cb_stac_archive.addItem(self.tr("keep as they are"), "keep")
+            cb_stac_archive.addItem(self.tr("extract and add to QGIS"), "extract")
+            cb_stac_archive.addItem(self.tr("add to QGIS without extracting"), "vsizip")
+            self.wrappers.append(
+                QgsSettingsStringComboBoxWrapper(
+                    cb_stac_archive,
+                    self.settings.filters[FilterType.STAC.value]["archive_mode"],
+                    QgsSettingsStringComboBoxWrapper.Mode.Data,
+                )
+            )
+
+        stac_settings = self.settings.filters[FilterType.STAC.value]
+        for file_widget, key in (
+            (self.stac_download_dir, "download_dir"),
+            (self.stac_content_store_dir, "content_store_dir"),
+        ):
+            file_widget.setStorageMode(QgsFileWidget.StorageMode.GetDirectory)
+            file_widget.setFilePath(stac_settings[key].value())
+
         self.search_line_edit.textChanged.connect(self.filter_rows)
         self.select_all_button.pressed.connect(self.select_all)
         self.unselect_all_button.pressed.connect(lambda: self.select_all(False))
@@ -48,7 +48,18 @@ except ImportError:
     # Should fail only for QGIS < 3.26, where profiles weren't available
     SwissProfileSource = None
 
+from swiss_locator.core.constants import USER_AGENT
 from swiss_locator.core.settings import PLUGIN_NAME
+from swiss_locator.swissgeodownloader.api.network_request import (
+    setUserAgent as set_download_user_agent,
+)
+from swiss_locator.swissgeodownloader.utils.settings import (
+    unregisterSettings as unregister_download_settings,
+)
+from swiss_locator.swissgeodownloader.utils.utilities import (
+    setCacheDir as set_download_cache_dir,
+)
+from swiss_locator.utils.utils import get_cache_dir
 
 
 class SwissLocatorPlugin:
@@ -64,6 +75,9 @@ class SwissLocatorPlugin:
         self.translator.load(qgis_locale, "swiss_locator", "_", locale_path)
         QCoreApplication.installTranslator(self.translator)
 
+        set_download_user_agent(USER_AGENT)
+        set_download_cache_dir(get_cache_dir("swissgeodownloader"))
+
         self.locator_filters = []
         self.stac_filter_widget: QgsDockWidget | None = None
 
@@ -130,6 +144,7 @@ class SwissLocatorPlugin:
             self.stac_filter_widget.deleteLater()
 
         QgsSettingsTree.unregisterPluginTreeNode(PLUGIN_NAME)
+        unregister_download_settings()
 
     def show_message(
         self, title: str, msg: str, level: Qgis.MessageLevel, widget: QWidget = None
@@ -80,7 +80,17 @@ class GetFileListTask(ApiCallerTask):
         self.output = self.apiRef.getFileList(self, **self.kwargs)
 
 
+class GetFileSizesTask(ApiCallerTask):
+    def run_task(self):
+        self.successMsg = self.tr("file sizes received")
+        self.output = self.apiRef.fetchFileSizes(self, **self.kwargs)
+
+
 class DownloadFilesTask(ApiCallerTask):
+    # Bytes downloaded, total bytes, bytes per second and remaining seconds,
+    #  updated by the download engine
+    downloadProgress: tuple | None = None
+
     def run_task(self):
         self.successMsg = self.tr("files downloaded")
         self.output = self.apiRef.downloadFiles(self, **self.kwargs)
@@ -0,0 +1,157 @@
+"""
+/***************************************************************************
+ SwissGeoDownloader
+                                 A QGIS plugin
+ This plugin lets you comfortably download swiss geo data.
+                             -------------------
+        begin                : 2021-03-14
+        copyright            : (C) 2025 by Patricia Moll
+        email                : pimoll.dev@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import json
+import os
+import threading
+from collections.abc import Callable
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from qgis.core import Qgis, QgsTask
+
+from swiss_locator.swissgeodownloader.api.network_request import (
+    RequestPacer,
+    pacedRequests,
+)
+from swiss_locator.swissgeodownloader.utils.utilities import log
+
+DEFAULT_WORKERS = 4
+# The crawled services are public, don't start more requests per second
+DEFAULT_REQUESTS_PER_SECOND = 2.0
+# Interval to check for cancellation while waiting for the workers
+WAIT_INTERVAL = 0.2
+
+
+class CrawlCheckpoint:
+    """Results of a crawl saved to a json file after every batch, so that
+    an interrupted crawl continues where it stopped."""
+
+    def __init__(self, path: str, results: dict | None = None):
+        self.path = path
+        self.results = results or {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: str) -> "CrawlCheckpoint":
+        """Reads the results of a previous run, starts anew if there are
+        none or the file can't be read."""
+        try:
+            with open(path, encoding="utf-8") as f:
+                results = json.load(f)
+        except FileNotFoundError:
+            results = {}
+        except (OSError, ValueError):
+            log(f"Checkpoint {path} not readable, starting anew")
+            results = {}
+        return cls(path, results if isinstance(results, dict) else {})
+
+    def update(self, results: dict):
+        with self.lock:
+            self.results.update(results)
+            self._save()
+
+    def _save(self):
+        # Write to a temporary file first so that an interruption never
+        #  leaves a truncated checkpoint
+        tmpPath = f"{self.path}.tmp"
+        with open(tmpPath, "w", encoding="utf-8") as f:
+            json.dump(self.results, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmpPath, self.path)
+
+    def remove(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def crawl(
+    task: QgsTask,
+    keys: list[str],
+    fetchBatch: Callable[[list[str]], dict],
+    batchSize: int = 1,
+    checkpoint: CrawlCheckpoint | None = None,
+    maxWorkers: int = DEFAULT_WORKERS,
+    requestsPerSecond: float = DEFAULT_REQUESTS_PER_SECOND,
+) -> dict:
+    """Calls `fetchBatch` for the keys in batches of `batchSize` on a pool
+    of at most `maxWorkers` threads and returns the merged results
+    {key: value}. All workers together start at most `requestsPerSecond`
+    requests per second, see network_request.pacedRequests. Keys found in
+    the checkpoint are skipped, the results of every finished batch are
+    added to it. A failing batch is logged and left out, it is requested
+    again in the next run."""
+    results = dict(checkpoint.results) if checkpoint else {}
+    pending = [key for key in keys if key not in results]
+    batches = [
+        pending[start : start + batchSize]
+        for start in range(0, len(pending), batchSize)
+    ]
+    if len(pending) < len(keys):
+        log(f"Continuing crawl, {len(keys) - len(pending)} of {len(keys)} done")
+    pacer = RequestPacer(requestsPerSecond)
+
+    def run(batch: list[str]) -> dict:
+        if task.isCanceled():
+            return {}
+        with pacedRequests(pacer, task):
+            batchResults = fetchBatch(batch)
+        if task.isCanceled():
+            # The results may be incomplete
+            return {}
+        if checkpoint:
+            checkpoint.update(batchResults)
+        return batchResults
+
+    done = 0
+    executor = ThreadPoolExecutor(max_workers=max(1, maxWorkers))
+    try:
+        futures = {executor.submit(run, batch): batch for batch in batches}
+        notDone = set(futures)
+        while notDone:
+            finished, notDone = wait(
+                notDone, timeout=WAIT_INTERVAL, return_when=FIRST_COMPLETED
+            )
+            if task.isCanceled():
+                for future in notDone:
+                    future.cancel()
+            for future in finished:
+                done += 1
+                if future.cancelled():
+                    continue
+                try:
+                    results.update(future.result())
+                except Exception as e:
+                    log(
+                        f"Crawling {', '.join(futures[future])} failed: {e}",
+                        Qgis.MessageLevel.Warning,
+                    )
+            if batches:
+                task.setProgress(done / len(batches) * 100)
+    except BaseException:
+        # E.g. KeyboardInterrupt when run from the command line
+        task.cancel()
+        executor.shutdown(wait=True, cancel_futures=True)
+        raise
+    executor.shutdown(wait=True)
+    return results
@@ -19,19 +19,39 @@
  ***************************************************************************/
 """
 
-from qgis.PyQt.QtCore import QUrl
-from qgis.core import QgsTask, Qgis, QgsStacItem
+from collections.abc import Iterable, Iterator
+
+from qgis.core import QgsTask, Qgis
 
 from swiss_locator.swissgeodownloader import _AVAILABLE_LOCALES
-from swiss_locator.swissgeodownloader.api.geocat import ApiGeoCat
-from swiss_locator.swissgeodownloader.api.network_request import fetch
+from swiss_locator.swissgeodownloader.api.crawler import (
+    DEFAULT_REQUESTS_PER_SECOND,
+    DEFAULT_WORKERS,
+    CrawlCheckpoint,
+    crawl,
+)
+from swiss_locator.swissgeodownloader.api.geocat import (
+    BATCH_SIZE as GEOCAT_BATCH_SIZE,
+    ApiGeoCat,
+)
+from swiss_locator.swissgeodownloader.api.http_compression import transferStats
+from swiss_locator.swissgeodownloader.api.item_coverage import ItemCoverageCache
+from swiss_locator.swissgeodownloader.api.network_request import (
+    fetch,
+    fetchContentLengths,
+)
+from swiss_locator.swissgeodownloader.api.response_cache import CachePolicy
 from swiss_locator.swissgeodownloader.api.response_objects import (
     CURRENT_VALUE,
     FILETYPE_STREAMED,
     SgdAsset,
     SgdStacCollection,
 )
-from swiss_locator.swissgeodownloader.api.stac_client import STACClient
+from swiss_locator.swissgeodownloader.api.stac_client import (
+    COLLECTIONS_TTL,
+    AssetRecord,
+    STACClient,
+)
 from swiss_locator.swissgeodownloader.utils.filter_utils import (
     cleanupFilterItems,
     currentFileByBbox,
@@ -41,13 +61,24 @@ from swiss_locator.swissgeodownloader.utils.utilities import translate, log
 BASEURL = "https://data.geo.admin.ch/api/stac/v1"
 API_EPSG = "EPSG:4326"
 API_METADATA_URL = "https://api3.geo.admin.ch/rest/services/api/MapServer"
+# File sizes hardly ever change
+FILE_SIZE_TTL = 7 * 24 * 3600
+# Items sampled to estimate the file sizes of a collection, the estimate is
+#  kept as long as the collection list
+ANALYSIS_ITEMS = 40
+ANALYSIS_TTL = COLLECTIONS_TTL
+ANALYSIS_CACHE_PREFIX = "analysis "
 
 
 class ApiDataGeoAdmin:
     def __init__(self, locale="en"):
         self.locale = locale
         self.stacClient: STACClient = STACClient(BASEURL)
+        self.itemCoverage = ItemCoverageCache()
         self.ownMetadata = {}
+        # Revalidate the metadata of the collections on the next request,
+        #  e.g. after the user asked to refresh the collections
+        self.metadataCachePolicy = CachePolicy.PREFER_CACHE
         self.geocatClient = ApiGeoCat(locale, "datageoadmin_geocat_metadata.json")
 
     def getCollections(self, task: QgsTask) -> dict[str, SgdStacCollection]:
@@ -106,7 +137,15 @@ class ApiDataGeoAdmin:
         metadata = {}
 
         params = {"lang": self.locale}
-        faqData: dict = fetch(task, API_METADATA_URL, params)
+        faqData: dict = fetch(
+            task,
+            API_METADATA_URL,
+            params,
+            cache=self.stacClient.cache,
+            ttl=COLLECTIONS_TTL,
+            cachePolicy=self.metadataCachePolicy,
+        )
+        self.metadataCachePolicy = CachePolicy.PREFER_CACHE
         if not faqData or not isinstance(faqData, dict) or "layers" not in faqData:
             return metadata
 
@@ -125,72 +164,150 @@ class ApiDataGeoAdmin:
             metadata[layerId] = {"title": title, "description": description}
         return metadata
 
+    def clearCollectionsCache(self):
+        """Make sure the collections are requested again. The large metadata
+        response is only revalidated, which is cheap if it did not change."""
+        self.stacClient.cache.invalidate(self.stacClient.collectionsCacheKey())
+        self.metadataCachePolicy = CachePolicy.REVALIDATE
+        self.itemCoverage.clear()
+        self.stacClient.cache.invalidate(ANALYSIS_CACHE_PREFIX)
+
     def analyseCollectionItems(
         self, task: QgsTask, collection: SgdStacCollection
     ) -> SgdStacCollection:
-        """Analyse collection to figure out available options in gui"""
-        # Get max. 40 features
-        try:
-            items: list[QgsStacItem] = self.stacClient.fetchItems(
-                task, collection.id(), {"limit": 40}
-            )
-        except Exception as e:
-            msg = self.tr(
-                "Error when loading dataset details - Unexpected API response"
-            )
-            task.exception = f"{msg}: {task.exception or str(e)}"
-            raise Exception(task.exception)
-
-        estimate = {}
-        itemCount = len(items)
-
+        """Analyse collection to figure out available options in gui. The
+        result is cached per collection for ANALYSIS_TTL."""
+        cacheKey = f"{ANALYSIS_CACHE_PREFIX}{collection.id()}"
+        analysis = self.stacClient.cache.get(cacheKey)
+        if analysis is None:
+            try:
+                analysis = self._analyseItems(task, collection.id())
+            except Exception as e:
+                msg = self.tr(
+                    "Error when loading dataset details - Unexpected API response"
+                )
+                task.exception = f"{msg}: {task.exception or str(e)}"
+                raise Exception(task.exception)
+            # Items without any size are not cached, the sizes may only have
+            #  been unavailable temporarily
+            if analysis["estimate"] or not analysis["itemCount"]:
+                self.stacClient.cache.put(cacheKey, analysis, ttl=ANALYSIS_TTL)
+
+        itemCount = analysis["itemCount"]
         # Check if it makes sense to select by bbox or if the full file list
         #  should just be downloaded directly
         if itemCount <= 10:
             collection.setSelectByBBox(False)
 
-        # Analyze size of an item to estimate download sizes later on
-        if itemCount > 0:
-            item = items[-1]
-
-            # Get an estimate of file size
-            for assetId, asset in item.assets().items():
-                if task.isCanceled():
-                    raise Exception("User canceled")
-
-                # Don't request again if we have this estimate already
-                if assetId in estimate.keys():
-                    continue
-                # Check Content-Length header: Make a HEAD request to get the file size
-                header = fetch(task, QUrl(asset.href()), method="head")
-                if header and header.hasRawHeader(b"Content-Length"):
-                    estimate[asset.mediaType()] = int(
-                        header.rawHeader(b"Content-Length")
-                    )
-
         collection.setAnalysed(True)
         collection.setIsEmpty(itemCount == 0)
-        collection.setAvgSize(estimate)
+        collection.setAvgSize(analysis["estimate"])
         return collection
 
+    def _analyseItems(self, task: QgsTask, collectionId: str) -> dict:
+        """Estimate the file size per media type from max. 40 items. The
+        sizes are taken from the STAC property 'file:size' where available,
+        the remaining media types are probed with concurrent HEAD requests."""
+        itemCount, records = self.stacClient.fetchSampleRecords(
+            task, collectionId, ANALYSIS_ITEMS
+        )
+        sizes: dict[str, list[int]] = {}
+        unknown: dict[str, str] = {}
+        for record in records:
+            if not record.mediaType:
+                continue
+            size = record.properties.get("file:size")
+            if isinstance(size, int):
+                sizes.setdefault(record.mediaType, []).append(size)
+            elif record.href:
+                # One asset per media type is probed
+                unknown[record.mediaType] = record.href
+
+        probes = {
+            mediaType: href
+            for mediaType, href in unknown.items()
+            if mediaType not in sizes
+        }
+        probed = fetchContentLengths(
+            task, list(probes.values()), self.stacClient.cache, FILE_SIZE_TTL
+        )
+        for mediaType, href in probes.items():
+            if probed.get(href) is not None:
+                sizes[mediaType] = [probed[href]]
+
+        estimate = {
+            mediaType: int(sum(values) / len(values))
+            for mediaType, values in sizes.items()
+        }
+        return {"itemCount": itemCount, "estimate": estimate}
+
     def getFileList(
-        self, task: QgsTask, collectionId, bbox: list[float] | None
+        self,
+        task: QgsTask,
+        collectionId,
+        bbox: list[float] | None,
+        searchFilters: dict | None = None,
     ) -> dict:
         """Request a list of available files that are within a bounding box.
-        Analyse the received list and extract file properties."""
+        Analyse the received list and extract file properties.
+        If search filters are given (see filter_utils.toSearchFilters), the
+        files are requested through the item search endpoint and filtered
+        by the server."""
 
+        # The assets are streamed page by page into the file list
         try:
-            stacItemsResponse = self.stacClient.fetchItems(
-                task, collectionId, {"bbox": bbox}, True
-            )
+            if searchFilters:
+                assetRecords = self.stacClient.searchAssetRecords(
+                    task, collectionId, bbox or None, **searchFilters
+                )
+            else:
+                assetRecords = self._fetchAssetRecords(task, collectionId, bbox)
+            fileList = self._processItems(assetRecords, task)
         except Exception as e:
             msg = self.tr("Error when requesting file list - Unexpected API response")
             task.exception = f"{msg}: {task.exception or e}"
             raise Exception(task.exception)
 
-        return self._processItems(stacItemsResponse, task)
+        log(f"Response cache: {self.stacClient.cache.stats()}", debugMsg=True)
+        log(f"Transfer: {transferStats.stats()}", debugMsg=True)
+        return fileList
 
-    def _processItems(self, stacItemResponse: list[QgsStacItem], task: QgsTask) -> dict:
+    def _fetchAssetRecords(
+        self, task: QgsTask, collectionId, bbox: list[float] | None
+    ) -> Iterator[AssetRecord]:
+        """Yield the assets within a bounding box. Assets of areas that
+        have been requested before are taken from the item coverage cache,
+        only the remaining areas are requested from the API."""
+        # An empty bbox stands for the full extent of the collection
+        bbox = bbox or None
+        missingAreas = self.itemCoverage.missingAreas(collectionId, bbox)
+        requestAll = missingAreas == [None if bbox is None else list(bbox)]
+        seen = set()
+        if not requestAll:
+            for record in self.itemCoverage.cachedRecords(collectionId, bbox):
+                seen.add(record.href)
+                yield record
+
+        for area in missingAreas:
+            received = []
+            for record in self.stacClient.fetchAssetRecords(
+                task, collectionId, {"bbox": area}
+            ):
+                received.append(record)
+                if record.href not in seen:
+                    seen.add(record.href)
+                    yield record
+            # Only completely received areas are covered
+            self.itemCoverage.add(collectionId, area, received)
+
+        if missingAreas and not requestAll:
+            log(
+                f"Requested {len(missingAreas)} uncovered area(s) of the "
+                f"bbox for collection {collectionId}",
+                debugMsg=True,
+            )
+
+    def _processItems(self, assetRecords: Iterable[AssetRecord], task: QgsTask) -> dict:
         filterItems = {
             "filetype": [],
             "category": [],
@@ -200,86 +317,70 @@ class ApiDataGeoAdmin:
         }
         fileList = []
 
-        for item in stacItemResponse:
+        for record in assetRecords:
             if task.isCanceled():
                 raise Exception("User canceled")
 
-            # Readout timestamp from the item itself
-            try:
-                timestamp = item.properties().get("datetime")
-                endTimestamp = None
-            except KeyError:
-                # Try to get timestamp from 'start_datetime' and 'end_datetime'
-                timestamp = item.properties().get("start_datetime")
-                endTimestamp = item.properties().get("end_datetime")
-                if not timestamp:
-                    # Extract the mandatory timestamp 'created' instead
-                    timestamp = item.properties().get("created")
-
-            additionalAssetProperties = self.stacClient.assetProperties.get(
-                item.id(), {}
+            # Create file object
+            file = SgdAsset.fromRaw(
+                record.assetId,
+                record.href,
+                record.title,
+                record.description,
+                record.mediaType,
+                record.properties,
             )
-            # Save all files and their properties
-            for assetId, asset in item.assets().items():
-                if task.isCanceled():
-                    raise Exception("User canceled")
 
-                # Create file object
-                file = SgdAsset(assetId, asset)
-                file.properties = additionalAssetProperties.get(assetId, {})
+            try:
+                file.setBbox(record.bbox)
+            except AssertionError as e:
+                log(
+                    f"File {file.id}: Bounding box not valid: {e} {record.bbox}",
+                    Qgis.MessageLevel.Warning,
+                )
+
+            # Extract file properties, save them to the file object
+            #  and add them to the filter list
 
+            fileTypesPerAsset = []
+            if file.filetype:
+                fileTypesPerAsset.append(file.filetype)
+                if file.isCloudOptimized():
+                    fileTypesPerAsset.append(f"{file.filetype}, {FILETYPE_STREAMED}")
+                filterItems["filetype"].extend(fileTypesPerAsset)
+
+            if record.timestamp:
                 try:
-                    file.setBbox(item.boundingBox())
-                except AssertionError as e:
+                    file.setTimestamp(record.timestamp, record.endTimestamp)
+                except ValueError:
                     log(
-                        f"File {file.id}: Bounding box not valid: {e} {item.boundingBox()}",
+                        f"File {file.id}: Timestamp not valid)",
                         Qgis.MessageLevel.Warning,
                     )
-
-                # Extract file properties, save them to the file object
-                #  and add them to the filter list
-
-                fileTypesPerAsset = []
-                if file.filetype:
-                    fileTypesPerAsset.append(file.filetype)
-                    if file.isCloudOptimized():
-                        fileTypesPerAsset.append(
-                            f"{file.filetype}, {FILETYPE_STREAMED}"
-                        )
-                    filterItems["filetype"].extend(fileTypesPerAsset)
-
-                if timestamp:
-                    try:
-                        file.setTimestamp(timestamp, endTimestamp)
-                    except ValueError:
-                        log(
-                            f"File {file.id}: Timestamp not valid)",
-                            Qgis.MessageLevel.Warning,
-                        )
-                    filterItems["timestamp"].append(file.timestampStr)
-
-                # These are Swisstopo specific properties that don't follow
-                #  the STAC specification
-                if file.properties.get("geoadmin:variant"):
-                    file.category = str(file.properties.get("geoadmin:variant"))
-                    filterItems["category"].append(file.category)
-
-                if file.properties.get("gsd"):
-                    file.resolution = str(file.properties.get("gsd"))
-                    filterItems["resolution"].append(file.resolution)
-
-                if file.properties.get("proj:epsg"):
-                    file.coordsys = str(file.properties.get("proj:epsg"))
-                    filterItems["coordsys"].append(file.coordsys)
-
-                fileList.append(file)
-                # If one asset can support multiple file types (e.g. tif and
-                #  COG), create a copy of the file for each file type
-                if len(fileTypesPerAsset) > 1:
-                    for fileType in fileTypesPerAsset[1:]:
-                        copiedFile = file.copy()
-                        copiedFile.filetype = fileType
-                        fileList.append(copiedFile)
+                filterItems["timestamp"].append(file.timestampStr)
+
+            # These are Swisstopo specific properties that don't follow
+            #  the STAC specification
+            if file.properties.get("geoadmin:variant"):
+                file.category = str(file.properties.get("geoadmin:variant"))
+                filterItems["category"].append(file.category)
+
+            if file.properties.get("gsd"):
+                file.resolution = str(file.properties.get("gsd"))
+                filterItems["resolution"].append(file.resolution)
+
+            if file.properties.get("proj:epsg"):
+                file.coordsys = str(file.properties.get("proj:epsg"))
+                filterItems["coordsys"].append(file.coordsys)
+
+            fileList.append(file)
+            # If one asset can support multiple file types (e.g. tif and
+            #  COG), create a copy of the file for each file type
+            if len(fileTypesPerAsset) > 1:
+                for fileType in fileTypesPerAsset[1:]:
+                    copiedFile = file.copy()
+                    copiedFile.filetype = fileType
+                    fileList.append(copiedFile)
 
         # Sort file list by bbox coordinates (first item on top left corner)
         fileList.sort(key=lambda f: round(f.bbox[3], 2) if f.bbox else 0, reverse=True)
@@ -300,43 +401,139 @@ class ApiDataGeoAdmin:
 
         return {"files": fileList, "filters": filterItems}
 
-    def downloadFiles(self, task: QgsTask, fileList, outputDir):
-        return self.stacClient.downloadFiles(task, fileList, outputDir)
-
-    def refreshAllMetadata(self, task: QgsTask):
-        """Fetches metadata for all collections and saves it to a json file."""
+    def fetchFileSizes(self, task: QgsTask, fileList: list[SgdAsset]) -> bool:
+        """Request the sizes of files without the STAC property 'file:size'
+        with concurrent HEAD requests. Each size is saved in the asset
+        properties as soon as it arrives, the task progress is updated
+        with every percent of the files."""
+        filesByHref: dict[str, list[SgdAsset]] = {}
+        for file in fileList:
+            if file.fileSize is None and file.href:
+                filesByHref.setdefault(file.href, []).append(file)
+        received = 0
+
+        def onSize(href: str, size: int | None):
+            nonlocal received
+            if size is not None:
+                for file in filesByHref[href]:
+                    file.properties["file:size"] = size
+            received += 1
+            progress = int(100 * received / len(filesByHref))
+            if progress != int(task.progress()):
+                task.setProgress(progress)
+
+        fetchContentLengths(
+            task, list(filesByHref), self.stacClient.cache, FILE_SIZE_TTL, onSize
+        )
+        return True
+
+    def downloadFiles(self, task: QgsTask, fileList, outputDir, **options):
+        """See STACClient.downloadFiles for the options."""
+        return self.stacClient.downloadFiles(task, fileList, outputDir, **options)
+
+    def refreshAllMetadata(
+        self,
+        task: QgsTask,
+        checkpointPath: str | None = None,
+        maxWorkers: int = DEFAULT_WORKERS,
+        requestsPerSecond: float = DEFAULT_REQUESTS_PER_SECOND,
+    ):
+        """Fetches metadata for all collections and saves it to a json file.
+        The collections are requested in batches on a pool of workers, see
+        crawler.crawl. If a checkpoint file is given, an interrupted refresh
+        continues with the collections that are still missing."""
         collections = self.getCollections(task)
+        metadataUrls = {cId: coll.metadataLink() for cId, coll in collections.items()}
+
+        def fetchBatch(collectionIds: list[str]) -> dict:
+            # Request metadata in all languages, many collections at once
+            md_geocat = self.geocatClient.getMetaBatch(
+                task,
+                {cId: metadataUrls[cId] for cId in collectionIds},
+                _AVAILABLE_LOCALES,
+                CachePolicy.REVALIDATE,
+            )
+            for collectionId in collectionIds:
+                if collectionId in md_geocat:
+                    continue
+                # Records missing in the batch response are requested one
+                #  by one
+                metadata = {}
+                for locale in _AVAILABLE_LOCALES:
+                    localizedMetadata = self.geocatClient.getMeta(
+                        task,
+                        collectionId,
+                        metadataUrls[collectionId],
+                        locale,
+                        False,
+                        CachePolicy.REVALIDATE,
+                        raiseErrors=True,
+                    )
+                    if localizedMetadata:
+                        metadata[locale] = localizedMetadata
+                md_geocat[collectionId] = metadata
+            return md_geocat
+
+        checkpoint = CrawlCheckpoint.load(checkpointPath) if checkpointPath else None
+        md_geocat = crawl(
+            task,
+            list(collections),
+            fetchBatch,
+            GEOCAT_BATCH_SIZE,
+            checkpoint,
+            maxWorkers,
+            requestsPerSecond,
+        )
+        if task.isCanceled() or len(md_geocat) < len(collections):
+            # Keep the checkpoint, the next run requests the missing ones
+            return False
 
-        md_geocat = {}
-        for collectionId, collection in collections.items():
-            # Request metadata in all languages
-            metadata = {}
-            for locale in _AVAILABLE_LOCALES:
-                localizedMetadata = self.geocatClient.getMeta(
-                    task, collectionId, collection.metadataLink(), locale, False
-                )
-                if localizedMetadata:
-                    metadata[locale] = localizedMetadata
-            md_geocat[collectionId] = metadata
-
-        self.geocatClient.updatePreSavedMetadata(md_geocat)
-
-    def catalogPropertiesCrawler(self, task: QgsTask):
+        self.geocatClient.updatePreSavedMetadata(
+            {cId: md_geocat[cId] for cId in collections}
+        )
+        if checkpoint:
+            checkpoint.remove()
+        return True
+
+    def catalogPropertiesCrawler(
+        self,
+        task: QgsTask,
+        checkpointPath: str | None = None,
+        maxWorkers: int = DEFAULT_WORKERS,
+        requestsPerSecond: float = DEFAULT_REQUESTS_PER_SECOND,
+    ):
         """Crawls through all item / asset properties of the catalog and
-        returns them."""
+        returns them. Collections are crawled in parallel, see
+        crawler.crawl."""
         collections = self.getCollections(task)
-        items = {}
-        for collectionId, collection in collections.items():
-            items[collectionId] = {}
-            items[collectionId]["title"] = collection.title()
-            bbox = [7.8693964, 46.7961371, 7.9098771, 46.817595]
-            fileList = self.getFileList(task, collectionId, bbox)
-            if fileList:
-                items[collectionId]["assets"] = len(fileList["files"])
-                items[collectionId]["filters"] = {
-                    k: v for k, v in fileList["filters"].items() if v
-                }
-        return items
+        bbox = [7.8693964, 46.7961371, 7.9098771, 46.817595]
+
+        def fetchBatch(collectionIds: list[str]) -> dict:
+            items = {}
+            for collectionId in collectionIds:
+                items[collectionId] = {}
+                items[collectionId]["title"] = collections[collectionId].title()
+                fileList = self.getFileList(task, collectionId, bbox)
+                if fileList:
+                    items[collectionId]["assets"] = len(fileList["files"])
+                    items[collectionId]["filters"] = {
+                        k: v for k, v in fileList["filters"].items() if v
+                    }
+            return items
+
+        checkpoint = CrawlCheckpoint.load(checkpointPath) if checkpointPath else None
+        items = crawl(
+            task,
+            list(collections),
+            fetchBatch,
+            1,
+            checkpoint,
+            maxWorkers,
+            requestsPerSecond,
+        )
+        if checkpoint and not task.isCanceled() and len(items) == len(collections):
+            checkpoint.remove()
+        return {cId: items[cId] for cId in collections if cId in items}
 
     def tr(self, message):
         return translate(message, type(self).__name__)
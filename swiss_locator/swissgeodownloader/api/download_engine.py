@@ -0,0 +1,288 @@
+"""
+/***************************************************************************
+ SwissGeoDownloader
+                                 A QGIS plugin
+ This plugin lets you comfortably download swiss geo data.
+                             -------------------
+        begin                : 2021-03-14
+        copyright            : (C) 2025 by Patricia Moll
+        email                : pimoll.dev@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import math
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+
+from qgis.PyQt.QtCore import QEventLoop, QTimer, QUrl
+from qgis.core import QgsTask
+
+from swiss_locator.swissgeodownloader.api.network_request import FileDownload
+from swiss_locator.swissgeodownloader.utils.utilities import translate, log
+
+DEFAULT_PARALLEL_DOWNLOADS = 3
+# QNetworkAccessManager opens at most 6 connections per host, further
+#  requests would only wait in its queue
+MAX_PER_HOST = 6
+# Interval to check for cancellation, read throttled data and update the
+#  progress
+TICK_INTERVAL = 100
+# The download rate is smoothed over roughly this many seconds
+RATE_SMOOTHING = 5.0
+# Bytes the bandwidth limiter may hand out at once, in seconds of the rate
+BURST = 0.25
+
+
+class BandwidthLimiter:
+    """Token bucket limiting the bytes read per second. The limiter is
+    shared by all downloads, which may run in different threads."""
+
+    def __init__(self, bytesPerSecond: int = 0, clock: Callable = time.monotonic):
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.rate = 0
+        self.tokens = 0.0
+        self.updatedAt = clock()
+        self.setRate(bytesPerSecond)
+
+    def setRate(self, bytesPerSecond: int):
+        """Sets the limit, 0 means unlimited."""
+        with self.lock:
+            self.rate = max(0, bytesPerSecond)
+            self.tokens = min(self.tokens, self.rate * BURST)
+
+    def acquire(self, size: int) -> int:
+        """Returns how many of the requested bytes may be read now."""
+        with self.lock:
+            if not self.rate:
+                return size
+            now = self.clock()
+            self.tokens = min(
+                self.rate * BURST, self.tokens + (now - self.updatedAt) * self.rate
+            )
+            self.updatedAt = now
+            allowed = min(size, int(self.tokens))
+            self.tokens -= allowed
+            return allowed
+
+
+_bandwidthLimiter = BandwidthLimiter()
+
+
+def bandwidthLimiter(bytesPerSecond: int = 0) -> BandwidthLimiter | None:
+    """Returns the limiter shared by all downloads set to the given rate, or
+    None if the bandwidth is not limited."""
+    _bandwidthLimiter.setRate(bytesPerSecond)
+    return _bandwidthLimiter if bytesPerSecond else None
+
+
+class ProgressEstimator:
+    """Estimates the download rate and the remaining time from the bytes
+    downloaded so far. The rate is an exponentially weighted average, so
+    that the estimate does not jump with every chunk of data."""
+
+    def __init__(self, clock: Callable = time.monotonic):
+        self.clock = clock
+        self.startedAt = clock()
+        self.updatedAt = self.startedAt
+        self.bytesDone = 0
+        self.rate: float | None = None
+
+    def update(self, bytesDone: int):
+        now = self.clock()
+        elapsed = now - self.updatedAt
+        if elapsed <= 0:
+            return
+        currentRate = max(0, bytesDone - self.bytesDone) / elapsed
+        if self.rate is None:
+            self.rate = currentRate
+        else:
+            weight = 1 - math.exp(-elapsed / RATE_SMOOTHING)
+            self.rate += weight * (currentRate - self.rate)
+        self.bytesDone = bytesDone
+        self.updatedAt = now
+
+    def remainingTime(self, bytesTotal: int) -> float | None:
+        """Seconds until bytesTotal are downloaded, None if unknown."""
+        if not self.rate:
+            return None
+        return max(0, bytesTotal - self.bytesDone) / self.rate
+
+
+class DownloadJob:
+    def __init__(
+        self,
+        fileId: str,
+        url: str,
+        filePath: str,
+        size: int | None = None,
+        checksum: str | None = None,
+    ):
+        self.fileId = fileId
+        self.url = url
+        self.filePath = filePath
+        # Expected size, e.g. from the STAC file extension, replaced by the
+        #  size reported by the server once the download started
+        self.size = size
+        # Multihash of the file according to the STAC file extension
+        self.checksum = checksum
+        self.download: FileDownload | None = None
+        self.success = False
+        self.error: str | None = None
+
+    @property
+    def host(self) -> str:
+        return QUrl(self.url).host()
+
+    @property
+    def bytesDone(self) -> int:
+        if self.success:
+            return self.size or 0
+        return self.download.bytesReceived if self.download else 0
+
+
+class DownloadEngine:
+    """Downloads files concurrently from within a QgsTask, at most
+    `parallelDownloads` at the same time and MAX_PER_HOST per host. The task
+    progress is based on bytes instead of the number of files, the current
+    rate and remaining time are published in the task attribute
+    `downloadProgress`."""
+
+    def __init__(
+        self,
+        task: QgsTask,
+        parallelDownloads: int = DEFAULT_PARALLEL_DOWNLOADS,
+        maxPerHost: int = MAX_PER_HOST,
+        limiter: BandwidthLimiter | None = None,
+        onJobFinished: Callable[[DownloadJob], None] | None = None,
+    ):
+        """
+        :param onJobFinished: called with each job once its download
+                              succeeded or finally failed
+        """
+        self.task = task
+        self.parallelDownloads = max(1, parallelDownloads)
+        self.maxPerHost = max(1, maxPerHost)
+        self.limiter = limiter
+        self.onJobFinished = onJobFinished
+        self.jobs: list[DownloadJob] = []
+        self.pending: deque[DownloadJob] = deque()
+        self.active: list[DownloadJob] = []
+        self.estimator = ProgressEstimator()
+        self.eventLoop: QEventLoop | None = None
+
+    def run(self, jobs: list[DownloadJob]) -> list[DownloadJob]:
+        """Downloads all jobs and returns the failed ones. Blocks until the
+        downloads are finished or the task is canceled."""
+        self.jobs = jobs
+        self.pending = deque(jobs)
+        self.eventLoop = QEventLoop()
+
+        timer = QTimer()
+        timer.setInterval(TICK_INTERVAL)
+        timer.timeout.connect(self._onTick)
+        timer.start()
+
+        self._startNext()
+        if self.active:
+            self.eventLoop.exec(QEventLoop.ProcessEventsFlag.ExcludeUserInputEvents)
+        timer.stop()
+        self._updateProgress()
+        return [job for job in jobs if not job.success]
+
+    def _startNext(self):
+        while self.pending and len(self.active) < self.parallelDownloads:
+            hostCounts = {}
+            for job in self.active:
+                hostCounts[job.host] = hostCounts.get(job.host, 0) + 1
+            job = next(
+                (
+                    j
+                    for j in self.pending
+                    if hostCounts.get(j.host, 0) < self.maxPerHost
+                ),
+                None,
+            )
+            if job is None:
+                return
+            self.pending.remove(job)
+            self.active.append(job)
+            log(translate("SGD", "Start download of {}").format(job.url))
+            job.download = FileDownload(
+                job.url,
+                job.filePath,
+                onProgress=lambda received, total, _job=job: self._onProgress(
+                    _job, total
+                ),
+                onFinished=lambda success, _job=job: self._onFinished(_job, success),
+                limiter=self.limiter,
+                checksum=job.checksum,
+            )
+            job.download.start()
+
+    def _onProgress(self, job: DownloadJob, bytesTotal: int | None):
+        if bytesTotal:
+            job.size = bytesTotal
+
+    def _onFinished(self, job: DownloadJob, success: bool):
+        if job in self.active:
+            self.active.remove(job)
+        job.success = success
+        if success:
+            job.size = job.download.bytesReceived
+        else:
+            job.error = job.download.error
+        if self.onJobFinished:
+            self.onJobFinished(job)
+
+        if not self.task.isCanceled():
+            self._startNext()
+        if not self.active:
+            self.eventLoop.quit()
+
+    def _onTick(self):
+        if self.task.isCanceled():
+            self.pending.clear()
+            for job in list(self.active):
+                job.download.abort()
+            return
+        if self.limiter:
+            for job in list(self.active):
+                job.download.readThrottled()
+        self._updateProgress()
+
+    def bytesTotal(self) -> int:
+        """Total size of all files, files of unknown size are assumed to be
+        of average size."""
+        sizes = [job.size for job in self.jobs if job.size]
+        if not sizes:
+            return 0
+        average = sum(sizes) / len(sizes)
+        return int(sum(job.size or average for job in self.jobs))
+
+    def _updateProgress(self):
+        bytesDone = sum(job.bytesDone for job in self.jobs)
+        bytesTotal = self.bytesTotal()
+        self.estimator.update(bytesDone)
+        if bytesTotal:
+            self.task.setProgress(min(100.0, 100 * bytesDone / bytesTotal))
+        else:
+            finished = sum(1 for job in self.jobs if job.download and job.download.done)
+            self.task.setProgress(100 * finished / max(1, len(self.jobs)))
+        self.task.downloadProgress = (
+            bytesDone,
+            bytesTotal,
+            self.estimator.rate,
+            self.estimator.remainingTime(bytesTotal),
+        )
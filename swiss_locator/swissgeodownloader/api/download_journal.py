@@ -0,0 +1,135 @@
+"""
+/***************************************************************************
+ SwissGeoDownloader
+                                 A QGIS plugin
+ This plugin lets you comfortably download swiss geo data.
+                             -------------------
+        begin                : 2021-03-14
+        copyright            : (C) 2025 by Patricia Moll
+        email                : pimoll.dev@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import json
+import os
+import threading
+import time
+
+from swiss_locator.swissgeodownloader.api.file_integrity import fileChecksum
+from swiss_locator.swissgeodownloader.api.response_objects import SgdAsset
+
+JOURNAL_PREFIX = ".sgd_download_"
+JOURNAL_VERSION = 1
+
+STATUS_PENDING = "pending"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+
+class DownloadJournal:
+    """Records the files of a download batch and whether they have been
+    downloaded, so that a batch interrupted by closing or crashing QGIS can
+    be resumed. The journal is a json file in the output folder which is
+    replaced atomically after every finished file."""
+
+    def __init__(self, path: str, collectionId: str, files: dict[str, dict]):
+        self.path = path
+        self.collectionId = collectionId
+        # File entries with href, size, checksum and status, by file id
+        self.files = files
+        self.created = time.time()
+        self.lock = threading.Lock()
+
+    @property
+    def outputDir(self) -> str:
+        return os.path.dirname(self.path)
+
+    @classmethod
+    def create(
+        cls, outputDir: str, collectionId: str, fileList: list[SgdAsset]
+    ) -> "DownloadJournal":
+        """Creates and saves the journal of a new download batch."""
+        files = {
+            file.id: {
+                "href": file.href,
+                "size": file.fileSize,
+                "checksum": fileChecksum(file),
+                "status": STATUS_PENDING,
+            }
+            for file in fileList
+        }
+        fileName = f"{JOURNAL_PREFIX}{time.strftime('%Y%m%d_%H%M%S')}.json"
+        journal = cls(os.path.join(outputDir, fileName), collectionId, files)
+        journal.save()
+        return journal
+
+    @classmethod
+    def load(cls, path: str) -> "DownloadJournal | None":
+        """Returns None if the journal does not exist or is not readable."""
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            journal = cls(path, data["collectionId"], data["files"])
+            journal.created = data.get("created", journal.created)
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        return journal
+
+    def save(self):
+        data = {
+            "version": JOURNAL_VERSION,
+            "collectionId": self.collectionId,
+            "created": self.created,
+            "files": self.files,
+        }
+        with self.lock:
+            tmpPath = f"{self.path}.tmp"
+            with open(tmpPath, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmpPath, self.path)
+
+    def setStatus(self, fileId: str, status: str):
+        if fileId not in self.files:
+            return
+        self.files[fileId]["status"] = status
+        self.save()
+
+    def unfinishedFiles(self) -> list[SgdAsset]:
+        """Files which have not been downloaded completely, as assets with
+        the size and checksum known when the batch was started."""
+        assets = []
+        for fileId, entry in self.files.items():
+            if entry.get("status") == STATUS_DONE:
+                continue
+            properties = {}
+            if entry.get("size") is not None:
+                properties["file:size"] = entry["size"]
+            if entry.get("checksum"):
+                properties["file:checksum"] = entry["checksum"]
+            asset = SgdAsset.fromRaw(
+                fileId, entry["href"], None, None, None, properties
+            )
+            asset.path = os.path.join(self.outputDir, fileId)
+            assets.append(asset)
+        return assets
+
+    @property
+    def isFinished(self) -> bool:
+        return all(entry.get("status") == STATUS_DONE for entry in self.files.values())
+
+    def remove(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
@@ -0,0 +1,195 @@
+"""
+/***************************************************************************
+ SwissGeoDownloader
+                                 A QGIS plugin
+ This plugin lets you comfortably download swiss geo data.
+                             -------------------
+        begin                : 2021-03-14
+        copyright            : (C) 2025 by Patricia Moll
+        email                : pimoll.dev@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import hashlib
+import os
+import shutil
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+
+# Multihash codes of the hash functions supported by hashlib, see
+#  https://github.com/multiformats/multicodec/blob/master/table.csv
+MULTIHASH_ALGORITHMS = {
+    0x11: "sha1",
+    0x12: "sha256",
+    0x13: "sha512",
+    0x14: "sha3_512",
+    0x15: "sha3_384",
+    0x16: "sha3_256",
+    0x17: "sha3_224",
+    0xD5: "md5",
+}
+
+CHUNK_SIZE = 1024 * 1024
+# ioctl request of Linux to clone a file
+FICLONE = 0x40049409
+
+
+def _readVarint(data: bytes, pos: int) -> tuple[int, int]:
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        value |= (byte & 0x7F) << shift
+        pos += 1
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+
+
+def parseMultihash(checksum: str | None) -> tuple[str, str] | None:
+    """Returns the hashlib algorithm and the hex digest of a multihash as
+    used by the STAC property 'file:checksum', e.g. '1220<sha256 digest>'.
+    Returns None for invalid checksums or unsupported algorithms."""
+    if not checksum:
+        return None
+    try:
+        data = bytes.fromhex(checksum)
+        code, pos = _readVarint(data, 0)
+        length, pos = _readVarint(data, pos)
+    except (ValueError, IndexError):
+        return None
+    algorithm = MULTIHASH_ALGORITHMS.get(code)
+    digest = data[pos:]
+    if not algorithm or len(digest) != length:
+        return None
+    return algorithm, digest.hex()
+
+
+def fileChecksum(asset) -> str | None:
+    """Returns the multihash of an asset, if known."""
+    return getattr(asset, "properties", {}).get("file:checksum")
+
+
+def hashFile(path: str, algorithm: str) -> str:
+    hasher = hashlib.new(algorithm)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def fileMatches(path: str, size: int | None, checksum: str | None) -> bool:
+    """Checks whether a file on disk is the file described by the STAC
+    properties 'file:size' and 'file:checksum'. The size is compared first,
+    the file is only read to compare the checksum. Returns False if neither
+    size nor checksum are known."""
+    try:
+        actualSize = os.path.getsize(path)
+    except OSError:
+        return False
+    if size is not None and actualSize != size:
+        return False
+    multihash = parseMultihash(checksum)
+    if multihash:
+        algorithm, digest = multihash
+        try:
+            return hashFile(path, algorithm) == digest
+        except OSError:
+            return False
+    return size is not None
+
+
+class ContentStore:
+    """Local store of downloaded files addressed by their checksum, so that
+    a file downloaded for one project folder does not have to be downloaded
+    again for another. The store and the project folders get independent
+    copies, so that editing a file in one project does not change it
+    anywhere else. Where the file system supports it, the copies share their
+    data blocks until one of them is modified (copy-on-write)."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, checksum: str) -> str | None:
+        multihash = parseMultihash(checksum)
+        if not multihash:
+            return None
+        algorithm, digest = multihash
+        return os.path.join(self.root, algorithm, digest[:2], digest)
+
+    def has(self, checksum: str) -> bool:
+        path = self.path(checksum)
+        return bool(path) and os.path.exists(path)
+
+    def restore(self, checksum: str, targetPath: str, size: int | None = None) -> bool:
+        """Puts the stored file at the target path, returns False if the
+        file is not in the store. Stored files that don't match their
+        checksum anymore are removed from the store."""
+        if not self.has(checksum):
+            return False
+        path = self.path(checksum)
+        if not fileMatches(path, size, checksum):
+            _remove(path)
+            return False
+        try:
+            _copy(path, targetPath)
+        except OSError:
+            return False
+        if not fileMatches(targetPath, size, checksum):
+            _remove(targetPath)
+            return False
+        return True
+
+    def add(self, filePath: str, checksum: str):
+        """Adds a file which has been verified to match the checksum."""
+        path = self.path(checksum)
+        if not path or os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            _copy(filePath, path)
+        except OSError:
+            pass
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _reflink(source: str, target: str) -> bool:
+    """Clones a file without copying its data, only supported by some file
+    systems (e.g. Btrfs, XFS) on Linux."""
+    if fcntl is None or not hasattr(fcntl, "ioctl"):
+        return False
+    try:
+        with open(source, "rb") as src, open(target, "wb") as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        return True
+    except OSError:
+        _remove(target)
+        return False
+
+
+def _copy(source: str, target: str):
+    tmpPath = f"{target}.tmp"
+    if os.path.exists(tmpPath):
+        os.remove(tmpPath)
+    if not _reflink(source, tmpPath):
+        shutil.copyfile(source, tmpPath)
+    os.replace(tmpPath, target)
@@ -19,20 +19,33 @@
  ***************************************************************************/
 """
 
+import io
+import os
 import re
 import xml.etree.ElementTree as ET
+from collections.abc import Iterable
 
 from qgis.core import QgsTask
 
+from swiss_locator.swissgeodownloader.api.metadata_store import MetadataStore
 from swiss_locator.swissgeodownloader.api.network_request import fetch
-from swiss_locator.swissgeodownloader.utils.metadata_handler import (
-    loadFromFile,
-    saveToFile,
+from swiss_locator.swissgeodownloader.api.response_cache import (
+    CachePolicy,
+    responseCache,
+)
+from swiss_locator.swissgeodownloader.utils.metadata_handler import saveToFile
+from swiss_locator.swissgeodownloader.utils.utilities import (
+    getCacheDir,
+    log,
+    translate,
 )
-from swiss_locator.swissgeodownloader.utils.utilities import translate, log
 
 BASEURL = "https://www.geocat.ch/geonetwork/srv/eng/csw"
-XML_NAMESPACES = {"gmd": "{http://www.isotc211.org/2005/gmd}"}
+XML_NAMESPACES = {
+    "gmd": "{http://www.isotc211.org/2005/gmd}",
+    "gco": "{http://www.isotc211.org/2005/gco}",
+    "csw": "{http://www.opengis.net/cat/csw/2.0.2}",
+}
 REQUEST_PARAMS = {
     "service": "CSW",
     "version": "2.0.2",
@@ -41,6 +54,27 @@ REQUEST_PARAMS = {
     "outputFormat": "application/xml",
     "outputSchema": "http://www.isotc211.org/2005/gmd",
 }
+BATCH_REQUEST_PARAMS = {
+    "service": "CSW",
+    "version": "2.0.2",
+    "request": "GetRecords",
+    "resultType": "results",
+    "typeNames": "gmd:MD_Metadata",
+    "elementSetName": "summary",
+    "outputFormat": "application/xml",
+    "outputSchema": "http://www.isotc211.org/2005/gmd",
+    "constraintLanguage": "CQL_TEXT",
+    "constraint_language_version": "1.1.0",
+}
+# Number of records requested at once, the ids are sent in the url
+BATCH_SIZE = 20
+# Elements of a record that are saved and the key they are saved as
+SEARCH_TERMS = {
+    "title": f"{XML_NAMESPACES['gmd']}title",
+    "description": f"{XML_NAMESPACES['gmd']}abstract",
+}
+# Metadata records of geocat.ch rarely change
+METADATA_TTL = 7 * 24 * 3600
 
 
 class ApiGeoCat:
@@ -49,8 +83,11 @@ class ApiGeoCat:
         service for switzerland."""
         self.locale = locale
         self.dataPath = fileName
-        self.preSavedMetadata = {}
-        self.loadPreSavedMetadata()
+        # The bundled json file seeds the store in the user profile
+        self.store = MetadataStore(
+            os.path.join(getCacheDir(), "metadata.sqlite"),
+            fileName,
+        )
 
     def getMeta(
         self,
@@ -59,19 +96,23 @@ class ApiGeoCat:
         metadataUrl: str,
         locale: str,
         saveInFile: bool = True,
+        cachePolicy: CachePolicy = CachePolicy.PREFER_CACHE,
+        raiseErrors: bool = False,
     ):
         """Requests metadata for a collection Id. Since calling geocat several
-        times on each plugin start is very slow, metadata is saved to a file
-        and read from there. Only if there is no metadata for a specific
-        collection in the file, geocat.ch is called."""
+        times on each plugin start is very slow, metadata is saved in the
+        metadata store and read from there. Only if there is no metadata for
+        a specific collection in the store, geocat.ch is called. The responses of
+        geocat.ch are cached according to the cache policy.
+        If geocat.ch can't be reached or the response can't be parsed, empty
+        metadata is returned, or an exception raised if `raiseErrors` is
+        set."""
         metadata = {}
 
         # Check if metadata has been pre-saved and return this data
-        if (
-            collectionId in self.preSavedMetadata
-            and locale in self.preSavedMetadata[collectionId]
-        ):
-            return self.preSavedMetadata[collectionId][locale]
+        preSaved = self.store.get(collectionId, locale)
+        if preSaved is not None:
+            return preSaved
 
         geocatDsId = self.extractUuid(metadataUrl)
         if not geocatDsId:
@@ -82,65 +123,169 @@ class ApiGeoCat:
             return metadata
 
         # Call geocat API
-        rqParams = REQUEST_PARAMS
-        rqParams["id"] = geocatDsId
-        xml = fetch(task, BASEURL, params=rqParams, decoder="string")
+        xml = fetch(
+            task,
+            BASEURL,
+            params={**REQUEST_PARAMS, "id": geocatDsId},
+            decoder="string",
+            cache=responseCache(),
+            ttl=METADATA_TTL,
+            cachePolicy=cachePolicy,
+        )
         try:
-            root = ET.fromstring(xml)
+            records, _ = self.parseRecords(xml, [locale])
         except ET.ParseError:
             msg = translate(
                 "SGD",
                 "Error when trying to retrieve metadata - Response cannot be parsed",
             )
             log(msg)
+            if raiseErrors:
+                raise Exception(task.exception or msg)
             return metadata
 
-        # Search for title and description in xml
-        searchTerms = {
-            "title": f"{XML_NAMESPACES['gmd']}title",
-            "description": f"{XML_NAMESPACES['gmd']}abstract",
-        }
-
-        for mapsTo, searchTerm in searchTerms.items():
-            xmlElements = [elem for elem in root.iter(tag=searchTerm)]
-            for xmlElem in xmlElements:
-                localizedStrings = [
-                    elem
-                    for elem in xmlElem.iter(
-                        tag=f"{XML_NAMESPACES['gmd']}LocalisedCharacterString"
-                    )
-                ]
-                for localizedString in localizedStrings:
-                    if localizedString.get("locale") == "#" + locale.upper():
-                        metadata[mapsTo] = localizedString.text
-                        break
-                if metadata.get(mapsTo):
-                    break
+        # The response contains the requested record only
+        for localizedMetadata in records.values():
+            metadata = localizedMetadata.get(locale, {})
+            break
 
         if saveInFile:
-            # Save metadata to file so we don't have to call the API again
+            # Save metadata so we don't have to call the API again
             self.updatePreSavedMetadata(metadata, collectionId, locale)
 
         return metadata
 
-    def loadPreSavedMetadata(self):
-        """Read pre-saved metadata from json file."""
-        self.preSavedMetadata = loadFromFile(self.dataPath)
+    def getMetaBatch(
+        self,
+        task: QgsTask,
+        metadataUrls: dict[str, str],
+        locales: Iterable[str],
+        cachePolicy: CachePolicy = CachePolicy.PREFER_CACHE,
+    ) -> dict[str, dict[str, dict]]:
+        """Requests the metadata of many collections in all given locales
+        with as few requests as possible, instead of one request per
+        collection and locale. Several records are requested at once with
+        GetRecords and read in one pass.
+        :param metadataUrls: {collectionId: metadataUrl}
+        :return: {collectionId: {locale: metadata}}"""
+        collectionIds = {}
+        for collectionId, metadataUrl in metadataUrls.items():
+            geocatDsId = self.extractUuid(metadataUrl)
+            if geocatDsId:
+                collectionIds.setdefault(geocatDsId, []).append(collectionId)
+        uuids = list(collectionIds)
+
+        records = {}
+        for start in range(0, len(uuids), BATCH_SIZE):
+            if task.isCanceled():
+                break
+            records.update(
+                self.getRecords(
+                    task, uuids[start : start + BATCH_SIZE], locales, cachePolicy
+                )
+            )
+
+        metadata = {}
+        for geocatDsId, localizedMetadata in records.items():
+            for collectionId in collectionIds.get(geocatDsId, []):
+                metadata[collectionId] = localizedMetadata
+        return metadata
+
+    def getRecords(
+        self,
+        task: QgsTask,
+        uuids: list[str],
+        locales: Iterable[str],
+        cachePolicy: CachePolicy = CachePolicy.PREFER_CACHE,
+    ) -> dict[str, dict[str, dict]]:
+        """Requests the records with the given ids, page by page. Raises an
+        exception if geocat.ch can't be reached or the response can't be
+        parsed."""
+        constraint = " OR ".join(f"Identifier='{uuid}'" for uuid in uuids)
+        records = {}
+        startPosition = 1
+        while startPosition and not task.isCanceled():
+            params = {
+                **BATCH_REQUEST_PARAMS,
+                "constraint": constraint,
+                "maxRecords": BATCH_SIZE,
+                "startPosition": startPosition,
+            }
+            xml = fetch(
+                task,
+                BASEURL,
+                params=params,
+                decoder="string",
+                cache=responseCache(),
+                ttl=METADATA_TTL,
+                cachePolicy=cachePolicy,
+            )
+            try:
+                page, startPosition = self.parseRecords(xml, locales)
+            except ET.ParseError:
+                msg = translate(
+                    "SGD",
+                    "Error when trying to retrieve metadata - Response cannot be parsed",
+                )
+                raise Exception(task.exception or msg)
+            if not page:
+                break
+            records.update(page)
+        return records
+
+    @staticmethod
+    def parseRecords(xml, locales: Iterable[str]) -> tuple[dict, int]:
+        """Reads title and description of all records in a CSW response in
+        one pass. For each element, the first text found in a locale is
+        used.
+        :return: {uuid: {locale: metadata}} and the position of the next
+            record, 0 if there are no more records"""
+        localeTags = {f"#{locale.upper()}": locale for locale in locales}
+        mapsTo = {tag: key for key, tag in SEARCH_TERMS.items()}
+        records = {}
+        nextRecord = 0
+        uuid = None
+        metadata = {}
+
+        content = bytes(xml) if xml else b""
+        for event, elem in ET.iterparse(io.BytesIO(content), events=("start", "end")):
+            if event == "start":
+                if elem.tag == f"{XML_NAMESPACES['csw']}SearchResults":
+                    nextRecord = int(elem.get("nextRecord") or 0)
+                continue
+
+            if elem.tag == f"{XML_NAMESPACES['gmd']}fileIdentifier" and not uuid:
+                uuid = elem.findtext(f"{XML_NAMESPACES['gco']}CharacterString")
+            elif elem.tag in mapsTo:
+                key = mapsTo[elem.tag]
+                for localizedString in elem.iter(
+                    f"{XML_NAMESPACES['gmd']}LocalisedCharacterString"
+                ):
+                    locale = localeTags.get(localizedString.get("locale"))
+                    if locale and localizedString.text:
+                        metadata.setdefault(locale, {}).setdefault(
+                            key, localizedString.text
+                        )
+                elem.clear()
+            elif elem.tag == f"{XML_NAMESPACES['gmd']}MD_Metadata":
+                if uuid:
+                    records[uuid] = metadata
+                uuid = None
+                metadata = {}
+                elem.clear()
+
+        return records, nextRecord
 
     def updatePreSavedMetadata(
         self, metadata, collectionId: str | None = None, locale: str | None = None
     ):
         """Update the pre-saved metadata with a completely new dictionary or
-        only update partially by adding a new collection."""
+        only update the record of one collection and locale. A complete
+        update is also written to the bundled json file."""
         if collectionId and locale:
-            # Make a partial update of the data in the file
-            if collectionId not in self.preSavedMetadata:
-                self.preSavedMetadata[collectionId] = {locale: metadata}
-            else:
-                self.preSavedMetadata[collectionId][locale] = metadata
-            saveToFile(self.preSavedMetadata, self.dataPath)
+            self.store.put(collectionId, locale, metadata)
         else:
-            # Fully replace the data in the file
+            self.store.replaceAll(metadata)
             saveToFile(metadata, self.dataPath)
 
     @staticmethod
@@ -0,0 +1,141 @@
+"""
+/***************************************************************************
+ SwissGeoDownloader
+                                 A QGIS plugin
+ This plugin lets you comfortably download swiss geo data.
+                             -------------------
+        begin                : 2021-03-14
+        copyright            : (C) 2025 by Patricia Moll
+        email                : pimoll.dev@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import gzip
+import threading
+import zlib
+
+from qgis.PyQt.QtNetwork import QNetworkReply, QNetworkRequest
+from qgis.core import QgsNetworkReplyContent
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Qt only decompresses gzip and deflate by itself. Setting the header
+# ourselves switches that off, so that brotli can be offered when the module
+# is available and the compressed size is known for the transfer statistics.
+ACCEPT_ENCODING = b"gzip, deflate, br" if brotli else b"gzip, deflate"
+
+
+class TransferStats:
+    """
+    Counts the bytes received over the network and the bytes they were
+    decoded to, shared by all API requests of the plugin.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.responses = 0
+            self.compressed = 0
+            self.received = 0
+            self.decoded = 0
+
+    def record(self, received: int, decoded: int, compressed: bool):
+        with self._lock:
+            self.responses += 1
+            self.compressed += int(compressed)
+            self.received += received
+            self.decoded += decoded
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "responses": self.responses,
+                "compressed": self.compressed,
+                "bytes_received": self.received,
+                "bytes_decoded": self.decoded,
+                "bytes_saved": self.decoded - self.received,
+            }
+
+
+transferStats = TransferStats()
+
+
+def acceptCompression(request: QNetworkRequest) -> QNetworkRequest:
+    """
+    Asks the server for a compressed response. The content of the reply
+    must then be read with readReply.
+    """
+    request.setRawHeader(b"Accept-Encoding", ACCEPT_ENCODING)
+    return request
+
+
+def decompress(content: bytes, encoding: str) -> bytes:
+    """
+    Decodes the content of a response according to its Content-Encoding.
+    """
+    for coding in reversed([c.strip().lower() for c in encoding.split(",")]):
+        if coding in ("", "identity"):
+            continue
+        if coding in ("gzip", "x-gzip"):
+            content = gzip.decompress(content)
+        elif coding == "deflate":
+            try:
+                content = zlib.decompress(content)
+            except zlib.error:
+                # Some servers send raw deflate data without zlib header
+                content = zlib.decompress(content, -zlib.MAX_WBITS)
+        elif coding == "br" and brotli:
+            content = brotli.decompress(content)
+        else:
+            raise ValueError(f"Unsupported content encoding: {coding}")
+    return content
+
+
+def decodedContent(content: bytes, encoding: str) -> bytes:
+    """
+    Decompresses the content of a response and counts the transferred bytes.
+    """
+    decoded = decompress(content, encoding) if encoding else content
+    transferStats.record(len(content), len(decoded), bool(encoding))
+    return decoded
+
+
+def readReply(reply: QNetworkReply) -> bytes:
+    """
+    Reads the complete content of a reply to a request made with
+    acceptCompression, as bytes ready to be parsed.
+    """
+    return decodedContent(reply.readAll().data(), contentEncoding(reply))
+
+
+def replyContent(reply: QgsNetworkReplyContent) -> bytes:
+    """
+    Same as readReply for the reply of a blocking request.
+    """
+    return decodedContent(reply.content().data(), contentEncoding(reply))
+
+
+def contentEncoding(reply: QNetworkReply | QgsNetworkReplyContent) -> str:
+    """
+    Returns the Content-Encoding of a reply which still has to be decoded.
+    Qt decompresses the content itself if the request was not made with
+    acceptCompression, but keeps the header.
+    """
+    if bytes(reply.request().rawHeader(b"Accept-Encoding")) != ACCEPT_ENCODING:
+        return ""
+    return bytes(reply.rawHeader(b"Content-Encoding")).decode("latin-1")
@@ -0,0 +1,190 @@
+"""
+/***************************************************************************
+ SwissGeoDownloader
+                                 A QGIS plugin
+ This plugin lets you comfortably download swiss geo data.
+                             -------------------
+        begin                : 2021-03-14
+        copyright            : (C) 2025 by Patricia Moll
+        email                : pimoll.dev@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from swiss_locator.swissgeodownloader.api.stac_client import ITEMS_TTL, AssetRecord
+
+# Bounding boxes are lists of [xmin, ymin, xmax, ymax]
+Bbox = list[float]
+
+# Number of asset records kept in memory over all collections, the least
+#  recently used collections are dropped when it is exceeded
+MAX_RECORDS = 50000
+# If more rectangles than this are missing, the whole bbox is requested
+#  instead of the difference
+MAX_DIFFERENCE_REQUESTS = 4
+
+
+def bboxIntersects(a: Bbox, b: Bbox) -> bool:
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+def bboxContains(outer: Bbox, inner: Bbox) -> bool:
+    return (
+        outer[0] <= inner[0]
+        and outer[1] <= inner[1]
+        and outer[2] >= inner[2]
+        and outer[3] >= inner[3]
+    )
+
+
+def bboxDifference(bbox: Bbox, covered: list[Bbox]) -> list[Bbox]:
+    """Returns the parts of a bbox which are not covered by any of the given
+    bboxes, as a list of non overlapping rectangles. An empty list means that
+    the bbox is fully covered."""
+    remaining = [list(bbox)]
+    for cover in covered:
+        pieces = []
+        for rect in remaining:
+            if not bboxIntersects(rect, cover) or _isEdgeContact(rect, cover):
+                pieces.append(rect)
+                continue
+            xmin, ymin, xmax, ymax = rect
+            # Strips left and right of the cover, full height
+            if xmin < cover[0]:
+                pieces.append([xmin, ymin, cover[0], ymax])
+            if xmax > cover[2]:
+                pieces.append([cover[2], ymin, xmax, ymax])
+            # Strips below and above the cover, between the side strips
+            innerXmin = max(xmin, cover[0])
+            innerXmax = min(xmax, cover[2])
+            if ymin < cover[1]:
+                pieces.append([innerXmin, ymin, innerXmax, cover[1]])
+            if ymax > cover[3]:
+                pieces.append([innerXmin, cover[3], innerXmax, ymax])
+        remaining = pieces
+        if not remaining:
+            break
+    return remaining
+
+
+def _isEdgeContact(a: Bbox, b: Bbox) -> bool:
+    """Rectangles that only share an edge do not cover each other."""
+    return a[0] == b[2] or b[0] == a[2] or a[1] == b[3] or b[1] == a[3]
+
+
+def recordBbox(record: AssetRecord) -> Bbox | None:
+    if record.bbox is None:
+        return None
+    return [
+        record.bbox.xMinimum(),
+        record.bbox.yMinimum(),
+        record.bbox.xMaximum(),
+        record.bbox.yMaximum(),
+    ]
+
+
+class _Coverage:
+    def __init__(self):
+        # Areas whose items have been requested completely, along with the
+        #  time they were requested
+        self.areas: list[tuple[Bbox, float]] = []
+        # All records received for these areas, identified by their href
+        self.records: dict[str, AssetRecord] = {}
+        # Whether the whole collection was requested, without bbox
+        self.complete: float | None = None
+
+
+class ItemCoverageCache:
+    """Keeps the asset records of recently requested bounding boxes per
+    collection. A request for a bbox inside the covered areas can be
+    answered locally, for other requests the areas which still have to be
+    requested are calculated.
+    The items of data.geo.admin.ch change rarely, the covered areas expire
+    after ITEMS_TTL like the cached item pages. At most `maxRecords` records
+    are kept, results of a larger area are not cached at all."""
+
+    def __init__(self, ttl: int = ITEMS_TTL, maxRecords: int = MAX_RECORDS):
+        self.ttl = ttl
+        self.maxRecords = maxRecords
+        self.collections: OrderedDict[str, _Coverage] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _coverage(self, collectionId: str) -> _Coverage:
+        coverage = self.collections.get(collectionId)
+        if coverage is None:
+            coverage = _Coverage()
+            self.collections[collectionId] = coverage
+        self.collections.move_to_end(collectionId)
+        now = time.time()
+        coverage.areas = [a for a in coverage.areas if now - a[1] < self.ttl]
+        if coverage.complete and now - coverage.complete >= self.ttl:
+            coverage.complete = None
+        if not coverage.areas and not coverage.complete:
+            coverage.records = {}
+        return coverage
+
+    def missingAreas(self, collectionId: str, bbox: Bbox | None) -> list[Bbox | None]:
+        """Returns the areas of a request that are not covered yet. The
+        result is [None] if the whole collection has to be requested."""
+        with self.lock:
+            coverage = self._coverage(collectionId)
+            if coverage.complete:
+                return []
+            if bbox is None:
+                return [None]
+            missing = bboxDifference(bbox, [area for area, _ in coverage.areas])
+            if len(missing) > MAX_DIFFERENCE_REQUESTS:
+                return [list(bbox)]
+            return missing
+
+    def cachedRecords(self, collectionId: str, bbox: Bbox | None) -> list[AssetRecord]:
+        """Returns the known records that intersect a bbox."""
+        with self.lock:
+            coverage = self._coverage(collectionId)
+            records = list(coverage.records.values())
+        if bbox is None:
+            return records
+        return [
+            record
+            for record in records
+            if record.bbox is None or bboxIntersects(recordBbox(record), bbox)
+        ]
+
+    def add(self, collectionId: str, area: Bbox | None, records: list[AssetRecord]):
+        """Saves the records received for an area, which is then covered."""
+        if len(records) > self.maxRecords:
+            return
+        with self.lock:
+            coverage = self._coverage(collectionId)
+            for record in records:
+                coverage.records[record.href] = record
+            if area is None:
+                coverage.complete = time.time()
+            else:
+                coverage.areas.append((list(area), time.time()))
+            self._evict()
+
+    def _evict(self):
+        """Drops the least recently used collections until the records fit
+        into the budget. The records of a collection only make sense along
+        with its covered areas, so a collection is dropped as a whole."""
+        count = sum(len(c.records) for c in self.collections.values())
+        while count > self.maxRecords and self.collections:
+            _, coverage = self.collections.popitem(last=False)
+            count -= len(coverage.records)
+
+    def clear(self):
+        with self.lock:
+            self.collections.clear()
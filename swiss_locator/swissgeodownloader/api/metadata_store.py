@@ -0,0 +1,167 @@
+"""
+/***************************************************************************
+ SwissGeoDownloader
+                                 A QGIS plugin
+ This plugin lets you comfortably download swiss geo data.
+                             -------------------
+        begin                : 2021-03-14
+        copyright            : (C) 2025 by Patricia Moll
+        email                : pimoll.dev@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from swiss_locator.swissgeodownloader.utils.metadata_handler import (
+    SAVE_DIRECTORY,
+    loadFromFile,
+)
+from swiss_locator.swissgeodownloader.utils.utilities import log
+
+
+class MetadataStore:
+    """Collection metadata (title and description) per collection and
+    locale in a SQLite database. Records are read when they are needed and
+    written one by one, instead of parsing and rewriting the complete json
+    file bundled with the plugin.
+    The bundled json file seeds the store. It is imported once, and again
+    when it changes with an update of the plugin."""
+
+    def __init__(self, path: str, seedFile: str | None = None):
+        """
+        :param seedFile: name of the bundled json file in the api folder
+        """
+        self.path = path
+        self.lock = threading.RLock()
+        # Records read so far, None for records that are not in the store
+        self.memory: dict[tuple[str, str], dict | None] = {}
+        with self._connect() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS metadata ("
+                "collection_id TEXT, locale TEXT, value TEXT, "
+                "PRIMARY KEY (collection_id, locale)) WITHOUT ROWID"
+            )
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT)"
+            )
+        if seedFile:
+            self.seed(seedFile)
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=10)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    @staticmethod
+    def _seedSignature(seedFile: str) -> str | None:
+        try:
+            stat = os.stat(os.path.join(SAVE_DIRECTORY, seedFile))
+        except OSError:
+            return None
+        return f"{stat.st_size}:{int(stat.st_mtime)}"
+
+    def seed(self, seedFile: str):
+        """Imports the bundled metadata file if it changed since the last
+        import."""
+        signature = self._seedSignature(seedFile)
+        if signature is None:
+            return
+        with self.lock:
+            try:
+                with self._connect() as db:
+                    row = db.execute(
+                        "SELECT value FROM info WHERE key = 'seed'"
+                    ).fetchone()
+                if row and row[0] == signature:
+                    return
+                self.replaceAll(loadFromFile(seedFile), clear=False)
+                with self._connect() as db:
+                    db.execute(
+                        "INSERT OR REPLACE INTO info (key, value) VALUES ('seed', ?)",
+                        (signature,),
+                    )
+            except sqlite3.Error as e:
+                log(f"Importing metadata into the store not possible: {e}")
+
+    def get(self, collectionId: str, locale: str) -> dict | None:
+        """Returns the metadata of a collection in a locale, None if the
+        store has no record for it."""
+        key = (collectionId, locale)
+        with self.lock:
+            if key in self.memory:
+                return self.memory[key]
+            try:
+                with self._connect() as db:
+                    row = db.execute(
+                        "SELECT value FROM metadata "
+                        "WHERE collection_id = ? AND locale = ?",
+                        key,
+                    ).fetchone()
+                value = json.loads(row[0]) if row else None
+            except (sqlite3.Error, ValueError):
+                return None
+            self.memory[key] = value
+            return value
+
+    def put(self, collectionId: str, locale: str, metadata: dict):
+        """Inserts or updates the record of a collection in a locale."""
+        with self.lock:
+            self.memory[(collectionId, locale)] = metadata
+            try:
+                with self._connect() as db:
+                    db.execute(
+                        "INSERT OR REPLACE INTO metadata "
+                        "(collection_id, locale, value) VALUES (?, ?, ?)",
+                        (collectionId, locale, json.dumps(metadata)),
+                    )
+            except sqlite3.Error as e:
+                log(f"Saving metadata to the store not possible: {e}")
+
+    def replaceAll(self, metadata: dict[str, dict[str, dict]], clear: bool = True):
+        """Writes the metadata of many collections in one transaction, given
+        as {collectionId: {locale: metadata}}. All other records are removed
+        unless `clear` is False."""
+        rows = [
+            (collectionId, locale, json.dumps(value))
+            for collectionId, locales in metadata.items()
+            for locale, value in locales.items()
+        ]
+        with self.lock:
+            self.memory.clear()
+            with self._connect() as db:
+                if clear:
+                    db.execute("DELETE FROM metadata")
+                db.executemany(
+                    "INSERT OR REPLACE INTO metadata "
+                    "(collection_id, locale, value) VALUES (?, ?, ?)",
+                    rows,
+                )
+
+    def export(self) -> dict[str, dict[str, dict]]:
+        """Returns all records as {collectionId: {locale: metadata}}, the
+        format of the bundled json file."""
+        with self.lock, self._connect() as db:
+            rows = db.execute(
+                "SELECT collection_id, locale, value FROM metadata"
+            ).fetchall()
+        metadata: dict[str, dict[str, dict]] = {}
+        for collectionId, locale, value in rows:
+            metadata.setdefault(collectionId, {})[locale] = json.loads(value)
+        return metadata
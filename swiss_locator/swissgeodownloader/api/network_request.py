@@ -19,14 +19,112 @@
  ***************************************************************************/
 """
 
+import hashlib
 import json
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from contextlib import contextmanager
 
-from qgis.PyQt.QtCore import QByteArray, QEventLoop, QUrl, QUrlQuery
+from qgis.PyQt.QtCore import QByteArray, QEventLoop, QTimer, QUrl, QUrlQuery
 from qgis.PyQt.QtNetwork import QNetworkReply, QNetworkRequest
-from qgis.core import QgsTask, QgsBlockingNetworkRequest, QgsFileDownloader
+from qgis.core import (
+    Qgis,
+    QgsTask,
+    QgsBlockingNetworkRequest,
+    QgsNetworkAccessManager,
+)
 
+from swiss_locator.swissgeodownloader.api.http_compression import (
+    acceptCompression,
+    readReply,
+    replyContent,
+)
+
+from swiss_locator.swissgeodownloader.api.file_integrity import (
+    CHUNK_SIZE as HASH_CHUNK_SIZE,
+    parseMultihash,
+)
+from swiss_locator.swissgeodownloader.api.response_cache import (
+    DEFAULT_TTL,
+    CachePolicy,
+    ResponseCache,
+)
 from swiss_locator.swissgeodownloader.utils.utilities import translate, log
 
+# Retries of an interrupted download, waiting RETRY_BASE_DELAY seconds
+#  before the first retry and doubling the time with every retry
+MAX_RETRIES = 5
+RETRY_BASE_DELAY = 2
+RETRY_MAX_DELAY = 60
+# Bytes buffered per download if the bandwidth is limited
+READ_BUFFER_SIZE = 256 * 1024
+# HEAD requests sent at the same time by fetchContentLengths
+MAX_PARALLEL_HEAD_REQUESTS = 6
+# Interval to check for cancellation while waiting for the request pacer
+PACING_INTERVAL = 0.2
+# Sent with the downloads, the plugin embedding the downloader sets its own
+#  with setUserAgent
+_userAgent = b"QGIS Swiss Geo Downloader"
+
+
+def setUserAgent(userAgent: bytes):
+    global _userAgent
+    _userAgent = userAgent
+
+
+class RequestPacer:
+    """Spaces the start of requests evenly, shared by several threads.
+    Requests are only paced in threads that use pacedRequests."""
+
+    def __init__(self, requestsPerSecond: float = 0, clock: Callable = time.monotonic):
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.interval = 1 / requestsPerSecond if requestsPerSecond > 0 else 0
+        self.nextStart = clock()
+
+    def reserve(self) -> float:
+        """Reserves the next start and returns the seconds to wait for it."""
+        with self.lock:
+            now = self.clock()
+            start = max(now, self.nextStart)
+            self.nextStart = start + self.interval
+            return start - now
+
+    def wait(self, task: QgsTask | None = None):
+        """Blocks until the next request may start or the task is
+        canceled."""
+        delay = self.reserve()
+        while delay > 0 and not (task and task.isCanceled()):
+            time.sleep(min(delay, PACING_INTERVAL))
+            delay -= PACING_INTERVAL
+
+
+# Request pacer of the current thread, see pacedRequests
+_pacing = threading.local()
+
+
+@contextmanager
+def pacedRequests(pacer: RequestPacer, task: QgsTask | None = None):
+    """Paces all requests started by the current thread within the
+    context, e.g. to limit the requests of a crawler to a public service."""
+    previous = getattr(_pacing, "pacer", None), getattr(_pacing, "task", None)
+    _pacing.pacer, _pacing.task = pacer, task
+    try:
+        yield
+    finally:
+        _pacing.pacer, _pacing.task = previous
+
+
+def _pace():
+    pacer = getattr(_pacing, "pacer", None)
+    if pacer:
+        pacer.wait(_pacing.task)
+
 
 def fetch(
     task: QgsTask,
@@ -35,10 +133,16 @@ def fetch(
     header=None,
     method="get",
     decoder="json",
+    cache: ResponseCache | None = None,
+    ttl: int = DEFAULT_TTL,
+    cachePolicy: CachePolicy = CachePolicy.PREFER_CACHE,
 ) -> dict | QByteArray:
     """Perform a blocking network request without the help of the
     QgsStacController. This is necessary because the controller does not
-    parse all available item/asset properties of the response."""
+    parse all available item/asset properties of the response.
+    If a cache is given, GET responses are cached for `ttl` seconds. The
+    cache policy decides whether a cached response is used directly or
+    revalidated with a conditional request (ETag / Last-Modified)."""
 
     request = QNetworkRequest()
     # Prepare url
@@ -47,9 +151,25 @@ def fetch(
 
     if header:
         request.setHeader(*tuple(header))
+    if method == "get":
+        acceptCompression(request)
+    else:
+        # A HEAD request must report the size of the uncompressed file
+        request.setRawHeader(b"Accept-Encoding", b"identity")
+
+    useCache = cache is not None and method == "get"
+    cacheKey = callUrl.toString()
+    if useCache:
+        if cachePolicy == CachePolicy.PREFER_CACHE:
+            cachedValue = cache.get(cacheKey)
+            if cachedValue is not None:
+                return _decoded(cachedValue, decoder)
+        if cachePolicy != CachePolicy.ALWAYS_NETWORK:
+            _setValidator(request, cache, cacheKey)
 
     log(translate("SGD", "Start request {}").format(callUrl.toString()))
     # Start request
+    _pace()
     http = QgsBlockingNetworkRequest()
     if method == "get":
         http.get(request, forceRefresh=True)
@@ -68,7 +188,7 @@ def fetch(
         # Service returned an error
         if r.content():
             try:
-                errorResp = json.loads(str(r.content(), "utf-8"))
+                errorResp = json.loads(replyContent(r))
             except json.JSONDecodeError as e:
                 task.exception = str(e)
                 raise e
@@ -81,67 +201,528 @@ def fetch(
 
     # Process response
     if method == "get":
+        if useCache and _isNotModified(r):
+            cachedValue = cache.revalidated(cacheKey, ttl)
+            if cachedValue is not None:
+                return _decoded(cachedValue, decoder)
+        content = replyContent(r)
         if decoder == "json":
             try:
-                content = str(r.content(), "utf-8")
                 if content:
-                    return json.loads(content)
+                    value = json.loads(content)
+                    if useCache:
+                        cache.put(cacheKey, value, _etag(r), ttl, _lastModified(r))
+                    return value
                 else:
                     raise Exception("Empty response")
             except json.JSONDecodeError as e:
                 task.exception = str(e)
                 raise Exception(task.exception)
         else:  # decoder string
-            return r.content()
+            if useCache:
+                try:
+                    text = str(content, "utf-8")
+                    cache.put(cacheKey, text, _etag(r), ttl, _lastModified(r))
+                except UnicodeDecodeError:
+                    pass
+            return QByteArray(content)
     elif method == "head":
         return r
     else:
         raise Exception(f"Method {method} not supported")
 
 
-def fetchFile(
+def fetchContentLengths(
     task: QgsTask,
-    url: QUrl | str,
-    filename: str,
-    filePath: str,
-    part: float,
-    params: dict | None = None,
-):
-    # Prepare url
-    callUrl = QUrl(url)
-    if params:
-        queryParams = QUrlQuery()
-        for key, value in params.items():
-            queryParams.addQueryItem(key, str(value))
-        callUrl.setQuery(queryParams)
+    urls: list[str],
+    cache: ResponseCache | None = None,
+    ttl: int = DEFAULT_TTL,
+    onSize: Callable[[str, int | None], None] | None = None,
+    maxParallel: int = MAX_PARALLEL_HEAD_REQUESTS,
+) -> dict[str, int | None]:
+    """Request the sizes of several files with concurrent HEAD requests,
+    at most `maxParallel` at the same time. Cached sizes are not requested
+    again. `onSize` is called with every size as soon as it is known, the
+    size is None if the server does not report it."""
+    sizes: dict[str, int | None] = {}
+    pending: deque[str] = deque()
+    for url in dict.fromkeys(urls):
+        cachedValue = cache.get(_contentLengthKey(url)) if cache is not None else None
+        if cachedValue is not None:
+            sizes[url] = cachedValue
+            if onSize:
+                onSize(url, cachedValue)
+        else:
+            pending.append(url)
+    if not pending:
+        return sizes
 
-    log(translate("SGD", "Start download of {}").format(callUrl.toString()))
-    fileFetcher = QgsFileDownloader(callUrl, filePath)
+    active: dict[str, QNetworkReply] = {}
+    loop = QEventLoop()
 
-    def onError():
-        task.exception = translate("SGD", "Error when downloading {}").format(filename)
-        return False
+    def startNext():
+        while pending and len(active) < maxParallel and not task.isCanceled():
+            url = pending.popleft()
+            _pace()
+            reply = QgsNetworkAccessManager.instance().head(fileRequest(url))
+            reply.finished.connect(lambda _url=url: onFinished(_url))
+            active[url] = reply
+        if not active:
+            loop.quit()
+
+    def onFinished(url: str):
+        reply = active.pop(url, None)
+        if reply is None:
+            return
+        size = None
+        if reply.error() == QNetworkReply.NetworkError.NoError and reply.hasRawHeader(
+            b"Content-Length"
+        ):
+            size = int(reply.rawHeader(b"Content-Length"))
+            if cache is not None:
+                cache.put(_contentLengthKey(url), size, None, ttl)
+        reply.deleteLater()
+        sizes[url] = size
+        if onSize:
+            onSize(url, size)
+        startNext()
+
+    # Poll for task cancellation while waiting for the replies
+    timer = QTimer()
+    timer.setInterval(200)
 
-    def onProgress(bytesReceived, bytesTotal):
+    def checkCanceled():
         if task.isCanceled():
-            task.exception = translate("SGD", "Download of {} was canceled").format(
-                filename
+            pending.clear()
+            for reply in list(active.values()):
+                reply.abort()
+
+    timer.timeout.connect(checkCanceled)
+    timer.start()
+    startNext()
+    if active:
+        loop.exec(QEventLoop.ProcessEventsFlag.ExcludeUserInputEvents)
+    timer.stop()
+
+    if task.isCanceled():
+        raise Exception("User canceled")
+    return sizes
+
+
+def fileRequest(url: QUrl | str) -> QNetworkRequest:
+    """Request for a file as it is stored on the server. Otherwise Qt asks
+    for a compressed response, which has no Content-Length and can't be
+    resumed with a Range request. Redirects are followed, unless they lead
+    from https to http."""
+    request = QNetworkRequest(QUrl(url))
+    request.setRawHeader(b"Accept-Encoding", b"identity")
+    request.setAttribute(
+        QNetworkRequest.Attribute.RedirectPolicyAttribute,
+        QNetworkRequest.RedirectPolicy.NoLessSafeRedirectPolicy,
+    )
+    return request
+
+
+def _contentLengthKey(url: QUrl | str) -> str:
+    return f"HEAD {QUrl(url).toString()}"
+
+
+def _decoded(cachedValue, decoder: str) -> dict | QByteArray:
+    """Cached responses of the string decoder are saved as text."""
+    if decoder == "json":
+        return cachedValue
+    return QByteArray(cachedValue.encode("utf-8"))
+
+
+def _setValidator(request: QNetworkRequest, cache: ResponseCache, cacheKey: str):
+    """Add the ETag or Last-Modified date of a cache entry to the request,
+    so that the server can answer with 304 Not Modified instead of the
+    full response."""
+    entry = cache.lookup(cacheKey)
+    if entry and entry.etag:
+        request.setRawHeader(b"If-None-Match", entry.etag.encode())
+    if entry and entry.lastModified:
+        request.setRawHeader(b"If-Modified-Since", entry.lastModified.encode())
+
+
+def _isNotModified(reply) -> bool:
+    return reply.attribute(QNetworkRequest.Attribute.HttpStatusCodeAttribute) == 304
+
+
+def _etag(reply) -> str | None:
+    etag = reply.rawHeader(b"ETag")
+    return bytes(etag).decode() if etag else None
+
+
+def _lastModified(reply) -> str | None:
+    lastModified = reply.rawHeader(b"Last-Modified")
+    return bytes(lastModified).decode() if lastModified else None
+
+
+def startRequest(
+    url: QUrl | str, params=None, cache: ResponseCache | None = None
+) -> QNetworkReply:
+    """Start a non-blocking GET request. The reply is downloaded in the
+    background while the calling thread continues, use waitForReply() to
+    get its content."""
+    callUrl = createUrl(url, params)
+    log(translate("SGD", "Start request {}").format(callUrl.toString()))
+    request = acceptCompression(QNetworkRequest(callUrl))
+    if cache is not None:
+        _setValidator(request, cache, callUrl.toString())
+    _pace()
+    return QgsNetworkAccessManager.instance().get(request)
+
+
+def startPostRequest(url: QUrl | str, body: dict) -> QNetworkReply:
+    """Start a non-blocking POST request with a json body, use
+    waitForReply() to get its content."""
+    callUrl = QUrl(url)
+    data = json.dumps(body).encode("utf-8")
+    log(translate("SGD", "Start request {}").format(callUrl.toString()))
+    log(f"Request body: {data}", debugMsg=True)
+    request = acceptCompression(QNetworkRequest(callUrl))
+    request.setHeader(
+        QNetworkRequest.KnownHeaders.ContentTypeHeader, "application/json"
+    )
+    _pace()
+    return QgsNetworkAccessManager.instance().post(request, QByteArray(data))
+
+
+def waitForReply(
+    task: QgsTask,
+    reply: QNetworkReply,
+    cache: ResponseCache | None = None,
+    ttl: int = DEFAULT_TTL,
+) -> dict:
+    """Wait for a reply started with startRequest() and return its decoded
+    json content. The reply is aborted if the task is canceled meanwhile.
+    If a cache is given, the content is cached for `ttl` seconds."""
+    if not reply.isFinished():
+        loop = QEventLoop()
+        reply.finished.connect(loop.quit)
+
+        # Poll for task cancellation while waiting for the network reply
+        timer = QTimer()
+        timer.setInterval(200)
+
+        def checkCanceled():
+            if task.isCanceled():
+                reply.abort()
+                loop.quit()
+
+        timer.timeout.connect(checkCanceled)
+        timer.start()
+        loop.exec(QEventLoop.ProcessEventsFlag.ExcludeUserInputEvents)
+        timer.stop()
+
+    if task.isCanceled():
+        raise Exception("User canceled")
+
+    url = reply.request().url().toString()
+    content = readReply(reply)
+    reply.deleteLater()
+    if reply.error() != QNetworkReply.NetworkError.NoError:
+        task.exception = translate(
+            "SGD", "{} not reachable or no internet connection"
+        ).format(url)
+        if content:
+            try:
+                errorResp = json.loads(content)
+            except json.JSONDecodeError:
+                errorResp = {}
+            if "code" in errorResp and "description" in errorResp:
+                task.exception = (
+                    translate("SGD", "{} returns error").format(url)
+                    + f": {errorResp['code']} - {errorResp['description']}"
+                )
+        raise Exception(task.exception)
+
+    if cache is not None and _isNotModified(reply):
+        value = cache.revalidated(url, ttl)
+        if value is not None:
+            return value
+
+    if not content:
+        task.exception = "Empty response"
+        raise Exception(task.exception)
+    try:
+        value = json.loads(content)
+    except json.JSONDecodeError as e:
+        task.exception = str(e)
+        raise Exception(task.exception)
+    if cache is not None:
+        cache.put(url, value, _etag(reply), ttl, _lastModified(reply))
+    return value
+
+
+def retryDelay(attempt: int) -> float:
+    """Seconds to wait before the given retry (starting at 1): exponential
+    backoff with jitter, so that interrupted downloads don't all retry at
+    the same moment."""
+    delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempt - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def isRetryable(httpStatus: int | None) -> bool:
+    """Connection errors and temporary server errors are retried, client
+    errors like 404 are not."""
+    return not httpStatus or httpStatus in (408, 429) or httpStatus >= 500
+
+
+def parseContentRange(header: str) -> tuple[int, int | None] | None:
+    """Returns the first byte and the total size of a 'Content-Range:
+    bytes 100-199/1000' header, the total size is None if unknown."""
+    match = re.match(r"bytes\s+(\d+)-\d+/(\d+|\*)", header or "")
+    if not match:
+        return None
+    total = match.group(2)
+    return int(match.group(1)), None if total == "*" else int(total)
+
+
+class FileDownload:
+    """Downloads a file to disk without blocking, the caller needs to run
+    an event loop. The bytes are written to '<filePath>.part', which is only
+    renamed once its size matches the Content-Length. If the connection
+    drops, the download is retried with backoff and resumed from the end of
+    the partial file with a Range request. A partial file left behind by a
+    canceled download is resumed as well.
+    If a checksum is given, the bytes are hashed while they are written and
+    the file is downloaded again if the hash does not match. Only the bytes
+    of a partial file left behind by an earlier download are read again."""
+
+    def __init__(
+        self,
+        url: QUrl | str,
+        filePath: str,
+        onProgress: Callable[[int, int | None], None] | None = None,
+        onFinished: Callable[[bool], None] | None = None,
+        maxRetries: int = MAX_RETRIES,
+        limiter=None,
+        checksum: str | None = None,
+    ):
+        """
+        :param limiter: BandwidthLimiter of the download engine, if the
+                        bandwidth is limited
+        :param checksum: multihash of the file, e.g. the STAC 'file:checksum'
+        """
+        self.url = QUrl(url)
+        self.filePath = filePath
+        self.partPath = f"{filePath}.part"
+        self.onProgress = onProgress
+        self.onFinished = onFinished
+        self.maxRetries = maxRetries
+        self.limiter = limiter
+        self.attempt = 0
+        self.reply: QNetworkReply | None = None
+        self.file = None
+        # Bytes written to the partial file and expected size of the file
+        self.bytesReceived = 0
+        self.bytesTotal: int | None = None
+        self.error: str | None = None
+        self.canceled = False
+        self.restart = False
+        self.done = False
+        self.success = False
+        # Hash of the bytes written to the partial file
+        self.multihash = parseMultihash(checksum)
+        self.hasher = None
+        self.hashedBytes = 0
+        self.verified = False
+
+    def start(self):
+        if self.canceled or self.done:
+            return
+        offset = 0
+        if self.restart and os.path.exists(self.partPath):
+            os.remove(self.partPath)
+        self.restart = False
+        if os.path.exists(self.partPath):
+            offset = os.path.getsize(self.partPath)
+        self.bytesReceived = offset
+
+        request = fileRequest(self.url)
+        request.setRawHeader(b"User-Agent", _userAgent)
+        if offset:
+            request.setRawHeader(b"Range", f"bytes={offset}-".encode())
+            log(f"Resume download of {self.url.toString()} at {offset}", debugMsg=True)
+        self.reply = QgsNetworkAccessManager.instance().get(request)
+        if self.limiter:
+            # Stop reading from the socket while the bandwidth is used up
+            self.reply.setReadBufferSize(READ_BUFFER_SIZE)
+        self.reply.readyRead.connect(self._onReadyRead)
+        self.reply.finished.connect(self._onReplyFinished)
+
+    def abort(self):
+        """Cancel the download, the partial file is kept for a later
+        resume."""
+        self.canceled = True
+        if self.reply:
+            self.reply.abort()
+        elif not self.done:
+            # Waiting for a retry
+            self._finish(False)
+
+    def _openFile(self):
+        """Called with the first bytes of a reply: append to the partial file
+        if the server sends the requested range, otherwise start over."""
+        status = self.reply.attribute(QNetworkRequest.Attribute.HttpStatusCodeAttribute)
+        contentLength = self.reply.header(
+            QNetworkRequest.KnownHeaders.ContentLengthHeader
+        )
+        contentRange = parseContentRange(
+            bytes(self.reply.rawHeader(b"Content-Range")).decode()
+        )
+        if status == 206 and contentRange and contentRange[0] == self.bytesReceived:
+            self.bytesTotal = contentRange[1]
+            if self.multihash and (
+                self.hasher is None or self.hashedBytes != self.bytesReceived
+            ):
+                self._hashPartialFile()
+            self.file = open(self.partPath, "ab")
+        elif status == 206:
+            # Unexpected range, start over
+            self.restart = True
+            self.reply.abort()
+        else:
+            self.bytesReceived = 0
+            self.bytesTotal = int(contentLength) if contentLength else None
+            if self.multihash:
+                self.hasher = hashlib.new(self.multihash[0])
+                self.hashedBytes = 0
+            self.file = open(self.partPath, "wb")
+
+    def _hashPartialFile(self):
+        """Hash the bytes of a partial file which was written by an earlier
+        download."""
+        self.hasher = hashlib.new(self.multihash[0])
+        self.hashedBytes = 0
+        with open(self.partPath, "rb") as f:
+            while self.hashedBytes < self.bytesReceived:
+                chunk = f.read(
+                    min(HASH_CHUNK_SIZE, self.bytesReceived - self.hashedBytes)
+                )
+                if not chunk:
+                    break
+                self.hasher.update(chunk)
+                self.hashedBytes += len(chunk)
+
+    def readThrottled(self):
+        """Read the data held back because of the bandwidth limit, called
+        periodically by the download engine."""
+        if self.reply and self.reply.bytesAvailable():
+            self._onReadyRead()
+
+    def _onReadyRead(self, drain=False):
+        status = self.reply.attribute(QNetworkRequest.Attribute.HttpStatusCodeAttribute)
+        if status and status >= 300:
+            # Error pages and redirects that were not followed are not part
+            #  of the file
+            return
+        if self.file is None:
+            self._openFile()
+            if self.restart:
+                return
+        size = self.reply.bytesAvailable()
+        if self.limiter and not drain:
+            size = self.limiter.acquire(size)
+        if size <= 0:
+            return
+        data = self.reply.read(size).data()
+        self.file.write(data)
+        self.bytesReceived += len(data)
+        if self.hasher:
+            self.hasher.update(data)
+            self.hashedBytes += len(data)
+        if self.onProgress:
+            self.onProgress(self.bytesReceived, self.bytesTotal)
+
+    def _onReplyFinished(self):
+        reply = self.reply
+        if reply.error() == QNetworkReply.NetworkError.NoError and not self.restart:
+            # Write the rest of the data
+            self._onReadyRead(drain=True)
+        self.reply = None
+        if self.file:
+            self.file.close()
+            self.file = None
+        status = reply.attribute(QNetworkRequest.Attribute.HttpStatusCodeAttribute)
+        error = reply.error()
+        errorString = reply.errorString()
+        location = bytes(reply.rawHeader(b"Location")).decode()
+        reply.deleteLater()
+
+        if self.canceled:
+            self._finish(False)
+            return
+
+        if error == QNetworkReply.NetworkError.NoError and status and status >= 300:
+            # Redirect which was not followed, e.g. from https to http
+            self.error = translate("SGD", "Download redirected to {}").format(location)
+            self._finish(False)
+            return
+
+        if error == QNetworkReply.NetworkError.NoError:
+            complete = self.bytesTotal is None or self.bytesReceived == self.bytesTotal
+            if complete and self._checksumMatches():
+                os.replace(self.partPath, self.filePath)
+                self._finish(True)
+                return
+            if complete:
+                errorString = translate("SGD", "Checksum does not match")
+                # Download the file again
+                os.remove(self.partPath)
+                self.hasher = None
+                status = None
+            else:
+                errorString = translate("SGD", "Received {} of {} bytes").format(
+                    self.bytesReceived, self.bytesTotal
+                )
+            if self.bytesTotal is not None and self.bytesReceived > self.bytesTotal:
+                # The partial file doesn't belong to this file, start over
+                os.remove(self.partPath)
+        elif status == 416:
+            # The partial file is larger than the file on the server
+            os.remove(self.partPath)
+            status = None
+        elif self.restart:
+            status = None
+
+        self.error = errorString
+        if self.attempt < self.maxRetries and isRetryable(status):
+            self.attempt += 1
+            delay = retryDelay(self.attempt)
+            log(
+                translate(
+                    "SGD", "Download of {} failed ({}), retry in {:.1f} s"
+                ).format(self.url.toString(), errorString, delay),
+                Qgis.MessageLevel.Warning,
             )
-            fileFetcher.cancelDownload()
+            QTimer.singleShot(int(delay * 1000), self.start)
         else:
-            partProgress = 0
-            if bytesTotal > 0:
-                partProgress = (part / 100) * (bytesReceived / bytesTotal)
-            task.setProgress(task.progress() + partProgress)
-
-    # Run file download in separate event loop
-    eventLoop = QEventLoop()
-    fileFetcher.downloadError.connect(onError)
-    fileFetcher.downloadCanceled.connect(eventLoop.quit)
-    fileFetcher.downloadCompleted.connect(eventLoop.quit)
-    fileFetcher.downloadProgress.connect(onProgress)
-    eventLoop.exec(QEventLoop.ProcessEventsFlag.ExcludeUserInputEvents)
-    fileFetcher.downloadCompleted.disconnect(eventLoop.quit)
+            self._finish(False)
+
+    def _checksumMatches(self) -> bool:
+        if not self.multihash:
+            return True
+        if self.hasher is None or self.hashedBytes != self.bytesReceived:
+            self._hashPartialFile()
+        self.verified = self.hasher.hexdigest() == self.multihash[1]
+        if not self.verified:
+            log(
+                f"Checksum of {self.url.toString()} is {self.hasher.hexdigest()}, "
+                f"expected {self.multihash[1]}",
+                Qgis.MessageLevel.Warning,
+            )
+        return self.verified
+
+    def _finish(self, success: bool):
+        if self.done:
+            return
+        self.done = True
+        self.success = success
+        if self.onFinished:
+            self.onFinished(success)
 
 
 def createUrl(baseUrl: QUrl | str, urlParams: dict | None) -> QUrl:
@@ -0,0 +1,288 @@
+"""
+/***************************************************************************
+ SwissGeoDownloader
+                                 A QGIS plugin
+ This plugin lets you comfortably download swiss geo data.
+                             -------------------
+        begin                : 2021-03-14
+        copyright            : (C) 2025 by Patricia Moll
+        email                : pimoll.dev@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from enum import Enum
+from typing import Any, NamedTuple
+
+from swiss_locator.swissgeodownloader.utils.utilities import getCacheDir
+
+# Default time to live of an entry
+DEFAULT_TTL = 3600
+# Size budget of the cache on disk, the least recently used entries are
+#  removed when it is exceeded
+MAX_BYTES = 200 * 1024 * 1024
+# Number of decoded entries kept in memory
+MAX_MEMORY_ENTRIES = 256
+
+
+class CachePolicy(Enum):
+    """How a request uses the response cache."""
+
+    # Always request the full response, the cache is only updated
+    ALWAYS_NETWORK = "always-network"
+    # Use fresh entries without a request, revalidate expired ones
+    PREFER_CACHE = "prefer-cache"
+    # Revalidate every entry with the server, even if it is still fresh
+    REVALIDATE = "revalidate"
+
+
+class CacheEntry(NamedTuple):
+    value: Any
+    etag: str | None
+    expiresAt: float
+    lastModified: str | None = None
+
+    @property
+    def isFresh(self):
+        return time.time() < self.expiresAt
+
+
+class ResponseCache:
+    """Cache for json serializable API responses, e.g. collections, item
+    pages or file sizes. Entries expire after a time to live, but are kept
+    until the size budget is exceeded so that they can be revalidated with
+    their ETag or Last-Modified date. The entries are persisted in a SQLite
+    database, the most recently used ones are also kept in memory.
+    Entries are kept as json text and decoded on every access, so callers
+    always get their own copy of a value and may modify it.
+    The cache can be used from several threads at once."""
+
+    def __init__(
+        self,
+        path: str,
+        maxBytes: int = MAX_BYTES,
+        maxMemoryEntries: int = MAX_MEMORY_ENTRIES,
+    ):
+        self.path = path
+        self.maxBytes = maxBytes
+        self.maxMemoryEntries = maxMemoryEntries
+        # Entries with the value as json text
+        self.memory: OrderedDict[str, CacheEntry] = OrderedDict()
+        # Last access of entries read from memory, written to the database
+        #  before entries are evicted
+        self.accessed: dict[str, float] = {}
+        self.lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.evictions = 0
+        with self._connect() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value TEXT, etag TEXT, "
+                "expires_at REAL, last_access REAL, size INTEGER)"
+            )
+            # Databases of earlier versions have no last_modified column
+            columns = [row[1] for row in db.execute("PRAGMA table_info(entries)")]
+            if "last_modified" not in columns:
+                db.execute("ALTER TABLE entries ADD COLUMN last_modified TEXT")
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=10)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def _remember(self, key: str, entry: CacheEntry):
+        self.memory[key] = entry
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.maxMemoryEntries:
+            self.memory.popitem(last=False)
+
+    @staticmethod
+    def _decoded(entry: CacheEntry) -> CacheEntry:
+        return entry._replace(value=json.loads(entry.value))
+
+    def lookup(self, key: str) -> CacheEntry | None:
+        """Returns the entry of a key, fresh or expired, without counting
+        a hit or a miss."""
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry:
+                self.memory.move_to_end(key)
+                self.accessed[key] = time.time()
+                return self._decoded(entry)
+            try:
+                with self._connect() as db:
+                    row = db.execute(
+                        "SELECT value, etag, expires_at, last_modified "
+                        "FROM entries WHERE key = ?",
+                        (key,),
+                    ).fetchone()
+                    if not row:
+                        return None
+                    db.execute(
+                        "UPDATE entries SET last_access = ? WHERE key = ?",
+                        (time.time(), key),
+                    )
+                entry = CacheEntry(*row)
+                decoded = self._decoded(entry)
+            except (sqlite3.Error, ValueError):
+                return None
+            self._remember(key, entry)
+            return decoded
+
+    def get(self, key: str) -> Any | None:
+        """Returns the value of a key if it has not expired yet."""
+        entry = self.lookup(key)
+        with self.lock:
+            if entry and entry.isFresh:
+                self.hits += 1
+                return entry.value
+            self.misses += 1
+        return None
+
+    def put(
+        self,
+        key: str,
+        value: Any,
+        etag: str = None,
+        ttl: int = DEFAULT_TTL,
+        lastModified: str = None,
+    ):
+        data = json.dumps(value)
+        entry = CacheEntry(data, etag, time.time() + ttl, lastModified)
+        with self.lock:
+            self._remember(key, entry)
+            try:
+                with self._connect() as db:
+                    db.execute(
+                        "INSERT OR REPLACE INTO entries (key, value, etag, "
+                        "expires_at, last_access, size, last_modified) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (
+                            key,
+                            data,
+                            etag,
+                            entry.expiresAt,
+                            time.time(),
+                            len(data),
+                            lastModified,
+                        ),
+                    )
+                    self._flushAccess(db)
+                    self._evict(db)
+            except sqlite3.Error:
+                # The entry is still cached in memory
+                pass
+
+    def revalidated(self, key: str, ttl: int = DEFAULT_TTL) -> Any | None:
+        """Marks an expired entry as fresh again, e.g. after the server
+        answered with 304 Not Modified, and returns its value."""
+        with self.lock:
+            entry = self.lookup(key)
+            if not entry:
+                return None
+            self.revalidations += 1
+            entry = entry._replace(expiresAt=time.time() + ttl)
+            self._remember(key, entry._replace(value=json.dumps(entry.value)))
+            try:
+                with self._connect() as db:
+                    db.execute(
+                        "UPDATE entries SET expires_at = ? WHERE key = ?",
+                        (entry.expiresAt, key),
+                    )
+            except sqlite3.Error:
+                pass
+        return entry.value
+
+    def _flushAccess(self, db: sqlite3.Connection):
+        if self.accessed:
+            db.executemany(
+                "UPDATE entries SET last_access = ? WHERE key = ?",
+                [(accessedAt, key) for key, accessedAt in self.accessed.items()],
+            )
+            self.accessed.clear()
+
+    def _evict(self, db: sqlite3.Connection):
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.maxBytes:
+            return
+        rows = db.execute(
+            "SELECT key, size FROM entries ORDER BY last_access"
+        ).fetchall()
+        for key, size in rows:
+            if total <= self.maxBytes:
+                break
+            db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self.memory.pop(key, None)
+            self.accessed.pop(key, None)
+            total -= size
+            self.evictions += 1
+
+    def invalidate(self, prefix: str = ""):
+        """Removes all entries whose key starts with a prefix, or all entries
+        if no prefix is given."""
+        with self.lock:
+            for key in [k for k in self.memory if k.startswith(prefix)]:
+                del self.memory[key]
+                self.accessed.pop(key, None)
+            try:
+                with self._connect() as db:
+                    db.execute(
+                        "DELETE FROM entries WHERE substr(key, 1, ?) = ?",
+                        (len(prefix), prefix),
+                    )
+            except sqlite3.Error:
+                pass
+
+    def stats(self) -> dict:
+        with self.lock:
+            try:
+                with self._connect() as db:
+                    entries, size = db.execute(
+                        "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+                    ).fetchone()
+            except sqlite3.Error:
+                entries, size = len(self.memory), 0
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "revalidations": self.revalidations,
+                "evictions": self.evictions,
+                "entries": entries,
+                "bytes": size,
+            }
+
+
+_responseCache: ResponseCache | None = None
+_responseCacheLock = threading.Lock()
+
+
+def responseCache() -> ResponseCache:
+    """Returns the cache shared by all API clients."""
+    global _responseCache
+    with _responseCacheLock:
+        if _responseCache is None:
+            _responseCache = ResponseCache(
+                os.path.join(getCacheDir(), "responses.sqlite")
+            )
+        return _responseCache
@@ -21,7 +21,15 @@
 
 from copy import deepcopy
 
-from qgis.core import QgsBox3D, QgsStacAsset, QgsStacCollection
+from qgis.PyQt.QtCore import QDateTime, Qt
+from qgis.core import (
+    QgsBox3D,
+    QgsDateTimeRange,
+    QgsStacAsset,
+    QgsStacCollection,
+    QgsStacExtent,
+    QgsStacLink,
+)
 
 from swiss_locator.swissgeodownloader.utils.utilities import getDateFromIsoString
 
@@ -125,6 +133,20 @@ class SgdAsset(QgsStacAsset):
 
         self.isMostCurrent = False
 
+    @classmethod
+    def fromRaw(
+        cls,
+        assetId: str,
+        href: str,
+        title: str | None,
+        description: str | None,
+        mediaType: str | None,
+        properties: dict,
+    ):
+        asset = cls(assetId, QgsStacAsset(href, title, description, mediaType, []))
+        asset.properties = properties
+        return asset
+
     @property
     def bboxKey(self):
         if not self.bbox:
@@ -145,6 +167,14 @@ class SgdAsset(QgsStacAsset):
     def displayName(self):
         return self.title() or self.id
 
+    @property
+    def fileSize(self) -> int | None:
+        """Size in bytes according to the STAC file extension, if known."""
+        try:
+            return int(self.properties["file:size"])
+        except (KeyError, TypeError, ValueError):
+            return None
+
     def _simpleFileType(self):
         filetype = None
         if self.mediaType():
@@ -285,3 +315,59 @@ class SgdAsset(QgsStacAsset):
         copy.coordsys = self.coordsys
         copy.isMostCurrent = self.isMostCurrent
         return copy
+
+
+def _dateTimeToString(value: QDateTime) -> str | None:
+    if not value.isValid():
+        return None
+    return value.toString(Qt.DateFormat.ISODate)
+
+
+def _dateTimeFromString(value: str | None) -> QDateTime:
+    if not value:
+        return QDateTime()
+    return QDateTime.fromString(value, Qt.DateFormat.ISODate)
+
+
+def collectionToDict(collection: QgsStacCollection) -> dict:
+    spatial = collection.extent().spatialExtent()
+    temporal = collection.extent().temporalExtent()
+    return {
+        "id": collection.id(),
+        "title": collection.title(),
+        "description": collection.description(),
+        "license": collection.license(),
+        "version": collection.stacVersion(),
+        "keywords": collection.keywords(),
+        "bbox": [
+            spatial.xMinimum(),
+            spatial.yMinimum(),
+            spatial.xMaximum(),
+            spatial.yMaximum(),
+        ],
+        "interval": [
+            _dateTimeToString(temporal.begin()),
+            _dateTimeToString(temporal.end()),
+        ],
+        "links": [
+            [link.href(), link.relation(), link.mediaType(), link.title()]
+            for link in collection.links()
+        ],
+    }
+
+
+def collectionFromDict(data: dict) -> QgsStacCollection:
+    extent = QgsStacExtent()
+    xMin, yMin, xMax, yMax = data["bbox"]
+    extent.setSpatialExtent(QgsBox3D(xMin, yMin, 0, xMax, yMax, 0))
+    begin, end = data["interval"]
+    extent.setTemporalExtent(
+        QgsDateTimeRange(_dateTimeFromString(begin), _dateTimeFromString(end))
+    )
+    links = [QgsStacLink(*link) for link in data["links"]]
+    collection = QgsStacCollection(
+        data["id"], data["version"], data["description"], links, data["license"], extent
+    )
+    collection.setTitle(data["title"])
+    collection.setKeywords(data["keywords"])
+    return collection
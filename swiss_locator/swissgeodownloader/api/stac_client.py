@@ -20,35 +20,104 @@
 """
 
 import os
+from collections import deque
+from collections.abc import Iterator
+from typing import NamedTuple
 
-from qgis.PyQt.QtCore import QEventLoop, QTimer, QUrl
+from qgis.PyQt.QtCore import QEventLoop, QTimer, QUrl, QUrlQuery
+from qgis.PyQt.QtNetwork import QNetworkReply
 from qgis.core import (
+    Qgis,
     QgsTask,
     QgsBox3D,
-    QgsGeometry,
-    QgsStacAsset,
     QgsStacCollection,
     QgsStacCollectionList,
     QgsStacController,
-    QgsStacItem,
-    QgsStacItemCollection,
 )
 
+from swiss_locator.swissgeodownloader.api.download_engine import (
+    DEFAULT_PARALLEL_DOWNLOADS,
+    DownloadEngine,
+    DownloadJob,
+    bandwidthLimiter,
+)
+from swiss_locator.swissgeodownloader.api.download_journal import (
+    STATUS_DONE,
+    STATUS_FAILED,
+    DownloadJournal,
+)
+from swiss_locator.swissgeodownloader.api.file_integrity import (
+    ContentStore,
+    fileChecksum,
+    fileMatches,
+)
 from swiss_locator.swissgeodownloader.api.network_request import (
-    fetch,
     createUrl,
-    fetchFile,
+    fetch,
+    startPostRequest,
+    startRequest,
+    waitForReply,
+)
+from swiss_locator.swissgeodownloader.api.response_cache import responseCache
+from swiss_locator.swissgeodownloader.api.response_objects import (
+    SgdAsset,
+    collectionFromDict,
+    collectionToDict,
 )
-from swiss_locator.swissgeodownloader.api.response_objects import SgdAsset
+from swiss_locator.swissgeodownloader.utils.utilities import translate, log
+
+
+# Number of pages requested at the same time if the API paginates by offset
+PARALLEL_PAGES = 4
+# Asset fields of the STAC specification, the other ones are properties
+ASSET_FIELDS = ("href", "title", "description", "type")
+
+
+class AssetRecord(NamedTuple):
+    """An asset of a STAC item along with the item properties needed to
+    create the file list."""
+
+    assetId: str
+    href: str
+    title: str | None
+    description: str | None
+    mediaType: str | None
+    properties: dict
+    bbox: QgsBox3D | None
+    timestamp: str | None
+    endTimestamp: str | None
+
+
+# Time to live of cached responses
+COLLECTIONS_TTL = 24 * 3600
+ITEMS_TTL = 3600
+
+# Conformance classes of the item search extensions, the version in the
+#  URI differs between servers
+FILTER_CONFORMANCE = "item-search#filter"
+FIELDS_CONFORMANCE = "item-search#fields"
+# Item fields needed for the asset records, see STACClient._parseItems
+SEARCH_FIELDS = [
+    "id",
+    "bbox",
+    "collection",
+    "assets",
+    "links",
+    "properties.datetime",
+    "properties.start_datetime",
+    "properties.end_datetime",
+    "properties.created",
+]
 
 
 class STACClient:
-    CACHE: dict[str, list[QgsStacCollection]] = {}
-
     def __init__(self, url):
         self.url = url
         self.controller = QgsStacController()
-        self.assetProperties = {}
+        self.cache = responseCache()
+
+    def collectionsCacheKey(self, params: dict = None) -> str:
+        return f"collections {createUrl(f'{self.url}/collections', params).toString()}"
 
     def fetchCollections(
         self, task: QgsTask, params: dict = None
@@ -57,8 +126,9 @@ class STACClient:
 
         initUrl = createUrl(f"{self.url}/collections", params)
 
-        if self.CACHE.get(initUrl):
-            return self.CACHE.get(initUrl)
+        cachedCollections = self.cache.get(self.collectionsCacheKey(params))
+        if cachedCollections:
+            return [collectionFromDict(c) for c in cachedCollections]
 
         collections = []
         url = initUrl
@@ -82,7 +152,11 @@ class STACClient:
                 url = response.nextUrl() if not response.nextUrl().isEmpty() else None
 
         if len(collections) > 0:
-            self.CACHE[initUrl] = collections
+            self.cache.put(
+                self.collectionsCacheKey(params),
+                [collectionToDict(c) for c in collections],
+                ttl=COLLECTIONS_TTL,
+            )
 
         return collections
 
@@ -130,113 +204,312 @@ class STACClient:
 
         return result["response"]
 
-    def fetchItems(
-        self,
-        task: QgsTask,
-        collectionId: str,
-        params: dict = None,
-        requestAdditionalProperties: bool = False,
-    ) -> list[QgsStacItem]:
-        """Fetch items from a collection."""
-
-        url = createUrl(f"{self.url}/collections/{collectionId}/items", params)
-        errorMsg = ""
-        items: list[QgsStacItem] = []
-        self.assetProperties = {}
-
-        while url:
-            if task.isCanceled():
-                raise Exception("User canceled")
-
-            if requestAdditionalProperties:
-                rawStacItemResponse: dict = fetch(task, url)
-
-                requestedItems = self._parseItems(task, rawStacItemResponse)
-                url = next(
+    def fetchItemPages(self, task: QgsTask, url: QUrl) -> Iterator[dict]:
+        """Yield the raw json pages of an item request, following the 'next'
+        links. The request of the next page is started before the current page
+        is yielded, so that it is downloaded while the caller processes the
+        current page. If the API paginates by offset instead of by cursor,
+        PARALLEL_PAGES pages are requested at the same time."""
+        # Replies or cached pages, in page order
+        pending: deque[QNetworkReply | dict] = deque()
+        offsetUrl = None
+        pageSize = 0
+        nextOffset = 0
+
+        def request(pageUrl: QUrl | str):
+            cachedPage = self.cache.get(QUrl(pageUrl).toString())
+            if cachedPage is not None:
+                pending.append(cachedPage)
+            else:
+                pending.append(startRequest(pageUrl, cache=self.cache))
+
+        def requestOffset(offset):
+            query = QUrlQuery(offsetUrl)
+            query.removeAllQueryItems("offset")
+            query.addQueryItem("offset", str(offset))
+            pageUrl = QUrl(offsetUrl)
+            pageUrl.setQuery(query)
+            request(pageUrl)
+
+        request(url)
+        try:
+            while pending:
+                nextPage = pending.popleft()
+                if isinstance(nextPage, dict):
+                    page = nextPage
+                else:
+                    page = waitForReply(task, nextPage, self.cache, ITEMS_TTL)
+                features = page.get("features", [])
+                nextUrl = next(
                     (
                         link["href"]
-                        for link in rawStacItemResponse["links"]
+                        for link in page.get("links", [])
                         if link["rel"] == "next"
                     ),
                     None,
                 )
 
-            else:
-                response: QgsStacItemCollection = self.controller.fetchItemCollection(
-                    url, errorMsg
-                )
-                if errorMsg or not response:
-                    task.exception = errorMsg
-                    raise Exception(task.exception)
-
-                requestedItems = response.takeItems()
-                url = response.nextUrl() if not response.nextUrl().isEmpty() else None
-
-            items += requestedItems
-
-            if params and params.get("limit") and len(items) >= params["limit"]:
-                url = None
+                if not nextUrl or not features or len(features) < pageSize:
+                    # Last page, pages requested ahead are not needed
+                    yield page
+                    return
+
+                if offsetUrl:
+                    requestOffset(nextOffset)
+                    nextOffset += pageSize
+                elif QUrlQuery(QUrl(nextUrl)).hasQueryItem("offset"):
+                    # The pages don't depend on each other, fetch several at once
+                    offsetUrl = QUrl(nextUrl)
+                    pageSize = len(features)
+                    nextOffset = int(
+                        QUrlQuery(offsetUrl).queryItemValue("offset") or pageSize
+                    )
+                    for _ in range(PARALLEL_PAGES):
+                        requestOffset(nextOffset)
+                        nextOffset += pageSize
+                else:
+                    request(nextUrl)
+
+                yield page
+        finally:
+            # Canceled or the caller stopped early
+            for reply in pending:
+                if isinstance(reply, QNetworkReply):
+                    reply.abort()
+                    reply.deleteLater()
+
+    def fetchAssetRecords(
+        self, task: QgsTask, collectionId: str, params: dict = None
+    ) -> Iterator[AssetRecord]:
+        """Yield the assets of a collection as compact records, page by page.
+        Only one page of the raw response is held in memory at a time."""
+        url = createUrl(f"{self.url}/collections/{collectionId}/items", params)
+        for rawStacItemResponse in self.fetchItemPages(task, url):
+            yield from self._parseItems(task, rawStacItemResponse)
+
+    def fetchSampleRecords(
+        self, task: QgsTask, collectionId: str, limit: int
+    ) -> tuple[int, list[AssetRecord]]:
+        """Returns the number of items on the first page of a collection,
+        with at most `limit` items, and the records of their assets. Unlike
+        fetchItemPages(), no further pages are requested ahead."""
+        url = createUrl(
+            f"{self.url}/collections/{collectionId}/items", {"limit": limit}
+        )
+        page = fetch(task, url, cache=self.cache, ttl=ITEMS_TTL) or {}
+        page.setdefault("features", [])
+        return len(page["features"]), list(self._parseItems(task, page))
+
+    def conformance(self, task: QgsTask) -> list[str]:
+        """Returns the conformance classes of the API, as listed on the
+        landing page."""
+        landingPage = fetch(task, self.url, cache=self.cache, ttl=COLLECTIONS_TTL)
+        if not landingPage:
+            return []
+        return landingPage.get("conformsTo", [])
 
-        return items
+    @staticmethod
+    def searchBody(
+        collectionId: str,
+        bbox: list[float] | None = None,
+        datetime: str | None = None,
+        propertyFilters: dict | None = None,
+        conformsTo: list[str] | None = None,
+    ) -> dict:
+        """Create the body of an item search request. Property filters are
+        sent as CQL2 filter and unused item fields are excluded, if the API
+        supports the filter and fields extensions."""
+        body = {"collections": [collectionId]}
+        if bbox:
+            body["bbox"] = list(bbox)
+        if datetime:
+            body["datetime"] = datetime
+
+        conformsTo = conformsTo or []
+        if propertyFilters and any(FILTER_CONFORMANCE in c for c in conformsTo):
+            conditions = [
+                {"op": "=", "args": [{"property": name}, value]}
+                for name, value in propertyFilters.items()
+            ]
+            body["filter-lang"] = "cql2-json"
+            body["filter"] = (
+                conditions[0]
+                if len(conditions) == 1
+                else {"op": "and", "args": conditions}
+            )
+        if any(FIELDS_CONFORMANCE in c for c in conformsTo):
+            body["fields"] = {"include": SEARCH_FIELDS}
+        return body
+
+    def fetchSearchPages(self, task: QgsTask, body: dict) -> Iterator[dict]:
+        """Yield the raw json pages of an item search, following the 'next'
+        links. As in fetchItemPages(), the next page is requested before the
+        current page is yielded."""
+        pending = startPostRequest(f"{self.url}/search", body)
+        try:
+            while pending:
+                page = waitForReply(task, pending)
+                pending = None
+                nextLink = next(
+                    (link for link in page.get("links", []) if link["rel"] == "next"),
+                    None,
+                )
+                if nextLink and page.get("features"):
+                    if nextLink.get("method", "GET").upper() == "POST":
+                        nextBody = nextLink.get("body", body)
+                        if nextLink.get("merge"):
+                            nextBody = {**body, **nextBody}
+                        pending = startPostRequest(nextLink["href"], nextBody)
+                    else:
+                        pending = startRequest(nextLink["href"])
+                yield page
+        finally:
+            # Canceled or the caller stopped early
+            if pending:
+                pending.abort()
+                pending.deleteLater()
+
+    def searchAssetRecords(
+        self,
+        task: QgsTask,
+        collectionId: str,
+        bbox: list[float] | None = None,
+        datetime: str | None = None,
+        propertyFilters: dict | None = None,
+    ) -> Iterator[AssetRecord]:
+        """Yield the assets of a collection through the item search endpoint,
+        filtered by the server. Filters the API does not support have to be
+        applied by the caller."""
+        body = self.searchBody(
+            collectionId, bbox, datetime, propertyFilters, self.conformance(task)
+        )
+        for rawStacItemResponse in self.fetchSearchPages(task, body):
+            yield from self._parseItems(task, rawStacItemResponse)
 
-    def _parseItems(
-        self, task: QgsTask, rawStacItemResponse: dict
-    ) -> list[QgsStacItem]:
-        """Parse the raw json response from the stac api into a list of items
-        and assets. This is necessary because the STAC controller does not parse
+    @staticmethod
+    def _parseItems(task: QgsTask, rawStacItemResponse: dict) -> Iterator[AssetRecord]:
+        """Parse the raw json response from the stac api into asset records.
+        This is necessary because the STAC controller does not parse
          additional properties of the asset."""
-        parsedItems = []
         for rawItem in rawStacItemResponse["features"]:
             if task.isCanceled():
                 raise Exception("User canceled")
 
+            rawBbox = rawItem.get("bbox") or []
             bbox = None
-            if len(rawItem["bbox"]) == 4:
-                bbox = QgsBox3D(*rawItem["bbox"][:2], None, *rawItem["bbox"][2:], None)
-            elif len(rawItem["bbox"]) == 6:
-                bbox = QgsBox3D(*rawItem["bbox"])
-
-            item = QgsStacItem(
-                rawItem.get("id"),
-                rawItem.get("version"),
-                QgsGeometry(),  # Geometry currently isn't used
-                rawItem.get("properties", {}),
-                [],  # Links currently aren't used
-                {},
-                bbox,
-            )
-            assets = {}
-            self.assetProperties[item.id()] = {}
-            for assetId in rawItem.get("assets"):
-                rawAsset = rawItem["assets"][assetId]
-                asset = QgsStacAsset(
+            if len(rawBbox) == 4:
+                bbox = QgsBox3D(*rawBbox[:2], None, *rawBbox[2:], None)
+            elif len(rawBbox) == 6:
+                bbox = QgsBox3D(*rawBbox)
+
+            # Readout timestamp from the item itself
+            properties = rawItem.get("properties", {})
+            timestamp = properties.get("datetime")
+            endTimestamp = None
+            if not timestamp:
+                # Try to get timestamp from 'start_datetime' and 'end_datetime'
+                timestamp = properties.get("start_datetime")
+                endTimestamp = properties.get("end_datetime")
+                if not timestamp:
+                    # Extract the mandatory timestamp 'created' instead
+                    timestamp = properties.get("created")
+
+            for assetId, rawAsset in rawItem.get("assets", {}).items():
+                # Any additional properties of the asset are kept separately,
+                #  the response itself is not modified
+                yield AssetRecord(
+                    assetId,
                     rawAsset.get("href"),
                     rawAsset.get("title"),
                     rawAsset.get("description"),
                     rawAsset.get("type"),
-                    [],
+                    {k: v for k, v in rawAsset.items() if k not in ASSET_FIELDS},
+                    bbox,
+                    timestamp,
+                    endTimestamp,
                 )
-                assets[assetId] = asset
-
-                # Collect any additional properties of the asset and save them
-                #   separately
-                for k in ["href", "title", "description", "type"]:
-                    rawAsset.pop(k, None)
-                self.assetProperties[item.id()][assetId] = rawAsset
-
-            item.setAssets(assets)
-            parsedItems.append(item)
-        return parsedItems
 
     @staticmethod
-    def downloadFiles(task: QgsTask, fileList: list[SgdAsset], outputDir: str) -> bool:
+    def downloadFiles(
+        task: QgsTask,
+        fileList: list[SgdAsset],
+        outputDir: str,
+        parallelDownloads: int = DEFAULT_PARALLEL_DOWNLOADS,
+        bandwidthLimit: int = 0,
+        contentStoreDir: str = "",
+        journalPath: str = "",
+    ) -> bool:
+        """Download the files concurrently, see DownloadEngine. Files that
+        are already present in the output folder, according to their STAC
+        size and checksum, are not downloaded again. Files with a checksum
+        are verified while they are downloaded.
+        :param bandwidthLimit: bytes per second shared by all downloads,
+                               0 for no limit
+        :param contentStoreDir: folder of a ContentStore shared by all
+                                downloads, empty to not use a store
+        :param journalPath: DownloadJournal of the batch, which is updated
+                            after every file
+        """
         task.setProgress(0)
-        partProgress = 100 / len(fileList)
-
+        store = ContentStore(contentStoreDir) if contentStoreDir else None
+        journal = DownloadJournal.load(journalPath) if journalPath else None
+        jobs = []
+        present = 0
         for file in fileList:
-            savePath = os.path.join(outputDir, file.id)
-            fetchFile(task, file.href, file.id, savePath, partProgress)
             if task.isCanceled():
                 raise Exception("User canceled")
-            task.setProgress(task.progress() + partProgress)
+            savePath = os.path.join(outputDir, file.id)
+            checksum = fileChecksum(file)
+            if fileMatches(savePath, file.fileSize, checksum) or (
+                store and checksum and store.restore(checksum, savePath, file.fileSize)
+            ):
+                present += 1
+                if journal:
+                    journal.files.get(file.id, {})["status"] = STATUS_DONE
+                continue
+            jobs.append(
+                DownloadJob(file.id, file.href, savePath, file.fileSize, checksum)
+            )
+        if present and journal:
+            journal.save()
+        if present:
+            log(
+                translate("SGD", "{} file(s) already present, not downloaded").format(
+                    present
+                )
+            )
+
+        def onJobFinished(job: DownloadJob):
+            if journal:
+                journal.setStatus(
+                    job.fileId, STATUS_DONE if job.success else STATUS_FAILED
+                )
+
+        engine = DownloadEngine(
+            task,
+            parallelDownloads,
+            limiter=bandwidthLimiter(bandwidthLimit),
+            onJobFinished=onJobFinished,
+        )
+        failed = engine.run(jobs)
+        if task.isCanceled():
+            raise Exception("User canceled")
+
+        if store:
+            for job in jobs:
+                # The checksum was verified while downloading
+                if job.success and job.download.verified:
+                    store.add(job.filePath, job.checksum)
+
+        if failed:
+            for job in failed:
+                log(
+                    translate("SGD", "Error when downloading {}").format(job.fileId)
+                    + f": {job.error}",
+                    Qgis.MessageLevel.Warning,
+                )
+            task.exception = translate(
+                "SGD", "{} of {} files could not be downloaded: {}"
+            ).format(len(failed), len(fileList), ", ".join(j.fileId for j in failed))
+            raise Exception(task.exception)
         return True
@@ -22,7 +22,7 @@
 import os
 
 from qgis.PyQt import uic
-from qgis.PyQt.QtCore import pyqtSignal
+from qgis.PyQt.QtCore import QTimer, pyqtSignal
 from qgis.PyQt.QtWidgets import QFileDialog, QMessageBox
 from qgis.core import (
     QgsRasterLayer,
@@ -40,9 +40,11 @@ from swiss_locator.swissgeodownloader.api.api_caller_task import (
     GetCollectionsTask,
     AnalyseCollectionTask,
     GetFileListTask,
+    GetFileSizesTask,
     DownloadFilesTask,
 )
 from swiss_locator.swissgeodownloader.api.datageoadmin import API_EPSG, ApiDataGeoAdmin
+from swiss_locator.swissgeodownloader.api.download_journal import DownloadJournal
 from swiss_locator.swissgeodownloader.api.response_objects import (
     ALL_VALUE,
     CURRENT_VALUE,
@@ -64,12 +66,19 @@ from swiss_locator.swissgeodownloader.ui.qgis_utilities import (
     validateBbox,
 )
 from swiss_locator.swissgeodownloader.ui.waiting_spinner_widget import QtWaitingSpinner
+from swiss_locator.swissgeodownloader.utils.filter_utils import (
+    SEARCH_FILTER_NAMES,
+    toSearchFilters,
+)
 from swiss_locator.swissgeodownloader.utils.qgis_layer_creator_task import (
     createQgisLayersInTask,
 )
+from swiss_locator.swissgeodownloader.utils.settings import downloadSettings
 from swiss_locator.swissgeodownloader.utils.utilities import (
     MESSAGE_CATEGORY,
+    durationFormatter,
     filesizeFormatter,
+    log,
 )
 
 UI_FILE = os.path.join(os.path.dirname(__file__), "sgd_dockwidget_base.ui")
@@ -106,8 +115,17 @@ class SwissGeoDownloaderDockWidget(QgsDockWidget, FORM_CLASS):
             "timestamp": None,
             "coordsys": None,
         }
+        # Server side filtering: filter values of the current file list that
+        #  were applied by the server and the filter options of the last
+        #  unfiltered file list
+        self.serverFilters: dict = {}
+        self.unfilteredFilterItems: dict | None = None
 
         self.outputPath = None
+        # Journal of the running download batch and unfinished batches of
+        #  earlier sessions the user wants to resume
+        self.downloadJournal: DownloadJournal | None = None
+        self.journalsToResume: list[DownloadJournal] = []
         self.msgBar = self.iface.messageBar()
 
         # Coordinate system
@@ -173,6 +191,11 @@ class SwissGeoDownloaderDockWidget(QgsDockWidget, FORM_CLASS):
         # API caller task
         self.collectionsRequest: GetCollectionsTask | None = None
         self.fileListRequest: GetFileListTask | None = None
+        self.downloadTask: DownloadFilesTask | None = None
+        # Sizes of selected files without 'file:size' property and the
+        #  hrefs that have been requested already
+        self.fileSizeTask: GetFileSizesTask | None = None
+        self.probedSizes: set[str] = set()
         self.guiRequestCancelBtn.setHidden(True)
 
         # Deactivate unused ui-elements
@@ -208,6 +231,9 @@ class SwissGeoDownloaderDockWidget(QgsDockWidget, FORM_CLASS):
         self.apiDGA = ApiDataGeoAdmin(self.locale)
         self.loadCollectionList()
 
+        # Ask once the dock is shown
+        QTimer.singleShot(0, self.offerResumeDownloads)
+
     def setCurrentCollection(self, collectionId: str):
         self.onUnselectCollection()
 
@@ -323,6 +349,7 @@ class SwissGeoDownloaderDockWidget(QgsDockWidget, FORM_CLASS):
         self.msgBar.pushMessage(f"{MESSAGE_CATEGORY}: {message}", level)
 
     def onRefreshCollectionsClicked(self):
+        self.apiDGA.clearCollectionsCache()
         self.resetFileList()
         self.collectionListTbl.resetSearch()
         self.collectionListTbl.unselect()
@@ -364,6 +391,7 @@ class SwissGeoDownloaderDockWidget(QgsDockWidget, FORM_CLASS):
             return
 
         self.currentCollection = self.collectionList.get(collectionId)
+        self.unfilteredFilterItems = None
         if not self.currentCollection:
             return
 
@@ -468,6 +496,7 @@ class SwissGeoDownloaderDockWidget(QgsDockWidget, FORM_CLASS):
 
     def onUnselectCollection(self):
         self.currentCollection = None
+        self.unfilteredFilterItems = None
 
         self.onReceiveFileList([])
         self.guiGroupExtent.setDisabled(True)
@@ -476,6 +505,7 @@ class SwissGeoDownloaderDockWidget(QgsDockWidget, FORM_CLASS):
         self.guiDownloadBtn.setDisabled(True)
 
     def resetFileList(self):
+        self.cancelFileSizeRequest()
         self.fileList = []
         self.fileListFiltered = {}
         self.fileListTbl.clear()
@@ -490,6 +520,14 @@ class SwissGeoDownloaderDockWidget(QgsDockWidget, FORM_CLASS):
             if filterVal:
                 self.currentFilters[filterName] = filterVal
 
+        # Files of other filter values have not been requested from the server
+        if any(
+            self.currentFilters[name] != value
+            for name, value in self.serverFilters.items()
+        ):
+            self.onLoadFileListClicked()
+            return
+
         self.applyFilters(userChange=True)
 
     def updateSelectMode(self):
@@ -519,6 +557,16 @@ class SwissGeoDownloaderDockWidget(QgsDockWidget, FORM_CLASS):
         # Read out extent
         bbox = self.getBbox()
 
+        # Let the server apply the filters chosen for the previous file list
+        self.serverFilters = {}
+        settings = downloadSettings()
+        if self.unfilteredFilterItems and settings["server_side_filtering"].value():
+            self.serverFilters = {
+                name: self.currentFilters[name]
+                for name in SEARCH_FILTER_NAMES
+                if toSearchFilters({name: self.currentFilters[name]})
+            }
+
         # Call api
         # Create a separate task for request to not block ui
         self.fileListRequest = GetFileListTask(
@@ -527,6 +575,7 @@ class SwissGeoDownloaderDockWidget(QgsDockWidget, FORM_CLASS):
             "get file list",
             collectionId=self.currentCollection.id(),
             bbox=bbox,
+            searchFilters=toSearchFilters(self.serverFilters) or None,
         )
         # Listen for finished api call
         self.fileListRequest.taskCompleted.connect(
@@ -551,9 +600,32 @@ class SwissGeoDownloaderDockWidget(QgsDockWidget, FORM_CLASS):
             fileList = {"files": [], "filters": None}
         if not fileList["files"]:
             fileList["files"] = []
+
+        if (
+            self.serverFilters
+            and fileList["filters"] is not None
+            and not fileList["files"]
+            and self.currentCollection
+        ):
+            # The filters of the previous file list don't match any file in
+            #  this extent, request the file list without filters
+            self.unfilteredFilterItems = None
+            self.onLoadFileListClicked()
+            return
+
+        filterItems = fileList["filters"]
+        if self.serverFilters and filterItems:
+            # Keep offering the filter values the server has filtered out
+            for name in self.serverFilters:
+                filterItems[name] = self.unfilteredFilterItems[name]
+        else:
+            self.serverFilters = {}
+            self.unfilteredFilterItems = filterItems
+
+        self.cancelFileSizeRequest()
         self.fileList = fileList["files"]
         # Update file type filter and file list
-        self.updateFilterFields(fileList["filters"])
+        self.updateFilterFields(filterItems)
         self.applyFilters()
 
         if self.fileList:
@@ -690,25 +762,76 @@ class SwissGeoDownloaderDockWidget(QgsDockWidget, FORM_CLASS):
 
     def updateSummary(self):
         if self.fileListFiltered:
+            selectedFiles = self.getCurrentlySelectedFilesAsList()
+            count = len(selectedFiles)
             fileSize = 0
-            count = 0
-            for file in self.getCurrentlySelectedFilesAsList():
-                count += 1
-                if file.mediaType() in self.currentCollection.avgSize().keys():
-                    fileSize += self.currentCollection.avgSize()[file.mediaType()]
-
-            if fileSize > 0:
-                status = self.tr("{} file(s), approximately {}").format(
+            missingSizes = []
+            for file in selectedFiles:
+                if file.fileSize is not None:
+                    fileSize += file.fileSize
+                else:
+                    missingSizes.append(file)
+            self.requestFileSizes(missingSizes)
+
+            if not missingSizes:
+                status = self.tr("{} file(s), {}").format(
+                    count, filesizeFormatter(fileSize)
+                )
+            elif self.fileSizeTask:
+                status = self.tr("{} file(s), calculating size... {}").format(
                     count, filesizeFormatter(fileSize)
                 )
             else:
-                status = self.tr("{} file(s)").format(count)
+                # Sizes the server did not report are estimated
+                avgSize = self.currentCollection.avgSize()
+                fileSize += sum(
+                    avgSize.get(file.mediaType(), 0) for file in missingSizes
+                )
+                if fileSize > 0:
+                    status = self.tr("{} file(s), approximately {}").format(
+                        count, filesizeFormatter(fileSize)
+                    )
+                else:
+                    status = self.tr("{} file(s)").format(count)
         else:
             status = self.tr("No files found.")
 
         self.guiFileListStatus.setText(status)
         self.guiFileListStatus.setStyleSheet(self.LABEL_DEFAULT_STYLE)
 
+    def requestFileSizes(self, fileList: list[SgdAsset]):
+        """Request the exact sizes of selected files in the background, the
+        summary is updated while they arrive."""
+        if self.fileSizeTask:
+            # The summary is updated once the running request finished,
+            #  which requests the remaining files
+            return
+        files = [file for file in fileList if file.href not in self.probedSizes]
+        if not files:
+            return
+        self.probedSizes.update(file.href for file in files)
+        caller = GetFileSizesTask(self.apiDGA, None, "get file sizes", fileList=files)
+        self.fileSizeTask = caller
+        # Progress is emitted from the task thread, a bound method makes sure
+        #  the summary is updated in the main thread
+        caller.progressChanged.connect(self.updateSummary)
+        caller.taskCompleted.connect(lambda: self.onFileSizesReceived(caller))
+        caller.taskTerminated.connect(lambda: self.onFileSizesReceived(caller))
+        QgsApplication.taskManager().addTask(caller)
+
+    def onFileSizesReceived(self, caller: GetFileSizesTask):
+        if caller is not self.fileSizeTask:
+            # Canceled because the file list changed
+            return
+        self.fileSizeTask = None
+        self.updateSummary()
+
+    def cancelFileSizeRequest(self):
+        if self.fileSizeTask:
+            self.fileSizeTask.cancel()
+        self.fileSizeTask = None
+        self.probedSizes = set()
+
     def updateDownloadBtnState(self):
         if len(self.getCurrentlySelectedFilesAsList()) == 0:
             self.guiDownloadBtn.setDisabled(True)
@@ -750,8 +873,13 @@ class SwissGeoDownloaderDockWidget(QgsDockWidget, FORM_CLASS):
                 if not file.isStreamable:
                     file.path = os.path.join(self.outputPath, file.id)
                     self.filesListDownload.append(file)
-                    # Check if there are files that are going to be overwritten
-                    if os.path.exists(file.path):
+                    # Check if there are files that are going to be
+                    #  overwritten. Files of the same size are verified with
+                    #  their checksum and not downloaded again.
+                    if os.path.exists(file.path) and (
+                        file.fileSize is None
+                        or os.path.getsize(file.path) != file.fileSize
+                    ):
                         waitForConfirm = True
 
             if waitForConfirm:
@@ -769,6 +897,7 @@ class SwissGeoDownloaderDockWidget(QgsDockWidget, FORM_CLASS):
         self.spinnerFl.stop()
         self.filesListStreamed = []
         self.filesListDownload = []
+        self.downloadJournal = None
 
     def selectDownloadFolder(self) -> str:
         # Let user choose output directory
@@ -785,6 +914,25 @@ class SwissGeoDownloaderDockWidget(QgsDockWidget, FORM_CLASS):
         return folder
 
     def startDownload(self):
+        settings = downloadSettings()
+        if not self.downloadJournal:
+            try:
+                self.downloadJournal = DownloadJournal.create(
+                    self.outputPath,
+                    self.currentCollection.id() if self.currentCollection else "",
+                    self.filesListDownload,
+                )
+            except OSError as e:
+                # The download works without journal, it just can't be resumed
+                log(
+                    self.tr("Could not write the download journal: {}").format(e),
+                    Qgis.MessageLevel.Warning,
+                )
+            else:
+                journals = settings["download_journals"].value()
+                settings["download_journals"].setValue(
+                    journals + [self.downloadJournal.path]
+                )
         # Create separate task for request to not block ui
         caller = DownloadFilesTask(
             self.apiDGA,
@@ -792,14 +940,44 @@ class SwissGeoDownloaderDockWidget(QgsDockWidget, FORM_CLASS):
             "download files",
             fileList=self.filesListDownload,
             outputDir=self.outputPath,
+            parallelDownloads=settings["parallel_downloads"].value(),
+            bandwidthLimit=settings["bandwidth_limit"].value() * 1024,
+            contentStoreDir=settings["content_store_dir"].value(),
+            journalPath=self.downloadJournal.path if self.downloadJournal else "",
         )
+        # The progress is emitted from the task thread, a bound method makes
+        #  sure the status is updated in the main thread
+        self.downloadTask = caller
+        caller.progressChanged.connect(self.updateDownloadStatus)
         # Listen for finished api call
         caller.taskCompleted.connect(lambda: self.onDownloadFinished(caller.output))
         caller.taskTerminated.connect(lambda: self.onDownloadFinished(False))
         # Add task to task manager
         QgsApplication.taskManager().addTask(caller)
 
+    def updateDownloadStatus(self):
+        if not self.downloadTask or not self.downloadTask.downloadProgress:
+            return
+        bytesDone, bytesTotal, rate, remaining = self.downloadTask.downloadProgress
+        status = self.tr("Downloading {} of {}").format(
+            filesizeFormatter(bytesDone), filesizeFormatter(bytesTotal)
+        )
+        if rate:
+            status += f", {filesizeFormatter(rate)}/s"
+        if remaining is not None:
+            status += ", " + self.tr("{} remaining").format(
+                durationFormatter(remaining)
+            )
+        self.guiFileListStatus.setText(status)
+        self.guiFileListStatus.setStyleSheet(self.LABEL_DEFAULT_STYLE)
+
     def onDownloadFinished(self, success):
+        self.downloadTask = None
+        if not success:
+            # Remove the download status
+            self.guiFileListStatus.setText("")
+        if success and self.downloadJournal:
+            self.forgetJournal(self.downloadJournal)
         if success:
             # Confirm successful download
             self.guiFileListStatus.setText(self.tr("Files successfully downloaded!"))
@@ -813,7 +991,11 @@ class SwissGeoDownloaderDockWidget(QgsDockWidget, FORM_CLASS):
             )
 
         filesToAdd = self.filesListDownload + self.filesListStreamed
-        createQgisLayersInTask(filesToAdd, self.onCreateQgisLayersFinished)
+        createQgisLayersInTask(
+            filesToAdd,
+            self.onCreateQgisLayersFinished,
+            downloadSettings()["archive_mode"].value(),
+        )
 
     def onCreateQgisLayersFinished(
         self,
@@ -822,6 +1004,8 @@ class SwissGeoDownloaderDockWidget(QgsDockWidget, FORM_CLASS):
         exception=None,
     ):
         self.stopDownload()
+        if self.journalsToResume:
+            self.resumeDownload(self.journalsToResume.pop(0))
 
         if exception:
             errorMsg = self.tr("Not possible to add layers to QGIS")
@@ -841,6 +1025,63 @@ class SwissGeoDownloaderDockWidget(QgsDockWidget, FORM_CLASS):
                 f"{MESSAGE_CATEGORY}: {msg}", Qgis.MessageLevel.Info
             )
 
+    def offerResumeDownloads(self):
+        """Offers to resume download batches that were interrupted, e.g.
+        because QGIS was closed or crashed."""
+        journals = []
+        for path in downloadSettings()["download_journals"].value():
+            journal = DownloadJournal.load(path)
+            if journal and not journal.isFinished:
+                journals.append(journal)
+            else:
+                self.forgetJournal(journal or DownloadJournal(path, "", {}))
+        if not journals:
+            return
+
+        batches = "\n".join(
+            self.tr("{}: {} file(s) missing in {}").format(
+                journal.collectionId,
+                len(journal.unfinishedFiles()),
+                journal.outputDir,
+            )
+            for journal in journals
+        )
+        confirmed = self.showDialog(
+            self.tr("Resume downloads?"),
+            self.tr(
+                "The following downloads did not finish:\n{}\n\nResume them "
+                "now? Otherwise they are discarded, the files already "
+                "downloaded are kept."
+            ).format(batches),
+            "YesNo",
+        )
+        if not confirmed:
+            for journal in journals:
+                self.forgetJournal(journal)
+            return
+        if self.downloadTask:
+            self.journalsToResume.extend(journals)
+        else:
+            self.journalsToResume.extend(journals[1:])
+            self.resumeDownload(journals[0])
+
+    def resumeDownload(self, journal: DownloadJournal):
+        """Downloads the files of a batch which are missing or incomplete,
+        partial files are continued where they stopped."""
+        self.guiDownloadBtn.setDisabled(True)
+        self.spinnerFl.start()
+        self.filesListStreamed = []
+        self.filesListDownload = journal.unfinishedFiles()
+        self.outputPath = journal.outputDir
+        self.downloadJournal = journal
+        self.startDownload()
+
+    @staticmethod
+    def forgetJournal(journal: DownloadJournal):
+        journal.remove()
+        setting = downloadSettings()["download_journals"]
+        setting.setValue([path for path in setting.value() if path != journal.path])
+
     def cleanCanvas(self):
         if self.bboxPainter:
             self.bboxPainter.removeAll()
@@ -0,0 +1,128 @@
+"""
+/***************************************************************************
+ SwissGeoDownloader
+                                 A QGIS plugin
+ This plugin lets you comfortably download swiss geo data.
+                             -------------------
+        begin                : 2021-03-14
+        copyright            : (C) 2025 by Patricia Moll
+        email                : pimoll.dev@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import os
+import shutil
+import zipfile
+from collections.abc import Callable
+
+# How downloaded zip archives are added to QGIS
+ARCHIVE_KEEP = "keep"
+ARCHIVE_EXTRACT = "extract"
+ARCHIVE_VSIZIP = "vsizip"
+
+# Files that QGIS can open as a layer. Side car files like .dbf or .prj are
+#  not listed, they are opened together with the main file.
+DATASET_EXTENSIONS = (
+    ".shp",
+    ".gpkg",
+    ".tif",
+    ".tiff",
+    ".geojson",
+    ".json",
+    ".kml",
+    ".gml",
+    ".dxf",
+    ".xtf",
+    ".asc",
+    ".xyz",
+    ".las",
+    ".laz",
+)
+# Datasets that are folders, e.g. ESRI File Geodatabases
+DATASET_FOLDER_EXTENSIONS = (".gdb",)
+
+EXTRACT_CHUNK_SIZE = 1024 * 1024
+
+
+def isZipFile(path: str) -> bool:
+    return path.lower().endswith(".zip")
+
+
+def findDatasets(names: list[str]) -> list[str]:
+    """Returns the datasets among the member names of an archive, as paths
+    relative to the archive root."""
+    datasets = []
+    for name in names:
+        parts = name.split("/")
+        if "__MACOSX" in parts:
+            continue
+        folder = next(
+            (
+                i
+                for i, part in enumerate(parts)
+                if part.lower().endswith(DATASET_FOLDER_EXTENSIONS)
+            ),
+            None,
+        )
+        if folder is not None:
+            dataset = "/".join(parts[: folder + 1])
+        elif name.lower().endswith(DATASET_EXTENSIONS):
+            dataset = name
+        else:
+            continue
+        if dataset not in datasets:
+            datasets.append(dataset)
+    return datasets
+
+
+def extractionFolder(zipPath: str) -> str:
+    """Archives are extracted into a folder named like the archive."""
+    return os.path.splitext(zipPath)[0]
+
+
+def extractArchive(
+    zipPath: str, targetDir: str, isCanceled: Callable[[], bool] | None = None
+) -> list[str]:
+    """Extracts an archive and returns the paths of the extracted datasets.
+    The members are copied in chunks straight from the archive, members that
+    have already been extracted with the same size are skipped. Members
+    pointing outside the target folder are ignored."""
+    targetRoot = os.path.realpath(targetDir)
+    extracted = []
+    with zipfile.ZipFile(zipPath) as archive:
+        for member in archive.infolist():
+            if isCanceled and isCanceled():
+                break
+            targetPath = os.path.realpath(os.path.join(targetRoot, member.filename))
+            if os.path.commonpath([targetRoot, targetPath]) != targetRoot:
+                continue
+            if member.is_dir():
+                os.makedirs(targetPath, exist_ok=True)
+            elif not (
+                os.path.exists(targetPath)
+                and os.path.getsize(targetPath) == member.file_size
+            ):
+                os.makedirs(os.path.dirname(targetPath), exist_ok=True)
+                with archive.open(member) as source, open(targetPath, "wb") as target:
+                    shutil.copyfileobj(source, target, EXTRACT_CHUNK_SIZE)
+            extracted.append(member.filename)
+    datasets = findDatasets(extracted)
+    return [os.path.join(targetDir, *dataset.split("/")) for dataset in datasets]
+
+
+def vsizipDatasets(zipPath: str) -> list[str]:
+    """Returns GDAL paths to read the datasets of an archive without
+    extracting it."""
+    with zipfile.ZipFile(zipPath) as archive:
+        datasets = findDatasets(archive.namelist())
+    zipPath = zipPath.replace(os.sep, "/")
+    return [f"/vsizip/{zipPath}/{dataset}" for dataset in datasets]
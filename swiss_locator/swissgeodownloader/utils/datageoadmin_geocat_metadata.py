@@ -1,23 +1,83 @@
+import argparse
+import json
+import os
+
 from qgis.core import QgsApplication
 
 from swiss_locator.swissgeodownloader.api.api_caller_task import ApiCallerTask
+from swiss_locator.swissgeodownloader.api.crawler import (
+    DEFAULT_REQUESTS_PER_SECOND,
+    DEFAULT_WORKERS,
+)
 from swiss_locator.swissgeodownloader.api.datageoadmin import ApiDataGeoAdmin
+from swiss_locator.swissgeodownloader.utils.utilities import getCacheDir
 
 
 # Updates api/datageoadmin_geocat_metadata.json with metadata of all available
 #  STAC collections to reduce network requests when using the plugin.
 #  Currently, can't be run in a GitHub workflow, must be run on a system
 #  with QGIS.
+# Progress is saved to a checkpoint file, running the script again after an
+#  interruption continues with the missing collections.
+
+
+def checkpointPath(name: str) -> str:
+    return os.path.join(getCacheDir(), f"{name}.checkpoint.json")
 
 
-def refreshMetadata():
+def refreshMetadata(
+    maxWorkers=DEFAULT_WORKERS, requestsPerSecond=DEFAULT_REQUESTS_PER_SECOND
+) -> bool:
     api = ApiDataGeoAdmin()
     task = ApiCallerTask(api, None, "")
-    api.refreshAllMetadata(task)
+    return api.refreshAllMetadata(
+        task, checkpointPath("geocat_metadata"), maxWorkers, requestsPerSecond
+    )
+
+
+def crawlCatalogProperties(
+    outputFile,
+    maxWorkers=DEFAULT_WORKERS,
+    requestsPerSecond=DEFAULT_REQUESTS_PER_SECOND,
+):
+    api = ApiDataGeoAdmin()
+    task = ApiCallerTask(api, None, "")
+    items = api.catalogPropertiesCrawler(
+        task, checkpointPath("catalog_properties"), maxWorkers, requestsPerSecond
+    )
+    with open(outputFile, "w", encoding="utf-8") as f:
+        json.dump(items, f, indent=2, sort_keys=True, ensure_ascii=False)
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument(
+        "--requests-per-second", type=float, default=DEFAULT_REQUESTS_PER_SECOND
+    )
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="discard the progress of an interrupted run",
+    )
+    parser.add_argument(
+        "--catalog-properties",
+        metavar="FILE",
+        help="crawl the item properties of all collections into FILE instead",
+    )
+    args = parser.parse_args()
+
     QGIS_APP = QgsApplication([], False)
     QGIS_APP.initQgis()
 
-    refreshMetadata()
+    if args.restart:
+        for name in ("geocat_metadata", "catalog_properties"):
+            if os.path.exists(checkpointPath(name)):
+                os.remove(checkpointPath(name))
+
+    if args.catalog_properties:
+        crawlCatalogProperties(
+            args.catalog_properties, args.workers, args.requests_per_second
+        )
+    elif not refreshMetadata(args.workers, args.requests_per_second):
+        print("Metadata of some collections is missing, run again to continue")
@@ -19,7 +19,21 @@
  ***************************************************************************/
 """
 
-from swiss_locator.swissgeodownloader.api.response_objects import ALL_VALUE, SgdAsset
+from swiss_locator.swissgeodownloader.api.response_objects import (
+    ALL_VALUE,
+    CURRENT_VALUE,
+    SgdAsset,
+)
+
+# Filters of the file list that correspond to STAC properties, along with
+#  the type of the property value
+SEARCH_PROPERTIES = {
+    "category": ("geoadmin:variant", str),
+    "resolution": ("gsd", float),
+    "coordsys": ("proj:epsg", int),
+}
+# Filters of the file list which can be applied by the server
+SEARCH_FILTER_NAMES = ["timestamp", *SEARCH_PROPERTIES]
 
 
 def cleanupFilterItems(filterItems: dict):
@@ -40,6 +54,32 @@ def cleanupFilterItems(filterItems: dict):
     return filterItems
 
 
+def toSearchFilters(filters: dict) -> dict:
+    """Translate the current filter values of the file list into parameters
+    of a STAC item search. The file type depends on the media type of the
+    assets and can only be filtered locally."""
+    searchFilters = {}
+    timestamp = filters.get("timestamp")
+    if timestamp and timestamp not in [ALL_VALUE, CURRENT_VALUE]:
+        # Timestamp filter values are dates or date ranges, e.g.
+        #  '2020-01-01 / 2020-12-31'
+        dates = timestamp.split(" / ")
+        searchFilters["datetime"] = f"{dates[0]}T00:00:00Z/{dates[-1]}T23:59:59Z"
+
+    propertyFilters = {}
+    for filterName, (propertyName, valueType) in SEARCH_PROPERTIES.items():
+        value = filters.get(filterName)
+        if not value or value == ALL_VALUE:
+            continue
+        try:
+            propertyFilters[propertyName] = valueType(value)
+        except ValueError:
+            propertyFilters[propertyName] = value
+    if propertyFilters:
+        searchFilters["propertyFilters"] = propertyFilters
+    return searchFilters
+
+
 def currentFileByBbox(fileList: list[SgdAsset]):
     """Searches for the most current file for each bbox and property
     combination. Creates a dictionary for each unique bbox that contains
@@ -20,23 +20,41 @@
 """
 
 import os
+import zipfile
 
 from qgis.core import (
+    Qgis,
     QgsApplication,
+    QgsCoordinateTransformContext,
     QgsProject,
+    QgsProviderRegistry,
+    QgsProviderSublayerDetails,
     QgsRasterLayer,
     QgsTask,
     QgsVectorLayer,
 )
 
 from swiss_locator.swissgeodownloader.api.response_objects import SgdAsset
-from swiss_locator.swissgeodownloader.utils.utilities import translate
+from swiss_locator.swissgeodownloader.utils.archive_utils import (
+    ARCHIVE_EXTRACT,
+    ARCHIVE_KEEP,
+    ARCHIVE_VSIZIP,
+    extractArchive,
+    extractionFolder,
+    isZipFile,
+    vsizipDatasets,
+)
+from swiss_locator.swissgeodownloader.utils.utilities import translate, log
 
 
-def createQgisLayersInTask(fileList: list[SgdAsset], callback):
+def createQgisLayersInTask(
+    fileList: list[SgdAsset], callback, archiveMode: str = ARCHIVE_KEEP
+):
     # Create layer from files (streamed and downloaded) so they can be
     # added to qgis
-    task = QgisLayerCreatorTask(translate("SGD", "Daten zu QGIS hinzufügen"), fileList)
+    task = QgisLayerCreatorTask(
+        translate("SGD", "Daten zu QGIS hinzufügen"), fileList, archiveMode
+    )
     task.taskCompleted.connect(lambda: callback(task.layerList, task.alreadyAdded))
     task.taskTerminated.connect(callback)
     QgsApplication.taskManager().addTask(task)
@@ -46,11 +64,16 @@ class QgisLayerCreatorTask(QgsTask):
     """QGIS can freeze when a lot of layers have to be created in the main
     thread. Instead, layers are created in this separate QTask and moved to
     the main thread. After the task has finished, they are added to the map
-    in the main thread."""
+    in the main thread.
+    Zip archives are extracted or read through /vsizip/ depending on the
+    archive mode, the datasets they contain are added as layers."""
 
-    def __init__(self, description, fileList: list[SgdAsset]):
+    def __init__(
+        self, description, fileList: list[SgdAsset], archiveMode: str = ARCHIVE_KEEP
+    ):
         super().__init__(description, QgsTask.Flag.CanCancel)
         self.fileList = fileList
+        self.archiveMode = archiveMode
         self.layerList: list[QgsRasterLayer | QgsVectorLayer] = []
         self.alreadyAdded: int = 0
         self.exception = None
@@ -71,36 +94,81 @@ class QgisLayerCreatorTask(QgsTask):
             self.setProgress(i * progressStep)
 
             # Adding the file to QGIS if it's (1) a streamed file or (2) is
-            #  present in the file system and (3) is not a .zip
-            if file.isStreamable or os.path.exists(file.path):
-                if ".zip" in file.id:
-                    # Can't add zip files to QGIS
-                    continue
-                if file.path in already_added:
-                    self.alreadyAdded += 1
+            #  present in the file system
+            if not file.isStreamable and not os.path.exists(file.path):
+                continue
+            if isZipFile(file.id):
+                if file.isStreamable:
                     continue
-                try:
-                    rasterLyr = QgsRasterLayer(file.path, file.id)
-                    if rasterLyr.isValid():
-                        self.layerList.append(rasterLyr)
+                for datasetPath in self.archiveDatasets(file):
+                    if datasetPath in already_added:
+                        self.alreadyAdded += 1
                         continue
-                    else:
-                        del rasterLyr
-                except Exception:
-                    pass
-                try:
-                    vectorLyr = QgsVectorLayer(file.path, file.id, "ogr")
-                    if vectorLyr.isValid():
-                        self.layerList.append(vectorLyr)
-                        continue
-                    else:
-                        del vectorLyr
-                except Exception:
-                    pass
+                    self.createSublayers(datasetPath)
+                continue
+            if file.path in already_added:
+                self.alreadyAdded += 1
+                continue
+            self.createLayer(file.path, file.id)
 
         self.setProgress(100)
         return True
 
+    def archiveDatasets(self, file: SgdAsset) -> list[str]:
+        """Returns the paths of the datasets in a downloaded archive, an
+        empty list if archives are kept as they are."""
+        try:
+            if self.archiveMode == ARCHIVE_EXTRACT:
+                return extractArchive(
+                    file.path, extractionFolder(file.path), self.isCanceled
+                )
+            if self.archiveMode == ARCHIVE_VSIZIP:
+                return vsizipDatasets(file.path)
+        except (zipfile.BadZipFile, OSError) as e:
+            log(
+                translate("SGD", "Could not open archive {}: {}").format(file.id, e),
+                Qgis.MessageLevel.Warning,
+            )
+        return []
+
+    def createLayer(self, path: str, name: str) -> bool:
+        try:
+            rasterLyr = QgsRasterLayer(path, name)
+            if rasterLyr.isValid():
+                self.layerList.append(rasterLyr)
+                return True
+            else:
+                del rasterLyr
+        except Exception:
+            pass
+        try:
+            vectorLyr = QgsVectorLayer(path, name, "ogr")
+            if vectorLyr.isValid():
+                self.layerList.append(vectorLyr)
+                return True
+            else:
+                del vectorLyr
+        except Exception:
+            pass
+        return False
+
+    def createSublayers(self, path: str):
+        """Datasets in archives are often containers like GeoPackages or
+        File Geodatabases, all of their layers are added."""
+        name = os.path.splitext(os.path.basename(path.rstrip("/")))[0]
+        sublayers = QgsProviderRegistry.instance().querySublayers(path)
+        if len(sublayers) <= 1:
+            self.createLayer(path, name)
+            return
+        options = QgsProviderSublayerDetails.LayerOptions(
+            QgsCoordinateTransformContext()
+        )
+        for sublayer in sublayers:
+            layer = sublayer.toLayer(options)
+            if layer and layer.isValid():
+                layer.setName(f"{name} {sublayer.name()}")
+                self.layerList.append(layer)
+
     def finished(self, result):
         if not result:
             if self.isCanceled():
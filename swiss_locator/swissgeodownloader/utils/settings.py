@@ -0,0 +1,69 @@
+"""
+/***************************************************************************
+ SwissGeoDownloader
+                                 A QGIS plugin
+ This plugin lets you comfortably download swiss geo data.
+                             -------------------
+        begin                : 2021-03-14
+        copyright            : (C) 2025 by Patricia Moll
+        email                : pimoll.dev@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+from qgis.core import (
+    QgsSettingsEntryBool,
+    QgsSettingsEntryInteger,
+    QgsSettingsEntryString,
+    QgsSettingsEntryStringList,
+    QgsSettingsTree,
+)
+
+SETTINGS_NODE = "swiss_geo_downloader"
+
+_downloadSettings: dict | None = None
+
+
+def downloadSettings() -> dict:
+    """Returns the settings of the downloads. The plugin that embeds the
+    downloader adds them to its configuration dialog."""
+    global _downloadSettings
+    if _downloadSettings is None:
+        node = QgsSettingsTree.createPluginTreeNode(pluginName=SETTINGS_NODE)
+        _downloadSettings = {
+            "parallel_downloads": QgsSettingsEntryInteger(
+                "parallel_downloads", node, 3
+            ),
+            # Bytes per second / 1024, 0 for no limit
+            "bandwidth_limit": QgsSettingsEntryInteger("bandwidth_limit", node, 0),
+            # Folder of the ContentStore, empty to not use a store
+            "content_store_dir": QgsSettingsEntryString("content_store_dir", node, ""),
+            "server_side_filtering": QgsSettingsEntryBool(
+                "server_side_filtering", node, False
+            ),
+            # How zip archives are added to QGIS: keep, extract or vsizip,
+            #  see archive_utils
+            "archive_mode": QgsSettingsEntryString("archive_mode", node, "keep"),
+            # Journals of download batches which have not finished
+            "download_journals": QgsSettingsEntryStringList(
+                "download_journals", node, []
+            ),
+        }
+    return _downloadSettings
+
+
+def unregisterSettings():
+    """Removes the settings from the settings tree, e.g. when the plugin is
+    unloaded."""
+    global _downloadSettings
+    if _downloadSettings is not None:
+        QgsSettingsTree.unregisterPluginTreeNode(SETTINGS_NODE)
+        _downloadSettings = None
@@ -19,15 +19,20 @@
  ***************************************************************************/
 """
 
+import os
 from datetime import datetime
 
 from qgis.PyQt.QtCore import QCoreApplication
-from qgis.core import Qgis, QgsMessageLog
+from qgis.core import Qgis, QgsApplication, QgsMessageLog
 
 from swiss_locator.swissgeodownloader import DEBUG
 
 MESSAGE_CATEGORY = "Swiss Geo Downloader"
 
+# Folder for the caches, the plugin embedding the downloader sets its own
+#  with setCacheDir
+_cacheDir = None
+
 
 def translate(context, message):
     """Get the translation for a string using Qt translation API.
@@ -67,6 +72,16 @@ def filesizeFormatter(num, suffix="B"):
     return f"{num:.1f} Yi{suffix}"
 
 
+def durationFormatter(seconds: float):
+    """Formats a duration to a short human readable string"""
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds} s"
+    if seconds < 3600:
+        return f"{seconds // 60} min {seconds % 60:02d} s"
+    return f"{seconds // 3600} h {seconds % 3600 // 60:02d} min"
+
+
 def getDateFromIsoString(isoString, formatted=True):
     """Translate ISO date string to date or swiss date format"""
     if isoString[-1] == "Z":
@@ -84,3 +99,17 @@ def log(msg, level=Qgis.MessageLevel.Info, debugMsg=False):
             return
         msg = f"DEBUG {msg}"
     QgsMessageLog.logMessage(str(msg), MESSAGE_CATEGORY, level)
+
+
+def setCacheDir(path: str):
+    global _cacheDir
+    _cacheDir = path
+
+
+def getCacheDir() -> str:
+    """Returns the folder for the caches, it is created if necessary."""
+    path = _cacheDir or os.path.join(
+        QgsApplication.qgisSettingsDirPath(), "cache", "swissgeodownloader"
+    )
+    os.makedirs(path, exist_ok=True)
+    return path
@@ -6,6 +6,8 @@ They verify URL construction, API responses, and data helpers.
 """
 
 import json
+import os
+import tempfile
 from urllib.parse import urlencode
 from urllib.request import urlopen, Request
 
@@ -15,6 +17,8 @@ from qgis.testing import start_app, unittest
 
 from swiss_locator.core.filters.map_geo_admin_stac import (
     collections_to_searchable_strings,
+    load_collections_snapshot,
+    save_collections_snapshot,
 )
 from swiss_locator.core.filters.opendata_swiss import opendata_swiss_url
 
@@ -102,6 +106,28 @@ class TestStacHelpers(unittest.TestCase):
             ],
         )
 
+    def test_collections_snapshot(self):
+        search_strings, search_ids = collections_to_searchable_strings(self.collections)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "collections.json")
+            self.assertIsNone(load_collections_snapshot(path))
+
+            save_collections_snapshot(path, self.collections, search_strings)
+            collections, strings, ids = load_collections_snapshot(path)
+
+        self.assertEqual(ids, search_ids)
+        self.assertEqual(strings, search_strings)
+        for key, title in self.test_strings:
+            self.assertEqual(collections[key].id(), key)
+            self.assertEqual(collections[key].title(), title)
+
+    def test_invalid_collections_snapshot(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "collections.json")
+            with open(path, "w") as f:
+                json.dump({"version": 0, "collections": []}, f)
+            self.assertIsNone(load_collections_snapshot(path))
+
 
 if __name__ == "__main__":
     unittest.main()
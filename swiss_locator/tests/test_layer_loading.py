@@ -0,0 +1,36 @@
+"""
+Unit tests for the background layer loading.
+These tests do NOT require network access.
+"""
+
+from qgis.testing import start_app, unittest
+
+from swiss_locator.core.layer_loading import capabilities_url
+
+start_app()
+
+
+class TestCapabilitiesUrl(unittest.TestCase):
+    def test_wms(self):
+        self.assertEqual(
+            capabilities_url("https://wms.geo.admin.ch/"),
+            "https://wms.geo.admin.ch/?SERVICE=WMS&REQUEST=GetCapabilities",
+        )
+
+    def test_wms_with_query(self):
+        self.assertEqual(
+            capabilities_url("https://example.com/wms?map=test"),
+            "https://example.com/wms?map=test&SERVICE=WMS&REQUEST=GetCapabilities",
+        )
+        self.assertEqual(
+            capabilities_url("https://example.com/wms?"),
+            "https://example.com/wms?SERVICE=WMS&REQUEST=GetCapabilities",
+        )
+
+    def test_wmts(self):
+        url = "https://wmts.geo.admin.ch/EPSG/2056/1.0.0/WMTSCapabilities.xml"
+        self.assertEqual(capabilities_url(url), url)
+
+
+if __name__ == "__main__":
+    unittest.main()
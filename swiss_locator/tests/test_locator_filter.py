@@ -65,9 +65,10 @@ class TestLocatorFilterSTAC(unittest.TestCase):
         search_res_2 = _filter.perform_local_search("verfügbarkeit")
 
         self.assertEqual(search_res_1, ["ch.bakom.mobilnetz-2g"])
+        # The whole word ranks before the match inside of 'wasserverfügbarkeit'
         self.assertEqual(
             search_res_2,
-            ["ch.bafu.wald-wasserverfuegbarkeit_boden", "ch.bakom.mobilnetz-2g"],
+            ["ch.bakom.mobilnetz-2g", "ch.bafu.wald-wasserverfuegbarkeit_boden"],
         )
 
     def test_local_search_by_collection_id(self):
@@ -96,16 +97,13 @@ class TestLocatorFilterSTAC(unittest.TestCase):
         self.assertIn("ch.swisstopo.swissalti3d", results)
 
     def test_local_search_ordering(self):
-        """Results should be ordered by match position (earlier match first)."""
+        """Results should be ordered by relevance (whole words first)."""
         _filter = self._make_filter()
         # 'verfügbarkeit' appears in the title of both collections, but
-        # at different positions — the one with the earlier match should come first
+        # only as part of a longer word in 'Wasserverfügbarkeit'
         results = _filter.perform_local_search("verfügbarkeit")
         self.assertEqual(len(results), 2)
-        # 'wasserverfügbarkeit' has 'verfügbarkeit' later in the string than
-        # '2G - GSM / EDGE Verfügbarkeit'
-        # Depending on the search string composition, verify ordering is stable
-        self.assertIsInstance(results, list)
+        self.assertEqual(results[0], "ch.bakom.mobilnetz-2g")
 
     def test_clone_preserves_collections(self):
         """Cloning the filter should preserve the cached collections data."""
@@ -118,4 +116,5 @@ class TestLocatorFilterSTAC(unittest.TestCase):
             set(self.collections.keys()),
         )
         self.assertEqual(cloned.search_strings, _filter.search_strings)
+        self.assertIs(cloned.search_index, _filter.search_index)
         self.assertEqual(cloned.collection_ids, _filter.collection_ids)
@@ -18,6 +18,7 @@ from swiss_locator.core.results import (
     LocationResult,
     FeatureResult,
     VectorTilesLayerResult,
+    VectorTilesExportResult,
     STACResult,
     NoResult,
     result_from_data,
@@ -35,6 +36,7 @@ class TestResultRegistry(unittest.TestCase):
             "LocationResult",
             "FeatureResult",
             "VectorTilesLayerResult",
+            "VectorTilesExportResult",
             "STACResult",
             "NoResult",
         }
@@ -45,6 +47,9 @@ class TestResultRegistry(unittest.TestCase):
         self.assertIs(RESULT_REGISTRY["LocationResult"], LocationResult)
         self.assertIs(RESULT_REGISTRY["FeatureResult"], FeatureResult)
         self.assertIs(RESULT_REGISTRY["VectorTilesLayerResult"], VectorTilesLayerResult)
+        self.assertIs(
+            RESULT_REGISTRY["VectorTilesExportResult"], VectorTilesExportResult
+        )
         self.assertIs(RESULT_REGISTRY["STACResult"], STACResult)
         self.assertIs(RESULT_REGISTRY["NoResult"], NoResult)
 
@@ -192,6 +197,35 @@ class TestVectorTilesLayerResultRoundTrip(unittest.TestCase):
         restored = result_from_data(original.as_definition())
         self.assertIsNone(restored.url)
         self.assertIsNone(restored.style)
+        self.assertEqual(restored.tiles_type, "xyz")
+
+    def test_offline_round_trip(self):
+        original = VectorTilesLayerResult(
+            layer="Base map",
+            title="Base map",
+            url="/tmp/base_v1.0.0.mbtiles",
+            style="file:///tmp/ch.swisstopo.basemap.vt/style.json",
+            tiles_type="mbtiles",
+        )
+        restored = result_from_data(original.as_definition())
+        self.assertEqual(restored.tiles_type, "mbtiles")
+        self.assertEqual(restored.url, original.url)
+
+
+class TestVectorTilesExportResultRoundTrip(unittest.TestCase):
+    def test_round_trip(self):
+        original = VectorTilesExportResult(
+            layer="Light base map",
+            title="Light base map",
+            url="https://vectortiles.geo.admin.ch/tiles/ch.swisstopo.base.vt/v1.0.0/{z}/{x}/{y}.pbf",
+            style="https://vectortiles.geo.admin.ch/styles/ch.swisstopo.lightbasemap.vt/style.json",
+        )
+        restored = result_from_data(original.as_definition())
+
+        self.assertIsInstance(restored, VectorTilesExportResult)
+        self.assertEqual(restored.title, original.title)
+        self.assertEqual(restored.url, original.url)
+        self.assertEqual(restored.style, original.style)
 
 
 class TestSTACResultRoundTrip(unittest.TestCase):
@@ -223,6 +257,21 @@ class TestSTACResultRoundTrip(unittest.TestCase):
         restored = result_from_data(original.as_definition())
         self.assertEqual(restored.path, "")
 
+    def test_file_properties(self):
+        original = STACResult(
+            "coll_id",
+            "coll_name",
+            "asset",
+            "desc",
+            "type",
+            "href",
+            file_size=1000,
+            checksum="1220abcd",
+        )
+        restored = result_from_data(original.as_definition())
+        self.assertEqual(restored.fileSize, 1000)
+        self.assertEqual(restored.properties, {"file:checksum": "1220abcd"})
+
 
 class TestSTACResultProperties(unittest.TestCase):
     """Test computed properties on STACResult."""
@@ -0,0 +1,111 @@
+"""
+Unit tests for the cache of STAC collection probes.
+These tests do NOT require network access.
+"""
+
+import os
+import tempfile
+import time
+
+from qgis.testing import start_app, unittest
+
+from swiss_locator.core.filters.stac_probe_cache import (
+    COUNT_CLASS_FEW,
+    COUNT_CLASS_MANY,
+    ItemProbeCache,
+    probe_from_response,
+    probe_to_results,
+)
+
+start_app()
+
+COG_TYPE = "image/tiff; application=geotiff; profile=cloud-optimized"
+
+
+def items_response(asset_count):
+    return {
+        "features": [
+            {
+                "collection": "ch.swisstopo.swissalti3d",
+                "assets": {
+                    f"asset_{i}.tif": {
+                        "description": "",
+                        "type": COG_TYPE,
+                        "href": f"https://example.com/asset_{i}.tif",
+                    }
+                    for i in range(asset_count)
+                },
+            }
+        ]
+    }
+
+
+class TestProbe(unittest.TestCase):
+    def test_empty_response(self):
+        self.assertIsNone(probe_from_response({"features": []}, 5))
+
+    def test_few_assets(self):
+        probe = probe_from_response(items_response(2), 5)
+        self.assertEqual(probe["collection_id"], "ch.swisstopo.swissalti3d")
+        self.assertEqual(probe["count_class"], COUNT_CLASS_FEW)
+        self.assertEqual(len(probe["assets"]), 2)
+        self.assertTrue(probe["assets"][0]["streamable"])
+
+    def test_many_assets(self):
+        probe = probe_from_response(items_response(6), 5)
+        self.assertEqual(probe["count_class"], COUNT_CLASS_MANY)
+        self.assertEqual(probe["assets"], [])
+
+    def test_results_with_streams(self):
+        probe = probe_from_response(items_response(1), 5)
+        results = probe_to_results(probe, "swissALTI3D", "streamed")
+        self.assertEqual(len(results), 2)
+        self.assertFalse(results[0].is_streamed)
+        self.assertTrue(results[1].is_streamed)
+        self.assertEqual(results[1].asset_id, "asset_0.tif (streamed)")
+
+    def test_file_properties(self):
+        response = items_response(1)
+        asset = response["features"][0]["assets"]["asset_0.tif"]
+        asset["file:size"] = 1000
+        asset["file:checksum"] = "1220abcd"
+        probe = probe_from_response(response, 5)
+        result = probe_to_results(probe, "swissALTI3D", "streamed")[0]
+        self.assertEqual(result.fileSize, 1000)
+        self.assertEqual(result.properties, {"file:checksum": "1220abcd"})
+
+
+class TestItemProbeCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "probes.json")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_persisted(self):
+        ItemProbeCache(self.path).put(probe_from_response(items_response(2), 5))
+        probe = ItemProbeCache(self.path).get("ch.swisstopo.swissalti3d", 5)
+        self.assertEqual(len(probe["assets"]), 2)
+
+    def test_other_limit(self):
+        cache = ItemProbeCache(self.path)
+        cache.put(probe_from_response(items_response(2), 5))
+        self.assertIsNone(cache.get("ch.swisstopo.swissalti3d", 10))
+
+    def test_expired(self):
+        cache = ItemProbeCache(self.path, ttl=60)
+        probe = probe_from_response(items_response(2), 5)
+        probe["fetched_at"] = time.time() - 120
+        cache.put(probe)
+        self.assertIsNone(cache.get("ch.swisstopo.swissalti3d", 5))
+
+    def test_clear(self):
+        cache = ItemProbeCache(self.path)
+        cache.put(probe_from_response(items_response(2), 5))
+        cache.clear()
+        self.assertIsNone(ItemProbeCache(self.path).get("ch.swisstopo.swissalti3d", 5))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+"""
+Unit tests for the search index of the STAC collections.
+These tests do NOT require network access.
+"""
+
+from qgis.testing import start_app, unittest
+
+from swiss_locator.core.filters.stac_search_index import (
+    StacSearchIndex,
+    normalize,
+    tokenize,
+)
+
+start_app()
+
+
+class TestTokenize(unittest.TestCase):
+    def test_normalize(self):
+        self.assertEqual(normalize("Verfügbarkeit"), "verfuegbarkeit")
+        self.assertEqual(normalize("Carte géologique"), "carte geologique")
+
+    def test_tokenize(self):
+        self.assertEqual(
+            tokenize("ch.bafu.wald-wasserverfuegbarkeit_boden"),
+            ["ch", "bafu", "wald", "wasserverfuegbarkeit", "boden"],
+        )
+        self.assertEqual(tokenize(None), [])
+
+
+class TestStacSearchIndex(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.index = StacSearchIndex()
+        cls.index.add(
+            "ch.swisstopo.swissalti3d",
+            {
+                "id": "ch.swisstopo.swissalti3d",
+                "title": "swissALTI3D",
+                "keywords": "Höhenmodell DTM",
+                "description": "Das digitale Höhenmodell der Schweiz ohne Bebauung",
+            },
+        )
+        cls.index.add(
+            "ch.bakom.mobilnetz-2g",
+            {
+                "id": "ch.bakom.mobilnetz-2g",
+                "title": "2G - GSM / EDGE Verfügbarkeit 2G - GSM / EDGE disponibilité",
+                "keywords": "",
+                "description": "Abdeckung des Mobilfunknetzes",
+            },
+        )
+        cls.index.add(
+            "ch.bafu.wald-wasserverfuegbarkeit_boden",
+            {
+                "id": "ch.bafu.wald-wasserverfuegbarkeit_boden",
+                "title": "Wasserverfügbarkeit im Boden (Standortwasserbilanz)",
+                "keywords": "Wald",
+                "description": "Modell der Wasserverfügbarkeit für Bäume",
+            },
+        )
+        cls.index.finalize()
+
+    def test_whole_word_ranks_first(self):
+        self.assertEqual(
+            self.index.search("verfügbarkeit"),
+            ["ch.bakom.mobilnetz-2g", "ch.bafu.wald-wasserverfuegbarkeit_boden"],
+        )
+
+    def test_prefix(self):
+        self.assertEqual(self.index.search("swissal"), ["ch.swisstopo.swissalti3d"])
+
+    def test_infix(self):
+        self.assertEqual(self.index.search("alti"), ["ch.swisstopo.swissalti3d"])
+
+    def test_infix_candidates(self):
+        self.assertEqual(self.index._infix_candidates("alti"), {"swissalti3d"})
+        self.assertEqual(
+            self.index._infix_candidates("verfuegbar"), {"wasserverfuegbarkeit"}
+        )
+        self.assertEqual(self.index._infix_candidates("swiss"), set())
+        self.assertEqual(self.index._infix_candidates("xyz"), set())
+
+    def test_description_and_keywords(self):
+        self.assertEqual(self.index.search("dtm"), ["ch.swisstopo.swissalti3d"])
+        self.assertEqual(self.index.search("höhenmodell"), ["ch.swisstopo.swissalti3d"])
+
+    def test_other_language(self):
+        self.assertEqual(self.index.search("disponibilite"), ["ch.bakom.mobilnetz-2g"])
+
+    def test_all_words_must_match(self):
+        self.assertEqual(
+            self.index.search("wald boden"),
+            ["ch.bafu.wald-wasserverfuegbarkeit_boden"],
+        )
+        self.assertEqual(self.index.search("wald gsm"), [])
+
+    def test_no_match(self):
+        self.assertEqual(self.index.search("xyzzy_nonexistent"), [])
+        self.assertEqual(self.index.search(""), [])
+        self.assertEqual(StacSearchIndex().search("wald"), [])
+
+
+class _Collection:
+    def __init__(self, title, description):
+        self._title = title
+        self._description = description
+
+    def title(self):
+        return self._title
+
+    def description(self):
+        return self._description
+
+    def keywords(self):
+        return []
+
+
+class TestTranslations(unittest.TestCase):
+    def test_translated_titles_are_indexed(self):
+        collections = {
+            "ch.swisstopo.geologie": _Collection("Geologische Karte", ""),
+            "ch.swisstopo.swissalti3d": _Collection("swissALTI3D", "Höhenmodell"),
+        }
+        translations = {
+            "ch.swisstopo.geologie": [
+                {"title": "Carte géologique", "description": "Géologie"},
+                {"title": "Carta geologica", "description": None},
+            ]
+        }
+        index = StacSearchIndex.from_collections(collections, translations)
+        self.assertEqual(index.search("carte"), ["ch.swisstopo.geologie"])
+        self.assertEqual(index.search("carta geol"), ["ch.swisstopo.geologie"])
+        self.assertEqual(
+            StacSearchIndex.from_collections(collections).search("carte"), []
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import os
+import tempfile
+import unittest
+import zipfile
+
+from swiss_locator.swissgeodownloader.utils.archive_utils import (
+    extractArchive,
+    findDatasets,
+    vsizipDatasets,
+)
+
+
+class TestFindDatasets(unittest.TestCase):
+    def test_shapefile(self):
+        names = ["roads.shp", "roads.dbf", "roads.shx", "roads.prj", "README.txt"]
+        self.assertEqual(findDatasets(names), ["roads.shp"])
+
+    def test_geodatabase(self):
+        names = [
+            "data/swissTLM3D.gdb/",
+            "data/swissTLM3D.gdb/a00000001.gdbtable",
+            "data/swissTLM3D.gdb/a00000001.gdbtablx",
+            "data/legend.pdf",
+        ]
+        self.assertEqual(findDatasets(names), ["data/swissTLM3D.gdb"])
+
+    def test_ignore_mac_metadata(self):
+        names = ["dem.tif", "__MACOSX/._dem.tif"]
+        self.assertEqual(findDatasets(names), ["dem.tif"])
+
+
+class TestExtractArchive(unittest.TestCase):
+    def setUp(self):
+        self.tmpDir = tempfile.TemporaryDirectory()
+        self.zipPath = os.path.join(self.tmpDir.name, "roads.zip")
+        with zipfile.ZipFile(self.zipPath, "w") as archive:
+            archive.writestr("shp/roads.shp", b"shp" * 100)
+            archive.writestr("shp/roads.dbf", b"dbf")
+            archive.writestr("../outside.txt", b"not extracted")
+
+    def tearDown(self):
+        self.tmpDir.cleanup()
+
+    def test_extract(self):
+        target = os.path.join(self.tmpDir.name, "roads")
+        datasets = extractArchive(self.zipPath, target)
+        self.assertEqual(datasets, [os.path.join(target, "shp", "roads.shp")])
+        with open(datasets[0], "rb") as f:
+            self.assertEqual(f.read(), b"shp" * 100)
+        self.assertTrue(os.path.exists(os.path.join(target, "shp", "roads.dbf")))
+        self.assertFalse(os.path.exists(os.path.join(self.tmpDir.name, "outside.txt")))
+
+    def test_extract_again(self):
+        target = os.path.join(self.tmpDir.name, "roads")
+        extractArchive(self.zipPath, target)
+        self.assertEqual(
+            extractArchive(self.zipPath, target),
+            [os.path.join(target, "shp", "roads.shp")],
+        )
+
+    def test_ignored_members_are_not_returned(self):
+        with zipfile.ZipFile(self.zipPath, "a") as archive:
+            archive.writestr("../outside.shp", b"not extracted")
+        target = os.path.join(self.tmpDir.name, "roads")
+        self.assertEqual(
+            extractArchive(self.zipPath, target),
+            [os.path.join(target, "shp", "roads.shp")],
+        )
+
+    def test_cancel(self):
+        target = os.path.join(self.tmpDir.name, "roads")
+        self.assertEqual(extractArchive(self.zipPath, target, lambda: True), [])
+        self.assertFalse(os.path.exists(os.path.join(target, "shp", "roads.shp")))
+
+    def test_vsizip(self):
+        zipPath = self.zipPath.replace(os.sep, "/")
+        self.assertEqual(
+            vsizipDatasets(self.zipPath), [f"/vsizip/{zipPath}/shp/roads.shp"]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+from swiss_locator.swissgeodownloader.api import network_request
+from swiss_locator.swissgeodownloader.api.crawler import CrawlCheckpoint, crawl
+
+
+class TestCrawl(unittest.TestCase):
+    def setUp(self):
+        self.tmpDir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpDir.name, "crawl.checkpoint.json")
+        self.task = MagicMock()
+        self.task.isCanceled.return_value = False
+
+    def tearDown(self):
+        self.tmpDir.cleanup()
+
+    def test_batches_are_merged(self):
+        requested = []
+
+        def fetchBatch(keys):
+            requested.append(keys)
+            return {key: key.upper() for key in keys}
+
+        results = crawl(self.task, ["a", "b", "c"], fetchBatch, 2, requestsPerSecond=0)
+        self.assertEqual(results, {"a": "A", "b": "B", "c": "C"})
+        self.assertCountEqual(requested, [["a", "b"], ["c"]])
+
+    def test_continue_from_checkpoint(self):
+        def failing(keys):
+            if keys == ["b"]:
+                raise Exception("Service not reachable")
+            return {key: key.upper() for key in keys}
+
+        results = crawl(
+            self.task,
+            ["a", "b"],
+            failing,
+            checkpoint=CrawlCheckpoint.load(self.path),
+            requestsPerSecond=0,
+        )
+        # The failed batch is left out
+        self.assertEqual(results, {"a": "A"})
+        self.assertEqual(CrawlCheckpoint.load(self.path).results, {"a": "A"})
+
+        requested = []
+
+        def fetchBatch(keys):
+            requested.append(keys)
+            return {key: key.upper() for key in keys}
+
+        results = crawl(
+            self.task,
+            ["a", "b"],
+            fetchBatch,
+            checkpoint=CrawlCheckpoint.load(self.path),
+            requestsPerSecond=0,
+        )
+        self.assertEqual(results, {"a": "A", "b": "B"})
+        self.assertEqual(requested, [["b"]])
+
+    def test_canceled_batch_is_not_saved(self):
+        def fetchBatch(keys):
+            self.task.isCanceled.return_value = True
+            return {key: None for key in keys}
+
+        checkpoint = CrawlCheckpoint.load(self.path)
+        self.assertEqual(crawl(self.task, ["a"], fetchBatch, checkpoint=checkpoint), {})
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_requests_are_paced(self):
+        pacers = []
+
+        def fetchBatch(keys):
+            pacers.append(network_request._pacing.pacer)
+            return {key: key for key in keys}
+
+        crawl(self.task, ["a", "b"], fetchBatch, requestsPerSecond=100)
+        # All workers share one pacer, which is only set while crawling
+        self.assertEqual(len(set(map(id, pacers))), 1)
+        self.assertIsNotNone(pacers[0])
+        self.assertIsNone(getattr(network_request._pacing, "pacer", None))
+
+    def test_unreadable_checkpoint(self):
+        with open(self.path, "w") as f:
+            f.write('{"a": ')
+        self.assertEqual(CrawlCheckpoint.load(self.path).results, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
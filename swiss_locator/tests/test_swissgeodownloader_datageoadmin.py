@@ -0,0 +1,117 @@
+import unittest
+from unittest import mock
+
+from swiss_locator.swissgeodownloader.api import datageoadmin
+from swiss_locator.swissgeodownloader.api.datageoadmin import ApiDataGeoAdmin
+from swiss_locator.swissgeodownloader.api.response_objects import SgdAsset
+from swiss_locator.swissgeodownloader.api.stac_client import AssetRecord
+
+
+class _Task:
+    def isCanceled(self):
+        return False
+
+
+def record(href, mediaType, size=None):
+    properties = {} if size is None else {"file:size": size}
+    return AssetRecord(href, href, None, None, mediaType, properties, None, None, None)
+
+
+class TestAnalyseItems(unittest.TestCase):
+    def setUp(self):
+        self.api = ApiDataGeoAdmin()
+
+    def test_sizes_from_properties(self):
+        records = [
+            record("a.tif", "image/tiff", 100),
+            record("b.tif", "image/tiff", 300),
+            record("a.xyz.zip", "application/zip"),
+            record("b.xyz.zip", "application/zip"),
+        ]
+        with (
+            mock.patch.object(
+                self.api.stacClient, "fetchSampleRecords", return_value=(2, records)
+            ),
+            mock.patch.object(
+                datageoadmin,
+                "fetchContentLengths",
+                return_value={"b.xyz.zip": 1000},
+            ) as fetchContentLengths,
+        ):
+            analysis = self.api._analyseItems(_Task(), "ch.swisstopo.test")
+
+        # Only the media type without file:size is probed, once
+        self.assertEqual(fetchContentLengths.call_args.args[1], ["b.xyz.zip"])
+        self.assertEqual(analysis["itemCount"], 2)
+        self.assertEqual(
+            analysis["estimate"], {"image/tiff": 200, "application/zip": 1000}
+        )
+
+    def test_empty_estimate_is_not_cached(self):
+        collection = mock.MagicMock()
+        collection.id.return_value = "ch.swisstopo.test"
+        cache = mock.MagicMock()
+        cache.get.return_value = None
+        self.api.stacClient.cache = cache
+        with mock.patch.object(
+            self.api, "_analyseItems", return_value={"itemCount": 2, "estimate": {}}
+        ):
+            self.api.analyseCollectionItems(_Task(), collection)
+        cache.put.assert_not_called()
+
+        with mock.patch.object(
+            self.api,
+            "_analyseItems",
+            return_value={"itemCount": 2, "estimate": {"image/tiff": 200}},
+        ):
+            self.api.analyseCollectionItems(_Task(), collection)
+        cache.put.assert_called_once()
+
+
+class _ProgressTask(_Task):
+    def __init__(self):
+        self.progressValues = []
+
+    def progress(self):
+        return self.progressValues[-1] if self.progressValues else 0
+
+    def setProgress(self, progress):
+        self.progressValues.append(progress)
+
+
+class TestFetchFileSizes(unittest.TestCase):
+    def test_sizes_are_saved(self):
+        api = ApiDataGeoAdmin()
+        known = SgdAsset.fromRaw(
+            "a.tif", "https://example.com/a.tif", None, None, None, {"file:size": 5}
+        )
+        unknown = SgdAsset.fromRaw(
+            "b.tif", "https://example.com/b.tif", None, None, None, {}
+        )
+        missing = SgdAsset.fromRaw(
+            "c.tif", "https://example.com/c.tif", None, None, None, {}
+        )
+
+        def fetchContentLengths(task, urls, cache, ttl, onSize):
+            onSize("https://example.com/b.tif", 1000)
+            onSize("https://example.com/c.tif", None)
+            return {}
+
+        task = _ProgressTask()
+        with mock.patch.object(
+            datageoadmin, "fetchContentLengths", side_effect=fetchContentLengths
+        ) as fetch:
+            api.fetchFileSizes(task, [known, unknown, missing])
+
+        # Only files without size are requested
+        self.assertEqual(
+            fetch.call_args.args[1],
+            ["https://example.com/b.tif", "https://example.com/c.tif"],
+        )
+        self.assertEqual(unknown.fileSize, 1000)
+        self.assertIsNone(missing.fileSize)
+        self.assertEqual(task.progressValues, [50, 100])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+
+from swiss_locator.swissgeodownloader.api.download_engine import (
+    BURST,
+    BandwidthLimiter,
+    ProgressEstimator,
+)
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestBandwidthLimiter(unittest.TestCase):
+    def test_unlimited(self):
+        limiter = BandwidthLimiter(0)
+        self.assertEqual(limiter.acquire(10**9), 10**9)
+
+    def test_rate(self):
+        clock = _Clock()
+        limiter = BandwidthLimiter(1000, clock)
+        self.assertEqual(limiter.acquire(500), 0)
+
+        clock.now = 0.1
+        self.assertEqual(limiter.acquire(500), 100)
+        self.assertEqual(limiter.acquire(500), 0)
+
+        # Unused bandwidth is saved up to BURST seconds
+        clock.now = 10
+        self.assertEqual(limiter.acquire(5000), 1000 * BURST)
+
+
+class TestProgressEstimator(unittest.TestCase):
+    def test_remaining_time(self):
+        clock = _Clock()
+        estimator = ProgressEstimator(clock)
+        self.assertIsNone(estimator.remainingTime(1000))
+
+        clock.now = 1
+        estimator.update(100)
+        self.assertEqual(estimator.rate, 100)
+        self.assertEqual(estimator.remainingTime(1000), 9)
+
+    def test_smoothed_rate(self):
+        clock = _Clock()
+        estimator = ProgressEstimator(clock)
+        clock.now = 1
+        estimator.update(100)
+        # A short stall only lowers the rate a little
+        clock.now = 1.1
+        estimator.update(100)
+        self.assertGreater(estimator.rate, 90)
+        self.assertLess(estimator.rate, 100)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import os
+import tempfile
+import unittest
+
+from swiss_locator.swissgeodownloader.api.download_journal import (
+    STATUS_DONE,
+    STATUS_FAILED,
+    STATUS_PENDING,
+    DownloadJournal,
+)
+
+
+class TestDownloadJournal(unittest.TestCase):
+    def setUp(self):
+        self.tmpDir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpDir.name, ".sgd_download_test.json")
+        files = {
+            "a.tif": {
+                "href": "https://example.com/a.tif",
+                "size": 100,
+                "checksum": None,
+                "status": STATUS_PENDING,
+            },
+            "b.tif": {
+                "href": "https://example.com/b.tif",
+                "size": None,
+                "checksum": None,
+                "status": STATUS_PENDING,
+            },
+        }
+        DownloadJournal(self.path, "ch.swisstopo.swissimage-dop10", files).save()
+
+    def tearDown(self):
+        self.tmpDir.cleanup()
+
+    def test_status_is_saved(self):
+        journal = DownloadJournal.load(self.path)
+        journal.setStatus("a.tif", STATUS_DONE)
+        journal.setStatus("b.tif", STATUS_FAILED)
+
+        reloaded = DownloadJournal.load(self.path)
+        self.assertEqual(reloaded.collectionId, "ch.swisstopo.swissimage-dop10")
+        self.assertEqual(reloaded.outputDir, self.tmpDir.name)
+        self.assertEqual(reloaded.files["a.tif"]["status"], STATUS_DONE)
+        self.assertEqual(reloaded.files["b.tif"]["status"], STATUS_FAILED)
+        self.assertFalse(reloaded.isFinished)
+
+        reloaded.setStatus("b.tif", STATUS_DONE)
+        self.assertTrue(DownloadJournal.load(self.path).isFinished)
+        self.assertFalse(os.path.exists(f"{self.path}.tmp"))
+
+    def test_unreadable(self):
+        self.assertIsNone(DownloadJournal.load(f"{self.path}.missing"))
+        with open(self.path, "w") as f:
+            # Truncated file
+            f.write('{"collectionId": "c", "fi')
+        self.assertIsNone(DownloadJournal.load(self.path))
+
+    def test_remove(self):
+        journal = DownloadJournal.load(self.path)
+        journal.remove()
+        self.assertFalse(os.path.exists(self.path))
+        # Removing twice is not an error
+        journal.remove()
+
+
+if __name__ == "__main__":
+    unittest.main()
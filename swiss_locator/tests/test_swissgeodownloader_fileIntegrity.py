@@ -0,0 +1,84 @@
+import hashlib
+import os
+import tempfile
+import unittest
+
+from swiss_locator.swissgeodownloader.api.file_integrity import (
+    ContentStore,
+    fileMatches,
+    parseMultihash,
+)
+
+CONTENT = b"swissALTI3D tile"
+SHA256 = hashlib.sha256(CONTENT).hexdigest()
+# Multihash: code of sha2-256, digest length in bytes, digest
+CHECKSUM = f"1220{SHA256}"
+
+
+class TestFileIntegrity(unittest.TestCase):
+    def setUp(self):
+        self.tmpDir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpDir.name, "tile.tif")
+        with open(self.path, "wb") as f:
+            f.write(CONTENT)
+
+    def tearDown(self):
+        self.tmpDir.cleanup()
+
+    def test_parse_multihash(self):
+        self.assertEqual(parseMultihash(CHECKSUM), ("sha256", SHA256))
+        md5 = hashlib.md5(CONTENT).hexdigest()
+        self.assertEqual(parseMultihash(f"d50110{md5}"), ("md5", md5))
+        # Wrong digest length, unknown algorithm, no hex
+        self.assertIsNone(parseMultihash(f"1240{SHA256}"))
+        self.assertIsNone(parseMultihash(f"9920{SHA256}"))
+        self.assertIsNone(parseMultihash("xyz"))
+        self.assertIsNone(parseMultihash(None))
+
+    def test_file_matches(self):
+        self.assertTrue(fileMatches(self.path, len(CONTENT), CHECKSUM))
+        self.assertTrue(fileMatches(self.path, None, CHECKSUM))
+        self.assertTrue(fileMatches(self.path, len(CONTENT), None))
+        self.assertFalse(fileMatches(self.path, len(CONTENT) + 1, CHECKSUM))
+        self.assertFalse(fileMatches(self.path, len(CONTENT), "1220" + "0" * 64))
+        # Nothing to compare with
+        self.assertFalse(fileMatches(self.path, None, None))
+        self.assertFalse(fileMatches(self.path + ".missing", None, CHECKSUM))
+
+    def test_content_store(self):
+        store = ContentStore(os.path.join(self.tmpDir.name, "store"))
+        target = os.path.join(self.tmpDir.name, "other", "tile.tif")
+        os.makedirs(os.path.dirname(target))
+        self.assertFalse(store.restore(CHECKSUM, target))
+
+        store.add(self.path, CHECKSUM)
+        self.assertTrue(store.has(CHECKSUM))
+        self.assertTrue(store.restore(CHECKSUM, target))
+        with open(target, "rb") as f:
+            self.assertEqual(f.read(), CONTENT)
+
+    def test_content_store_copies_are_independent(self):
+        store = ContentStore(os.path.join(self.tmpDir.name, "store"))
+        store.add(self.path, CHECKSUM)
+        target = os.path.join(self.tmpDir.name, "other.tif")
+        self.assertTrue(store.restore(CHECKSUM, target, len(CONTENT)))
+
+        # Editing a restored file changes neither the store nor other files
+        with open(target, "ab") as f:
+            f.write(b" edited")
+        self.assertTrue(fileMatches(store.path(CHECKSUM), len(CONTENT), CHECKSUM))
+        self.assertTrue(fileMatches(self.path, len(CONTENT), CHECKSUM))
+
+    def test_modified_store_file_is_not_restored(self):
+        store = ContentStore(os.path.join(self.tmpDir.name, "store"))
+        store.add(self.path, CHECKSUM)
+        with open(store.path(CHECKSUM), "ab") as f:
+            f.write(b" edited")
+        target = os.path.join(self.tmpDir.name, "other.tif")
+        self.assertFalse(store.restore(CHECKSUM, target))
+        self.assertFalse(os.path.exists(target))
+        self.assertFalse(store.has(CHECKSUM))
+
+
+if __name__ == "__main__":
+    unittest.main()
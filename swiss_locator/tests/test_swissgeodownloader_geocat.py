@@ -1,7 +1,45 @@
+import os
+import tempfile
 import unittest
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 
 from swiss_locator.swissgeodownloader.api.geocat import ApiGeoCat
+from swiss_locator.swissgeodownloader.api.metadata_store import MetadataStore
+
+UUID_A = "a7109ba7-9dcc-46d6-829f-c94b2214a1e5"
+UUID_B = "0d216c1b-2998-4eb9-a47b-ac88aafb7271"
+
+
+def cswRecord(uuid, title):
+    return f"""
+    <gmd:MD_Metadata>
+      <gmd:fileIdentifier><gco:CharacterString>{uuid}</gco:CharacterString></gmd:fileIdentifier>
+      <gmd:identificationInfo><gmd:MD_DataIdentification>
+        <gmd:citation><gmd:CI_Citation><gmd:title>
+          <gmd:PT_FreeText><gmd:textGroup>
+            <gmd:LocalisedCharacterString locale="#DE">{title} DE</gmd:LocalisedCharacterString>
+            <gmd:LocalisedCharacterString locale="#FR">{title} FR</gmd:LocalisedCharacterString>
+          </gmd:textGroup></gmd:PT_FreeText>
+        </gmd:title></gmd:CI_Citation></gmd:citation>
+        <gmd:abstract><gmd:PT_FreeText><gmd:textGroup>
+          <gmd:LocalisedCharacterString locale="#DE">Beschreibung</gmd:LocalisedCharacterString>
+        </gmd:textGroup></gmd:PT_FreeText></gmd:abstract>
+      </gmd:MD_DataIdentification></gmd:identificationInfo>
+      <gmd:dataQualityInfo><gmd:title>
+        <gmd:LocalisedCharacterString locale="#DE">Other title</gmd:LocalisedCharacterString>
+      </gmd:title></gmd:dataQualityInfo>
+    </gmd:MD_Metadata>"""
+
+
+def cswResponse(records, nextRecord):
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+    <csw:GetRecordsResponse xmlns:csw="http://www.opengis.net/cat/csw/2.0.2"
+        xmlns:gmd="http://www.isotc211.org/2005/gmd"
+        xmlns:gco="http://www.isotc211.org/2005/gco">
+      <csw:SearchResults numberOfRecordsMatched="2" nextRecord="{nextRecord}">
+        {"".join(records)}
+      </csw:SearchResults>
+    </csw:GetRecordsResponse>""".encode()
 
 
 class TestApiGeoCat(unittest.TestCase):
@@ -14,16 +52,65 @@ class TestApiGeoCat(unittest.TestCase):
     def tearDownClass(cls):
         cls.api = None
 
-    @patch("swiss_locator.swissgeodownloader.api.geocat.loadFromFile")
-    def test_load_pre_saved_metadata(self, mock_load):
-        """Test loading pre-saved metadata."""
-        mock_load.return_value = {"testId": {"en": {"title": "Test Title"}}}
-        self.api.loadPreSavedMetadata()
-        self.assertIn("testId", self.api.preSavedMetadata)
-        self.assertIn("en", self.api.preSavedMetadata["testId"])
+    def test_get_meta_from_store(self):
+        """Test reading pre-saved metadata from the store."""
+        with tempfile.TemporaryDirectory() as tmpDir:
+            self.api.store = MetadataStore(os.path.join(tmpDir, "metadata.sqlite"))
+            self.api.store.put("testId", "en", {"title": "Test Title"})
+            self.assertEqual(
+                self.api.getMeta(None, "testId", "", "en")["title"], "Test Title"
+            )
+
+    def test_parse_records(self):
+        xml = cswResponse([cswRecord(UUID_A, "A"), cswRecord(UUID_B, "B")], 0)
+        records, nextRecord = self.api.parseRecords(xml, ["de", "fr", "en"])
+        self.assertEqual(nextRecord, 0)
         self.assertEqual(
-            self.api.preSavedMetadata["testId"]["en"]["title"], "Test Title"
+            records[UUID_A],
+            {
+                "de": {"title": "A DE", "description": "Beschreibung"},
+                "fr": {"title": "A FR"},
+            },
         )
+        self.assertEqual(records[UUID_B]["de"]["title"], "B DE")
+
+    @patch("swiss_locator.swissgeodownloader.api.geocat.responseCache")
+    @patch("swiss_locator.swissgeodownloader.api.geocat.fetch")
+    def test_get_meta_batch_pages(self, mockFetch, _):
+        mockFetch.side_effect = [
+            cswResponse([cswRecord(UUID_A, "A")], 2),
+            cswResponse([cswRecord(UUID_B, "B")], 0),
+        ]
+        task = MagicMock()
+        task.isCanceled.return_value = False
+        metadata = self.api.getMetaBatch(
+            task,
+            {
+                "collA": f"https://www.geocat.ch/records/{UUID_A}",
+                "collB": f"https://www.geocat.ch/records/{UUID_B}",
+                "collC": "no link",
+            },
+            ["fr"],
+        )
+        self.assertEqual(mockFetch.call_count, 2)
+        self.assertEqual(mockFetch.call_args.kwargs["params"]["startPosition"], 2)
+        self.assertEqual(
+            metadata,
+            {"collA": {"fr": {"title": "A FR"}}, "collB": {"fr": {"title": "B FR"}}},
+        )
+
+    @patch("swiss_locator.swissgeodownloader.api.geocat.responseCache")
+    @patch("swiss_locator.swissgeodownloader.api.geocat.fetch")
+    def test_get_meta_batch_fails(self, mockFetch, _):
+        # geocat.ch not reachable
+        mockFetch.return_value = False
+        task = MagicMock()
+        task.isCanceled.return_value = False
+        task.exception = "geocat.ch not reachable"
+        with self.assertRaises(Exception):
+            self.api.getMetaBatch(
+                task, {"collA": f"https://www.geocat.ch/records/{UUID_A}"}, ["de"]
+            )
 
     def test_extract_uuid_from_valid_url_of_typeA(self):
         url = "https://www.geocat.ch/geonetwork/srv/api/records/a7109ba7-9dcc-46d6-829f-c94b2214a1e5?language=all"
@@ -0,0 +1,104 @@
+"""
+Unit tests for the compressed transfer of API responses.
+These tests do NOT require network access.
+"""
+
+import gzip
+import json
+import unittest
+import zlib
+from types import SimpleNamespace
+
+from swiss_locator.swissgeodownloader.api.http_compression import (
+    ACCEPT_ENCODING,
+    TransferStats,
+    decodedContent,
+    decompress,
+    readReply,
+    transferStats,
+)
+
+CONTENT = json.dumps({"features": [{"id": i} for i in range(100)]}).encode()
+
+
+class FakeRequest:
+    def __init__(self, headers: dict):
+        self.headers = headers
+
+    def rawHeader(self, name: bytes) -> bytes:
+        return self.headers.get(name, b"")
+
+
+class FakeReply:
+    def __init__(self, content: bytes, headers: dict, requestHeaders: dict):
+        self.content = content
+        self.headers = headers
+        self.requestHeaders = requestHeaders
+
+    def request(self):
+        return FakeRequest(self.requestHeaders)
+
+    def rawHeader(self, name: bytes) -> bytes:
+        return self.headers.get(name, b"")
+
+    def readAll(self):
+        return SimpleNamespace(data=lambda: self.content)
+
+
+class TestHttpCompression(unittest.TestCase):
+    def setUp(self):
+        transferStats.reset()
+
+    def test_gzip(self):
+        self.assertEqual(decompress(gzip.compress(CONTENT), "gzip"), CONTENT)
+
+    def test_deflate(self):
+        self.assertEqual(decompress(zlib.compress(CONTENT), "deflate"), CONTENT)
+        raw = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+        data = raw.compress(CONTENT) + raw.flush()
+        self.assertEqual(decompress(data, "deflate"), CONTENT)
+
+    def test_identity(self):
+        self.assertEqual(decompress(CONTENT, "identity"), CONTENT)
+
+    def test_unsupported(self):
+        with self.assertRaises(ValueError):
+            decompress(CONTENT, "compress")
+
+    def test_bytes_saved(self):
+        compressed = gzip.compress(CONTENT)
+        self.assertEqual(
+            json.loads(decodedContent(compressed, "gzip")), json.loads(CONTENT)
+        )
+        decodedContent(CONTENT, "")
+
+        stats = transferStats.stats()
+        self.assertEqual(stats["responses"], 2)
+        self.assertEqual(stats["compressed"], 1)
+        self.assertEqual(stats["bytes_received"], len(compressed) + len(CONTENT))
+        self.assertEqual(stats["bytes_saved"], len(CONTENT) - len(compressed))
+
+    def test_compressed_reply(self):
+        reply = FakeReply(
+            gzip.compress(CONTENT),
+            {b"Content-Encoding": b"gzip"},
+            {b"Accept-Encoding": ACCEPT_ENCODING},
+        )
+        self.assertEqual(readReply(reply), CONTENT)
+
+    def test_reply_decompressed_by_qt(self):
+        # Without acceptCompression Qt decompresses the content itself, but
+        #  keeps the Content-Encoding header
+        reply = FakeReply(CONTENT, {b"Content-Encoding": b"gzip"}, {})
+        self.assertEqual(readReply(reply), CONTENT)
+        self.assertEqual(transferStats.stats()["compressed"], 0)
+
+    def test_reset(self):
+        stats = TransferStats()
+        stats.record(10, 100, True)
+        stats.reset()
+        self.assertEqual(stats.stats()["bytes_saved"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
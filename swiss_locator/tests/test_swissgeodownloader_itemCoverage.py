@@ -0,0 +1,119 @@
+import unittest
+
+from swiss_locator.swissgeodownloader.api.item_coverage import (
+    ItemCoverageCache,
+    bboxDifference,
+)
+from swiss_locator.swissgeodownloader.api.stac_client import AssetRecord
+
+
+class _Box:
+    def __init__(self, xmin, ymin, xmax, ymax):
+        self.coords = (xmin, ymin, xmax, ymax)
+
+    def xMinimum(self):
+        return self.coords[0]
+
+    def yMinimum(self):
+        return self.coords[1]
+
+    def xMaximum(self):
+        return self.coords[2]
+
+    def yMaximum(self):
+        return self.coords[3]
+
+
+def record(href, bbox):
+    return AssetRecord(href, href, None, None, None, {}, _Box(*bbox), None, None)
+
+
+def area(rects):
+    return sum((r[2] - r[0]) * (r[3] - r[1]) for r in rects)
+
+
+class TestBboxDifference(unittest.TestCase):
+    def test_contained(self):
+        self.assertEqual(bboxDifference([1, 1, 2, 2], [[0, 0, 3, 3]]), [])
+
+    def test_disjoint(self):
+        self.assertEqual(bboxDifference([0, 0, 1, 1], [[2, 2, 3, 3]]), [[0, 0, 1, 1]])
+
+    def test_touching(self):
+        self.assertEqual(bboxDifference([0, 0, 1, 1], [[1, 0, 2, 1]]), [[0, 0, 1, 1]])
+
+    def test_partial_overlap(self):
+        # Panned to the right by half of the width
+        self.assertEqual(bboxDifference([1, 0, 3, 2], [[0, 0, 2, 2]]), [[2, 0, 3, 2]])
+
+    def test_hole(self):
+        missing = bboxDifference([0, 0, 4, 4], [[1, 1, 3, 3]])
+        self.assertEqual(len(missing), 4)
+        self.assertEqual(area(missing), 16 - 4)
+
+    def test_several_covers(self):
+        missing = bboxDifference([0, 0, 4, 2], [[0, 0, 2, 2], [3, 0, 4, 2]])
+        self.assertEqual(missing, [[2, 0, 3, 2]])
+
+
+class TestItemCoverageCache(unittest.TestCase):
+    def test_contained_request(self):
+        cache = ItemCoverageCache()
+        self.assertEqual(cache.missingAreas("c", [0, 0, 2, 2]), [[0, 0, 2, 2]])
+        cache.add(
+            "c",
+            [0, 0, 2, 2],
+            [record("a", [0, 0, 1, 1]), record("b", [1.5, 1.5, 2, 2])],
+        )
+
+        self.assertEqual(cache.missingAreas("c", [0, 0, 1, 1]), [])
+        self.assertEqual(
+            [r.href for r in cache.cachedRecords("c", [0, 0, 1, 1])], ["a"]
+        )
+        # Other collections are not covered
+        self.assertEqual(cache.missingAreas("d", [0, 0, 1, 1]), [[0, 0, 1, 1]])
+
+    def test_overlapping_request(self):
+        cache = ItemCoverageCache()
+        cache.add("c", [0, 0, 2, 2], [record("a", [0, 0, 1, 1])])
+        self.assertEqual(cache.missingAreas("c", [1, 0, 3, 2]), [[2, 0, 3, 2]])
+        cache.add("c", [2, 0, 3, 2], [record("b", [2.5, 0, 3, 1])])
+        self.assertEqual(cache.missingAreas("c", [0, 0, 3, 2]), [])
+
+    def test_whole_collection(self):
+        cache = ItemCoverageCache()
+        self.assertEqual(cache.missingAreas("c", None), [None])
+        cache.add("c", None, [record("a", [0, 0, 1, 1])])
+        self.assertEqual(cache.missingAreas("c", [5, 5, 6, 6]), [])
+        self.assertEqual(len(cache.cachedRecords("c", None)), 1)
+
+    def test_expired(self):
+        cache = ItemCoverageCache(ttl=0)
+        cache.add("c", [0, 0, 2, 2], [record("a", [0, 0, 1, 1])])
+        self.assertEqual(cache.missingAreas("c", [0, 0, 1, 1]), [[0, 0, 1, 1]])
+        self.assertEqual(cache.cachedRecords("c", [0, 0, 1, 1]), [])
+
+    def test_least_recently_used_collections_are_dropped(self):
+        cache = ItemCoverageCache(maxRecords=3)
+        cache.add("c", [0, 0, 2, 2], [record("a", [0, 0, 1, 1])])
+        cache.add("d", [0, 0, 2, 2], [record("b", [0, 0, 1, 1])])
+        cache.missingAreas("c", [0, 0, 1, 1])
+        cache.add(
+            "e", [0, 0, 2, 2], [record("c", [0, 0, 1, 1]), record("d", [1, 1, 2, 2])]
+        )
+        # d was used least recently
+        self.assertEqual(cache.missingAreas("d", [0, 0, 1, 1]), [[0, 0, 1, 1]])
+        self.assertEqual(cache.missingAreas("c", [0, 0, 1, 1]), [])
+        self.assertEqual(cache.missingAreas("e", [0, 0, 1, 1]), [])
+
+    def test_large_results_are_not_cached(self):
+        cache = ItemCoverageCache(maxRecords=1)
+        cache.add(
+            "c", [0, 0, 2, 2], [record("a", [0, 0, 1, 1]), record("b", [1, 1, 2, 2])]
+        )
+        self.assertEqual(cache.missingAreas("c", [0, 0, 1, 1]), [[0, 0, 1, 1]])
+        self.assertEqual(cache.cachedRecords("c", None), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+import os
+import tempfile
+import unittest
+
+from swiss_locator.swissgeodownloader.api.metadata_store import MetadataStore
+
+
+class TestMetadataStore(unittest.TestCase):
+    def setUp(self):
+        self.tmpDir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpDir.name, "metadata.sqlite")
+        self.store = MetadataStore(self.path)
+
+    def tearDown(self):
+        self.tmpDir.cleanup()
+
+    def test_put_and_get(self):
+        self.assertIsNone(self.store.get("testId", "en"))
+        self.store.put("testId", "en", {"title": "Title"})
+        self.store.put("testId", "en", {"title": "New title"})
+        self.assertEqual(self.store.get("testId", "en"), {"title": "New title"})
+        # A new connection reads the record from the database
+        self.assertEqual(
+            MetadataStore(self.path).get("testId", "en"), {"title": "New title"}
+        )
+
+    def test_replace_all(self):
+        self.store.put("oldId", "de", {"title": "Alt"})
+        metadata = {
+            "a": {"de": {"title": "A de"}, "en": {"title": "A en"}},
+            "b": {"fr": {"title": "B fr"}},
+        }
+        self.store.replaceAll(metadata)
+        self.assertIsNone(self.store.get("oldId", "de"))
+        self.assertEqual(self.store.export(), metadata)
+
+        self.store.replaceAll({"c": {"it": {"title": "C it"}}}, clear=False)
+        self.assertEqual(self.store.get("a", "en"), {"title": "A en"})
+        self.assertEqual(self.store.get("c", "it"), {"title": "C it"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+import hashlib
+import os
+import tempfile
+import unittest
+
+from qgis.PyQt.QtNetwork import QNetworkReply, QNetworkRequest
+
+from swiss_locator.swissgeodownloader.api.network_request import (
+    RETRY_MAX_DELAY,
+    FileDownload,
+    RequestPacer,
+    isRetryable,
+    parseContentRange,
+    retryDelay,
+)
+
+
+class TestDownloadRetries(unittest.TestCase):
+    def test_retry_delay(self):
+        for attempt in range(1, 4):
+            delay = retryDelay(attempt)
+            maxDelay = 2 * 2 ** (attempt - 1)
+            self.assertGreaterEqual(delay, maxDelay / 2)
+            self.assertLessEqual(delay, maxDelay)
+        self.assertLessEqual(retryDelay(20), RETRY_MAX_DELAY)
+
+    def test_retryable(self):
+        # Connection errors have no status
+        self.assertTrue(isRetryable(None))
+        self.assertTrue(isRetryable(503))
+        self.assertTrue(isRetryable(429))
+        self.assertFalse(isRetryable(404))
+        self.assertFalse(isRetryable(403))
+
+    def test_content_range(self):
+        self.assertEqual(parseContentRange("bytes 100-199/1000"), (100, 1000))
+        self.assertEqual(parseContentRange("bytes 100-199/*"), (100, None))
+        self.assertIsNone(parseContentRange(""))
+
+
+class TestDownloadChecksum(unittest.TestCase):
+    def setUp(self):
+        self.tmpDir = tempfile.TemporaryDirectory()
+        self.filePath = os.path.join(self.tmpDir.name, "file.tif")
+        self.content = b"swiss geo data" * 1000
+        self.checksum = "1220" + hashlib.sha256(self.content).hexdigest()
+
+    def tearDown(self):
+        self.tmpDir.cleanup()
+
+    def resumedDownload(self, partial: bytes, checksum: str) -> FileDownload:
+        with open(f"{self.filePath}.part", "wb") as f:
+            f.write(partial)
+        download = FileDownload(
+            "https://example.com/file.tif", self.filePath, checksum=checksum
+        )
+        download.bytesReceived = len(partial)
+        download._hashPartialFile()
+        return download
+
+    def test_resumed_download_matches(self):
+        download = self.resumedDownload(self.content[:5000], self.checksum)
+        # The remaining bytes are hashed as they arrive
+        download.hasher.update(self.content[5000:])
+        download.hashedBytes = download.bytesReceived = len(self.content)
+        self.assertTrue(download._checksumMatches())
+        self.assertTrue(download.verified)
+
+    def test_mismatch(self):
+        download = self.resumedDownload(self.content[:-1] + b"x", self.checksum)
+        self.assertFalse(download._checksumMatches())
+        self.assertFalse(download.verified)
+
+    def test_no_checksum(self):
+        download = FileDownload("https://example.com/file.tif", self.filePath)
+        self.assertTrue(download._checksumMatches())
+        self.assertFalse(download.verified)
+
+
+class FakeReply:
+    def __init__(self, status: int, headers: dict):
+        self.status = status
+        self.headers = headers
+
+    def attribute(self, attribute):
+        if attribute == QNetworkRequest.Attribute.HttpStatusCodeAttribute:
+            return self.status
+
+    def rawHeader(self, name: bytes) -> bytes:
+        return self.headers.get(name, b"")
+
+    def error(self):
+        return QNetworkReply.NetworkError.NoError
+
+    def errorString(self):
+        return ""
+
+    def bytesAvailable(self):
+        return 10
+
+    def deleteLater(self):
+        pass
+
+
+class TestDownloadRedirect(unittest.TestCase):
+    def test_redirect_not_followed_fails(self):
+        with tempfile.TemporaryDirectory() as tmpDir:
+            filePath = os.path.join(tmpDir, "file.tif")
+            results = []
+            download = FileDownload(
+                "https://example.com/file.tif", filePath, onFinished=results.append
+            )
+            download.reply = FakeReply(
+                302, {b"Location": b"http://example.com/file.tif"}
+            )
+            download._onReplyFinished()
+            self.assertEqual(results, [False])
+            self.assertIn("http://example.com/file.tif", download.error)
+            self.assertFalse(os.path.exists(filePath))
+            self.assertFalse(os.path.exists(f"{filePath}.part"))
+
+
+class TestRequestPacer(unittest.TestCase):
+    def test_starts_are_spaced(self):
+        now = [100.0]
+        pacer = RequestPacer(2, clock=lambda: now[0])
+        self.assertEqual(pacer.reserve(), 0)
+        self.assertEqual(pacer.reserve(), 0.5)
+        self.assertEqual(pacer.reserve(), 1.0)
+        now[0] = 110.0
+        self.assertEqual(pacer.reserve(), 0)
+
+    def test_unlimited(self):
+        pacer = RequestPacer(0)
+        self.assertEqual(pacer.reserve(), 0)
+        self.assertEqual(pacer.reserve(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
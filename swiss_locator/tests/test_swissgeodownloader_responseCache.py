@@ -0,0 +1,117 @@
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+
+from swiss_locator.swissgeodownloader.api.response_cache import ResponseCache
+
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpDir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpDir.name, "responses.sqlite")
+
+    def tearDown(self):
+        self.tmpDir.cleanup()
+
+    def test_get_put(self):
+        cache = ResponseCache(self.path)
+        self.assertIsNone(cache.get("a"))
+        cache.put("a", {"features": [1, 2]})
+        self.assertEqual(cache.get("a"), {"features": [1, 2]})
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_persisted(self):
+        ResponseCache(self.path).put("a", [1], "etag-a")
+        entry = ResponseCache(self.path).lookup("a")
+        self.assertEqual(entry.value, [1])
+        self.assertEqual(entry.etag, "etag-a")
+
+    def test_last_modified(self):
+        ResponseCache(self.path).put(
+            "a", "<xml/>", ttl=60, lastModified="Wed, 21 Oct 2015 07:28:00 GMT"
+        )
+        entry = ResponseCache(self.path).lookup("a")
+        self.assertIsNone(entry.etag)
+        self.assertEqual(entry.lastModified, "Wed, 21 Oct 2015 07:28:00 GMT")
+
+    def test_database_without_last_modified(self):
+        db = sqlite3.connect(self.path)
+        db.execute(
+            "CREATE TABLE entries (key TEXT PRIMARY KEY, value TEXT, etag TEXT, "
+            "expires_at REAL, last_access REAL, size INTEGER)"
+        )
+        db.execute(
+            "INSERT INTO entries VALUES ('a', '[1]', 'etag-a', ?, 0, 3)",
+            (time.time() + 60,),
+        )
+        db.commit()
+        db.close()
+
+        cache = ResponseCache(self.path)
+        self.assertEqual(cache.get("a"), [1])
+        self.assertIsNone(cache.lookup("a").lastModified)
+
+    def test_expired_entry_is_revalidated(self):
+        cache = ResponseCache(self.path)
+        cache.put("a", [1], "etag-a", ttl=-1)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.lookup("a").etag, "etag-a")
+
+        self.assertEqual(cache.revalidated("a", ttl=60), [1])
+        self.assertEqual(cache.get("a"), [1])
+        self.assertEqual(cache.stats()["revalidations"], 1)
+
+    def test_least_recently_used_are_evicted(self):
+        cache = ResponseCache(self.path, maxBytes=30, maxMemoryEntries=1)
+        cache.put("a", "x" * 10)
+        time.sleep(0.01)
+        cache.put("b", "y" * 10)
+        time.sleep(0.01)
+        cache.lookup("a")
+        cache.put("c", "z" * 10)
+
+        self.assertIsNotNone(cache.lookup("a"))
+        self.assertIsNone(cache.lookup("b"))
+        self.assertIsNotNone(cache.lookup("c"))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_least_recently_used_in_memory_are_evicted(self):
+        cache = ResponseCache(self.path, maxBytes=30)
+        cache.put("a", "x" * 10)
+        time.sleep(0.01)
+        cache.put("b", "y" * 10)
+        time.sleep(0.01)
+        # Served from memory
+        cache.lookup("a")
+        cache.put("c", "z" * 10)
+
+        self.assertIsNotNone(cache.lookup("a"))
+        self.assertIsNone(cache.lookup("b"))
+        self.assertIsNotNone(cache.lookup("c"))
+
+    def test_values_are_copies(self):
+        cache = ResponseCache(self.path)
+        value = {"features": [{"assets": {"a.tif": {"href": "a"}}}]}
+        cache.put("a", value)
+        value["features"].clear()
+        cache.get("a")["features"][0]["assets"]["a.tif"].pop("href")
+        self.assertEqual(
+            cache.get("a"), {"features": [{"assets": {"a.tif": {"href": "a"}}}]}
+        )
+
+    def test_invalidate(self):
+        cache = ResponseCache(self.path)
+        cache.put("collections a", 1)
+        cache.put("items a", 2)
+        cache.invalidate("collections")
+        self.assertIsNone(cache.lookup("collections a"))
+        self.assertEqual(cache.get("items a"), 2)
+        cache.invalidate()
+        self.assertEqual(cache.stats()["entries"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -173,6 +173,20 @@ class TestFileObject(unittest.TestCase):
         self.assertTrue(file_obj.coordsysFitsFilter(""))
         self.assertFalse(file_obj.coordsysFitsFilter("EPSG:3857"))
 
+    def test_from_raw(self):
+        file_obj = SgdAsset.fromRaw(
+            "test_file.tif",
+            "http://example.com/test_file.tif",
+            "Test file",
+            "",
+            "image/tiff; application=geotiff; profile=cloud-optimized",
+            {"gsd": 0.5},
+        )
+        self.assertEqual(file_obj.id, "test_file.tif")
+        self.assertEqual(file_obj.href, "http://example.com/test_file.tif")
+        self.assertEqual(file_obj.filetype, "tiff")
+        self.assertEqual(file_obj.properties, {"gsd": 0.5})
+
 
 if __name__ == "__main__":
     unittest.main()
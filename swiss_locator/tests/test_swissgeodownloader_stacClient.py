@@ -0,0 +1,210 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from swiss_locator.swissgeodownloader.api.response_cache import ResponseCache
+from swiss_locator.swissgeodownloader.api.response_objects import (
+    ALL_VALUE,
+    CURRENT_VALUE,
+)
+from swiss_locator.swissgeodownloader.api.stac_client import SEARCH_FIELDS, STACClient
+from swiss_locator.swissgeodownloader.utils.filter_utils import toSearchFilters
+
+
+class _Task:
+    def isCanceled(self):
+        return False
+
+
+def rawItem(itemId, properties, assets):
+    return {
+        "id": itemId,
+        "bbox": [7.0, 46.0, 7.1, 46.1],
+        "properties": properties,
+        "assets": assets,
+    }
+
+
+class TestParseItems(unittest.TestCase):
+    def test_records(self):
+        page = {
+            "features": [
+                rawItem(
+                    "item_1",
+                    {"datetime": "2024-01-01T00:00:00Z"},
+                    {
+                        "a.tif": {
+                            "href": "https://example.com/a.tif",
+                            "type": "image/tiff",
+                            "gsd": 0.5,
+                        },
+                        "b.tif": {"href": "https://example.com/b.tif", "gsd": 2},
+                    },
+                )
+            ]
+        }
+        records = STACClient._parseItems(_Task(), page)
+        # Records are yielded lazily
+        self.assertFalse(isinstance(records, list))
+        records = list(records)
+
+        self.assertEqual([r.assetId for r in records], ["a.tif", "b.tif"])
+        self.assertEqual(records[0].href, "https://example.com/a.tif")
+        self.assertEqual(records[0].mediaType, "image/tiff")
+        self.assertEqual(records[0].properties, {"gsd": 0.5})
+        self.assertEqual(records[0].timestamp, "2024-01-01T00:00:00Z")
+        self.assertIsNone(records[0].endTimestamp)
+        self.assertEqual(records[0].bbox.xMinimum(), 7.0)
+
+    def test_timestamp_range(self):
+        page = {
+            "features": [
+                rawItem(
+                    "item_1",
+                    {
+                        "datetime": None,
+                        "start_datetime": "2020-01-01T00:00:00Z",
+                        "end_datetime": "2021-01-01T00:00:00Z",
+                    },
+                    {"a.tif": {"href": "https://example.com/a.tif"}},
+                )
+            ]
+        }
+        record = next(STACClient._parseItems(_Task(), page))
+        self.assertEqual(record.timestamp, "2020-01-01T00:00:00Z")
+        self.assertEqual(record.endTimestamp, "2021-01-01T00:00:00Z")
+
+    def test_created_timestamp(self):
+        page = {
+            "features": [
+                rawItem(
+                    "item_1",
+                    {"created": "2022-01-01T00:00:00Z"},
+                    {"a.tif": {"href": "https://example.com/a.tif"}},
+                )
+            ]
+        }
+        record = next(STACClient._parseItems(_Task(), page))
+        self.assertEqual(record.timestamp, "2022-01-01T00:00:00Z")
+
+    def test_cached_page_is_parsed_twice(self):
+        page = {
+            "features": [
+                rawItem(
+                    "item_1",
+                    {"datetime": "2024-01-01T00:00:00Z"},
+                    {
+                        "a.tif": {
+                            "href": "https://example.com/a.tif",
+                            "type": "image/tiff",
+                            "gsd": 0.5,
+                        }
+                    },
+                )
+            ]
+        }
+        with tempfile.TemporaryDirectory() as tmpDir:
+            cache = ResponseCache(os.path.join(tmpDir, "responses.sqlite"))
+            cache.put("page", page)
+            for _ in range(2):
+                record = next(STACClient._parseItems(_Task(), cache.get("page")))
+                self.assertEqual(record.href, "https://example.com/a.tif")
+                self.assertEqual(record.mediaType, "image/tiff")
+                self.assertEqual(record.properties, {"gsd": 0.5})
+        # The response is not modified
+        self.assertIn("href", page["features"][0]["assets"]["a.tif"])
+
+
+class TestSampleRecords(unittest.TestCase):
+    def test_one_page_is_requested(self):
+        page = {
+            "features": [
+                rawItem(
+                    "item_1",
+                    {"datetime": "2024-01-01T00:00:00Z"},
+                    {"a.tif": {"href": "https://example.com/a.tif"}},
+                )
+            ],
+            "links": [{"rel": "next", "href": "https://example.com/items?offset=1"}],
+        }
+        with (
+            tempfile.TemporaryDirectory() as tmpDir,
+            patch(
+                "swiss_locator.swissgeodownloader.api.stac_client.responseCache",
+                return_value=ResponseCache(os.path.join(tmpDir, "responses.sqlite")),
+            ),
+        ):
+            client = STACClient("https://example.com")
+            module = "swiss_locator.swissgeodownloader.api.stac_client"
+            with (
+                patch(f"{module}.fetch", return_value=page) as fetch,
+                patch(f"{module}.startRequest") as startRequest,
+            ):
+                itemCount, records = client.fetchSampleRecords(_Task(), "c", 1)
+        self.assertEqual(itemCount, 1)
+        self.assertEqual([r.href for r in records], ["https://example.com/a.tif"])
+        fetch.assert_called_once()
+        startRequest.assert_not_called()
+
+
+class TestSearch(unittest.TestCase):
+    CONFORMS_TO = [
+        "https://api.stacspec.org/v1.0.0/item-search",
+        "https://api.stacspec.org/v1.0.0-rc.1/item-search#filter",
+        "https://api.stacspec.org/v1.0.0-rc.1/item-search#fields",
+    ]
+
+    def test_search_filters(self):
+        searchFilters = toSearchFilters(
+            {
+                "filetype": ".tif",
+                "category": "krel",
+                "resolution": "0.5",
+                "timestamp": "2020-01-01 / 2020-12-31",
+                "coordsys": ALL_VALUE,
+            }
+        )
+        self.assertEqual(
+            searchFilters,
+            {
+                "datetime": "2020-01-01T00:00:00Z/2020-12-31T23:59:59Z",
+                "propertyFilters": {"geoadmin:variant": "krel", "gsd": 0.5},
+            },
+        )
+        self.assertEqual(toSearchFilters({"timestamp": CURRENT_VALUE}), {})
+
+    def test_search_body(self):
+        body = STACClient.searchBody(
+            "ch.swisstopo.swissimage-dop10",
+            [7.0, 46.0, 7.1, 46.1],
+            "2020-01-01T00:00:00Z/2020-01-01T23:59:59Z",
+            {"gsd": 0.1, "proj:epsg": 2056},
+            self.CONFORMS_TO,
+        )
+        self.assertEqual(body["collections"], ["ch.swisstopo.swissimage-dop10"])
+        self.assertEqual(body["bbox"], [7.0, 46.0, 7.1, 46.1])
+        self.assertEqual(body["datetime"], "2020-01-01T00:00:00Z/2020-01-01T23:59:59Z")
+        self.assertEqual(body["filter-lang"], "cql2-json")
+        self.assertEqual(
+            body["filter"],
+            {
+                "op": "and",
+                "args": [
+                    {"op": "=", "args": [{"property": "gsd"}, 0.1]},
+                    {"op": "=", "args": [{"property": "proj:epsg"}, 2056]},
+                ],
+            },
+        )
+        self.assertEqual(body["fields"], {"include": SEARCH_FIELDS})
+
+    def test_search_body_without_extensions(self):
+        # Property filters are applied locally if the API can't filter
+        body = STACClient.searchBody(
+            "ch.swisstopo.swissimage-dop10", None, None, {"gsd": 0.1}, []
+        )
+        self.assertEqual(body, {"collections": ["ch.swisstopo.swissimage-dop10"]})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+"""
+Unit tests for the offline vector tile packages: tile pyramid computation
+and MBTiles archive writing. These tests do NOT require network access.
+"""
+
+import gzip
+import os
+import sqlite3
+import tempfile
+
+from qgis.testing import start_app, unittest
+
+from swiss_locator.core.vector_tiles.offline_package import (
+    MBTilesArchive,
+    offline_package,
+    style_name,
+    tile_count,
+    tile_range,
+    tiles_for_extent,
+)
+
+start_app()
+
+# Bern old town, approximately
+BERN = (7.43, 46.94, 7.46, 46.955)
+
+
+class TestTilePyramid(unittest.TestCase):
+    def test_zoom_zero_is_a_single_tile(self):
+        self.assertEqual(tile_range(*BERN, 0), (0, 0, 0, 0))
+
+    def test_known_tile(self):
+        # Bern lies in tile 8/133/90
+        x_min, x_max, y_min, y_max = tile_range(*BERN, 8)
+        self.assertEqual((x_min, y_min), (133, 90))
+        self.assertEqual((x_max, y_max), (133, 90))
+
+    def test_rows_grow_southwards(self):
+        x_min, x_max, y_min, y_max = tile_range(*BERN, 14)
+        self.assertLessEqual(x_min, x_max)
+        self.assertLessEqual(y_min, y_max)
+
+    def test_clamped_to_world(self):
+        self.assertEqual(tile_range(-180, -90, 180, 90, 2), (0, 3, 0, 3))
+
+    def test_count_matches_tiles(self):
+        tiles = list(tiles_for_extent(*BERN, 0, 14))
+        self.assertEqual(len(tiles), tile_count(*BERN, 0, 14))
+        self.assertEqual(len(tiles), len(set(tiles)))
+
+
+class TestMBTilesArchive(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "test.mbtiles")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_identical_tiles_are_stored_once(self):
+        archive = MBTilesArchive(self.path)
+        archive.write_tile(14, 8530, 5770, b"empty")
+        archive.write_tile(14, 8531, 5770, b"empty")
+        archive.write_tile(14, 8532, 5770, b"lake")
+        archive.close()
+
+        connection = sqlite3.connect(self.path)
+        self.assertEqual(
+            connection.execute("SELECT count(*) FROM map").fetchone()[0], 3
+        )
+        self.assertEqual(
+            connection.execute("SELECT count(*) FROM images").fetchone()[0], 2
+        )
+        connection.close()
+
+    def test_tiles_are_gzipped_and_tms(self):
+        archive = MBTilesArchive(self.path)
+        archive.write_tile(1, 0, 0, b"data")
+        archive.close()
+
+        connection = sqlite3.connect(self.path)
+        row, data = connection.execute(
+            "SELECT tile_row, tile_data FROM tiles WHERE zoom_level = 1"
+        ).fetchone()
+        connection.close()
+        self.assertEqual(row, 1)
+        self.assertEqual(gzip.decompress(data), b"data")
+
+    def test_existing_tiles_use_xyz_rows(self):
+        archive = MBTilesArchive(self.path)
+        archive.write_tile(3, 2, 1, b"data")
+        self.assertEqual(archive.existing_tiles(3), {(2, 1)})
+        self.assertEqual(archive.existing_tiles(4), set())
+        archive.close()
+
+    def test_empty_tiles_are_only_recorded(self):
+        archive = MBTilesArchive(self.path)
+        archive.write_tile(3, 2, 1, b"data")
+        archive.write_empty_tile(3, 2, 2)
+        self.assertEqual(archive.existing_tiles(3), {(2, 1), (2, 2)})
+        archive.close()
+
+        connection = sqlite3.connect(self.path)
+        self.assertEqual(
+            connection.execute("SELECT count(*) FROM tiles").fetchone()[0], 1
+        )
+        connection.close()
+
+
+class TestOfflinePackage(unittest.TestCase):
+    def test_style_name(self):
+        self.assertEqual(
+            style_name(
+                "https://vectortiles.geo.admin.ch/styles/ch.swisstopo.basemap.vt/style.json"
+            ),
+            "ch.swisstopo.basemap.vt",
+        )
+
+    def test_no_package(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            self.assertIsNone(
+                offline_package(tmp_dir, "https://example.com/basemap/style.json")
+            )
+        self.assertIsNone(offline_package("", "https://example.com/style.json"))
+
+
+if __name__ == "__main__":
+    unittest.main()
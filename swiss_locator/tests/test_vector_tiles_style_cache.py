@@ -0,0 +1,111 @@
+"""
+Unit tests for the cache of converted vector tile styles.
+These tests do NOT require network access.
+"""
+
+import json
+import os
+import shutil
+
+from qgis.core import Qgis
+from qgis.testing import start_app, unittest
+
+from swiss_locator.core.vector_tiles.style_cache import (
+    ENTRY_FILE_NAME,
+    cached_style,
+    sprite_urls,
+    style_cache_dir,
+)
+
+start_app()
+
+STYLE_URL = "https://example.com/styles/test.vt/style.json"
+
+
+class TestStyleCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = style_cache_dir(STYLE_URL)
+        os.makedirs(self.directory, exist_ok=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _write_entry(self, entry):
+        with open(os.path.join(self.directory, ENTRY_FILE_NAME), "w") as f:
+            json.dump(entry, f)
+
+    def test_directory_per_style(self):
+        self.assertNotEqual(
+            style_cache_dir(STYLE_URL),
+            style_cache_dir("https://example.com/styles/other.vt/style.json"),
+        )
+
+    def test_no_entry(self):
+        self.assertIsNone(cached_style(STYLE_URL))
+
+    def test_entry(self):
+        entry = {
+            "style_url": STYLE_URL,
+            "version": "abc",
+            "qgis_version": Qgis.QGIS_VERSION_INT,
+            "uri": "type=xyz",
+            "sublayers": [],
+        }
+        self._write_entry(entry)
+        self.assertEqual(cached_style(STYLE_URL), entry)
+
+    def test_entry_of_other_qgis_version_is_ignored(self):
+        self._write_entry(
+            {
+                "style_url": STYLE_URL,
+                "version": "abc",
+                "qgis_version": 0,
+                "uri": "type=xyz",
+                "sublayers": [],
+            }
+        )
+        self.assertIsNone(cached_style(STYLE_URL))
+
+    def test_corrupt_entry_is_ignored(self):
+        with open(os.path.join(self.directory, ENTRY_FILE_NAME), "w") as f:
+            f.write("{")
+        self.assertIsNone(cached_style(STYLE_URL))
+
+
+class TestSpriteUrls(unittest.TestCase):
+    def test_relative_sprite(self):
+        style = json.dumps({"sprite": "../sprites/sprite"}).encode()
+        self.assertEqual(
+            sprite_urls(STYLE_URL, style),
+            [
+                "https://example.com/styles/sprites/sprite.json",
+                "https://example.com/styles/sprites/sprite.png",
+            ],
+        )
+
+    def test_several_sprites(self):
+        style = json.dumps(
+            {
+                "sprite": [
+                    {"id": "a", "url": "https://example.com/a"},
+                    {"id": "b", "url": "https://example.com/b"},
+                ]
+            }
+        ).encode()
+        self.assertEqual(
+            sprite_urls(STYLE_URL, style),
+            [
+                "https://example.com/a.json",
+                "https://example.com/a.png",
+                "https://example.com/b.json",
+                "https://example.com/b.png",
+            ],
+        )
+
+    def test_no_sprite(self):
+        self.assertEqual(sprite_urls(STYLE_URL, b"{}"), [])
+        self.assertEqual(sprite_urls(STYLE_URL, b"{"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,6 +2,7 @@ import os
 
 from qgis.PyQt.QtCore import QUrl, QUrlQuery
 from qgis.PyQt.QtWidgets import QFileDialog
+from qgis.core import QgsApplication
 
 from swiss_locator import PLUGIN_PATH
 
@@ -26,3 +27,13 @@ def get_save_location(prompt: str = "Choose download location", open_dir: str =
 
 def get_icon_path(icon_file_name: str) -> str:
     return os.path.join(PLUGIN_PATH, "icons", icon_file_name)
+
+
+def get_cache_dir(*sub_dirs: str) -> str:
+    """Returns a directory of the plugin cache in the user profile, the
+    directory is created if necessary."""
+    path = os.path.join(
+        QgsApplication.qgisSettingsDirPath(), "cache", "swiss_locator", *sub_dirs
+    )
+    os.makedirs(path, exist_ok=True)
+    return path